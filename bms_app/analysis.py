@@ -0,0 +1,144 @@
+import sys
+from array import array
+from collections import namedtuple
+
+import numpy as np
+
+from results import TestResult, CHANNELS, SC_TRIPPED, SC_NOT_TRIPPED, SC_NOT_REACHED
+from telemetry import CURRENT, SAMPLE_RATE
+
+# Нормы из протокола: отключение заряда 4,25±0,05 В, разряда 2,85±0,05 В,
+# отключение при токе разряда свыше 50 А
+CHARGE_WORK = 4.2
+CHARGE_CUTOFF = 4.3
+DISCHARGE_WORK = 2.9
+DISCHARGE_CUTOFF = 2.8
+SHORT_CIRCUIT_CURRENT = 50.0
+# Ток, ниже которого цепь считается разомкнутой, и допустимое время отключения
+OPEN_CIRCUIT_CURRENT = 1.0
+MAX_TRIP_TIME = 0.1
+# Окно скользящего среднего для подавления шума измерения напряжения, отсчетов
+SMOOTHING = 16
+# Отключение считается записанным, если до и после пика (минимума) напряжение
+# отличалось от него больше чем на CUTOFF_MARGIN; отсчеты в пределах
+# PLATEAU_BAND от пика — площадка отключения, В
+CUTOFF_MARGIN = 0.1
+PLATEAU_BAND = 0.01
+
+# Нормы можно переопределить программой испытаний (testplan)
+Limits = namedtuple(
+    "Limits",
+    "charge_work charge_cutoff discharge_work discharge_cutoff short_circuit_current max_trip_time"
+)
+DEFAULT_LIMITS = Limits(
+    CHARGE_WORK, CHARGE_CUTOFF, DISCHARGE_WORK, DISCHARGE_CUTOFF, SHORT_CIRCUIT_CURRENT, MAX_TRIP_TIME
+)
+
+# complete — в записи есть отключение заряда и разряда каждого канала и
+# импульс КЗ целиком; только тогда по ней можно выносить вердикт
+Analysis = namedtuple(
+    "Analysis",
+    "charge_cutoff discharge_cutoff checks short_circuit trip_time trip_current complete"
+)
+
+
+def smooth(values, window=SMOOTHING):
+    # Скользящее среднее по оси отсчетов через накопленную сумму
+    if values.shape[-2] < window:
+        return values
+    total = np.cumsum(values, axis=-2, dtype=np.float64)
+    head = np.zeros_like(total[..., :1, :])
+    total = np.concatenate((head, total), axis=-2)
+    return ((total[..., window:, :] - total[..., :-window, :]) / window).astype(values.dtype)
+
+
+def cutoff_seen(values, peak):
+    # Для каждого канала: есть ли отсчет на площадке пика, перед которым
+    # и после которого напряжение было ниже пика на CUTOFF_MARGIN. Обрезанная
+    # запись, в которой кривая дошла только до края, так не проходит.
+    below = values < peak[..., None, :] - CUTOFF_MARGIN
+    before = np.logical_or.accumulate(below, axis=-2)
+    after = np.flip(np.logical_or.accumulate(np.flip(below, axis=-2), axis=-2), axis=-2)
+    plateau = values >= peak[..., None, :] - PLATEAU_BAND
+    return (plateau & before & after).any(axis=-2)
+
+
+def analyze(samples, rate=SAMPLE_RATE, limits=DEFAULT_LIMITS):
+    # Все вычисления — по оси отсчетов (-2), поэтому на вход можно подать
+    # как одно испытание (n, 9), так и пачку одинаковых по длине (runs, n, 9)
+    samples = np.asarray(samples, dtype=np.float32)
+    voltages = smooth(samples[..., :CHANNELS])
+    current = samples[..., CURRENT]
+
+    # Напряжение, на котором СКУ прекратила заряд/разряд — пик и минимум подъема
+    charge_cutoff = voltages.max(axis=-2)
+    discharge_cutoff = voltages.min(axis=-2)
+    checks = np.stack([
+        charge_cutoff >= limits.charge_work,
+        charge_cutoff <= limits.charge_cutoff,
+        discharge_cutoff <= limits.discharge_work,
+        discharge_cutoff >= limits.discharge_cutoff,
+    ], axis=-1)
+
+    index = np.arange(current.shape[-1])
+    over = current > limits.short_circuit_current
+    reached = over.any(axis=-1)
+    start = over.argmax(axis=-1)
+    opened = (current < OPEN_CIRCUIT_CURRENT) & (index >= start[..., None])
+    tripped = reached & opened.any(axis=-1)
+    stop = np.where(tripped, opened.argmax(axis=-1), current.shape[-1])
+    trip_time = np.where(tripped, (stop - start) / rate, np.nan)
+    window = (index >= start[..., None]) & (index < stop[..., None])
+    trip_current = np.where(reached, np.where(window, current, -np.inf).max(axis=-1), np.nan)
+
+    short_circuit = np.where(
+        ~reached, SC_NOT_REACHED,
+        np.where(tripped & (trip_time <= limits.max_trip_time), SC_TRIPPED, SC_NOT_TRIPPED)
+    )
+
+    # Импульс КЗ записан, если ток превысил порог и после этого запись
+    # длится дольше допустимого времени отключения (или цепь разомкнулась).
+    # Непревышение порога по записи не отличить от пропущенного импульса.
+    pulse = reached & (tripped | ((current.shape[-1] - start) / rate > limits.max_trip_time))
+    complete = (
+        cutoff_seen(voltages, charge_cutoff).all(axis=-1)
+        & cutoff_seen(-voltages, -discharge_cutoff).all(axis=-1)
+        & pulse
+    )
+    return Analysis(charge_cutoff, discharge_cutoff, checks, short_circuit, trip_time, trip_current, complete)
+
+
+def to_result(analysis, test_id=0, timestamp="", duration=0.0):
+    measurements = np.stack([
+        analysis.charge_cutoff, analysis.charge_cutoff,
+        analysis.discharge_cutoff, analysis.discharge_cutoff,
+    ], axis=-1).astype(np.float32)
+    return TestResult(
+        test_id, timestamp, duration, int(analysis.short_circuit),
+        array("b", analysis.checks.astype(np.int8).tobytes()),
+        array("f", measurements.tobytes()),
+    )
+
+
+def analyze_segments(paths):
+    # Частота отсчетов — своя у каждого сегмента, из его заголовка
+    from rawstore import RawSegment
+
+    for path in paths:
+        segment = RawSegment(path)
+        samples = segment.samples()
+        if len(samples):
+            yield path, analyze(samples, segment.rate)
+
+
+if __name__ == "__main__":
+    # Повторный анализ сохраненных измерений: python analysis.py raw/*/*.bin
+    for path, result in analyze_segments(sys.argv[1:]):
+        verdict = "годен" if result.checks.all() and result.short_circuit == SC_TRIPPED else "не годен"
+        if not result.complete:
+            verdict += " (запись неполная)"
+        print(
+            f"{path}: заряд {np.round(result.charge_cutoff, 3).tolist()} В, "
+            f"разряд {np.round(result.discharge_cutoff, 3).tolist()} В, "
+            f"КЗ {result.trip_current:.1f} А за {result.trip_time * 1000:.1f} мс — {verdict}"
+        )
@@ -0,0 +1,417 @@
+import os
+import json
+import asyncio
+import inspect
+import logging
+import threading
+from concurrent.futures import Future
+from urllib.parse import unquote
+
+from PySide6.QtCore import Signal, QObject
+
+from results import CHANNELS, CHECKS
+from metrics import render_metrics
+from archive import ArchiveError
+from report import safe_name
+
+# Локальный API для MES: JSON-RPC 2.0 в POST /rpc, поток событий стендов
+# и протоколов в GET /events (text/event-stream), файл протокола в
+# GET /reports/<имя> (из папки или из архива), метрики в формате Prometheus в GET /metrics.
+# Порт 0 отключает API; BMS_API_TOKEN, если задан, требуется в заголовке
+# "Authorization: Bearer <токен>".
+API_HOST = os.environ.get("BMS_API_HOST", "127.0.0.1")
+API_PORT = int(os.environ.get("BMS_API_PORT", "8765"))
+API_TOKEN = os.environ.get("BMS_API_TOKEN")
+
+MAX_HEADER = 64 * 1024
+MAX_BODY = 1024 * 1024
+CHUNK = 64 * 1024
+# Сколько событий держать для клиента, который не успевает их читать
+EVENT_BACKLOG = 256
+
+STATUS_TEXT = {
+    200: "OK", 204: "No Content", 400: "Bad Request", 401: "Unauthorized", 404: "Not Found",
+    405: "Method Not Allowed", 413: "Payload Too Large",
+}
+
+
+class ApiError(Exception):
+    # status — код ответа HTTP, code — код ошибки JSON-RPC
+    def __init__(self, message, status=400, code=-32000):
+        super().__init__(message)
+        self.status = status
+        self.code = code
+
+
+def result_json(result):
+    if result is None:
+        return None
+    return {
+        "test_id": result.test_id,
+        "timestamp": result.timestamp,
+        "duration": result.duration,
+        "short_circuit": result.short_circuit,
+        "passed": result.passed,
+        "checks": [list(result.channel(i)) for i in range(CHANNELS)],
+        "measurements": [
+            [None if value != value else round(value, 4) for value in result.measurements[i * CHECKS:(i + 1) * CHECKS]]
+            for i in range(CHANNELS)
+        ],
+    }
+
+
+def rpc_error(request_id, code, message):
+    return {"jsonrpc": "2.0", "id": request_id, "error": {"code": code, "message": message}}
+
+
+def stand_json(index, stand):
+    return {
+        "stand": index,
+        "name": stand.name,
+        "port": stand.port,
+        "connected": stand.device_connected,
+        "results_received": stand.results_received,
+        "status": stand.status,
+        "plan_progress": stand.plan_progress,
+        "cycle_time": stand.plan_run.cycle_time if stand.plan_run is not None else None,
+        "plan_failed": stand.plan_run.failed if stand.plan_run is not None else None,
+        "result": result_json(stand.result),
+        "device_result": result_json(stand.device_result),
+    }
+
+
+def job_json(job):
+    return {
+        "job": job.job_id,
+        "filename": os.path.basename(job.snapshot.filename),
+        "system_name": job.snapshot.system_name,
+        "serial_number": job.snapshot.serial_number,
+        "status": job.status,
+        "sha256": job.file_hash,
+        "passed": job.passed,
+        "error": job.error,
+    }
+
+
+class ApiBridge(QObject):
+    # Все обращения к стендам и очереди протоколов выполняются в потоке
+    # GUI: поток API ставит вызов в очередь сигналов и ждет Future.
+    _invoke = Signal(object, object)
+
+    def __init__(self, window, publish):
+        super().__init__()
+        self.window = window
+        self.publish = publish
+        self._invoke.connect(self._on_invoke)
+        for stand in window.stands:
+            stand.changed.connect(self.on_stand_changed)
+        window.report_queue.job_changed.connect(self.on_job_changed)
+        window.report_queue.job_finished.connect(self.on_job_changed)
+        window.report_queue.job_failed.connect(self.on_job_changed)
+
+    def call(self, fn, *args, **kwargs):
+        future = Future()
+        self._invoke.emit(lambda: fn(*args, **kwargs), future)
+        return future
+
+    def _on_invoke(self, fn, future):
+        if not future.set_running_or_notify_cancel():
+            return
+        try:
+            future.set_result(fn())
+        except Exception as e:
+            future.set_exception(e)
+
+    def on_stand_changed(self, stand):
+        self.publish("stand", stand_json(self.window.stands.index(stand), stand))
+
+    def on_job_changed(self, job):
+        self.publish("report", job_json(job))
+
+    # Методы JSON-RPC
+    def stand(self, index):
+        try:
+            return self.window.stands[int(index)]
+        except (IndexError, ValueError, TypeError):
+            raise ApiError(f"Нет стенда {index}")
+
+    def rpc_stands(self):
+        return [stand_json(i, stand) for i, stand in enumerate(self.window.stands)]
+
+    def rpc_status(self, stand=0):
+        session = self.stand(stand)
+        return stand_json(self.window.stands.index(session), session)
+
+    def rpc_reset(self, stand=0):
+        # Сброс результатов и запись нового испытания
+        self.stand(stand).reset()
+        return self.rpc_status(stand)
+
+    def rpc_start(self, stand=0):
+        # Новое испытание по программе испытаний рабочего места
+        self.stand(stand).run_plan(self.window.test_plan)
+        return self.rpc_status(stand)
+
+    def rpc_submit(self, system_name, serial_number, stand=0):
+        try:
+            system_name = safe_name(system_name, "Название системы")
+            serial_number = safe_name(serial_number, "Заводской номер")
+        except ValueError as e:
+            raise ApiError(str(e), code=-32602)
+        session = self.stand(stand)
+        if not session.results_received:
+            raise ApiError("Результаты испытания еще не получены")
+        job = self.window.submit_report(session, system_name, serial_number)
+        session.reset()
+        return job_json(job)
+
+    def rpc_job(self, job):
+        try:
+            return job_json(self.window.report_queue.jobs[int(job)])
+        except (KeyError, ValueError, TypeError):
+            raise ApiError(f"Нет задания {job}")
+
+
+RPC_METHODS = {
+    "stands": ApiBridge.rpc_stands,
+    "status": ApiBridge.rpc_status,
+    "start": ApiBridge.rpc_start,
+    "reset": ApiBridge.rpc_reset,
+    "submit": ApiBridge.rpc_submit,
+    "job": ApiBridge.rpc_job,
+}
+
+
+class ApiServer:
+    # asyncio в отдельном потоке: каждый клиент — корутина, поэтому
+    # медленный или подписанный на события клиент не задерживает других.
+    def __init__(self, window, host=API_HOST, port=API_PORT, token=API_TOKEN):
+        self.host = host
+        self.port = port
+        self.token = token
+        self.report_dir = window.catalogue.report_dir
+        self.archive = window.archive
+        self.bridge = ApiBridge(window, self.publish)
+        self._loop = None
+        self._stop = None
+        self._subscribers = set()
+        self._thread = None
+        self._started = threading.Event()
+        self.error = None
+
+    def start(self):
+        self._thread = threading.Thread(target=self._run, name="api", daemon=True)
+        self._thread.start()
+        self._started.wait(5)
+        return self.error is None
+
+    def stop(self):
+        if self._loop is not None and self._stop is not None:
+            self._loop.call_soon_threadsafe(self._stop.set)
+            self._thread.join(5)
+
+    def publish(self, event, data):
+        # Из любого потока: событие раздается всем подписчикам /events
+        if self._loop is None or not self._subscribers:
+            return
+        message = f"event: {event}\ndata: {json.dumps(data, ensure_ascii=False)}\n\n".encode("utf-8")
+        self._loop.call_soon_threadsafe(self._broadcast, message)
+
+    def _broadcast(self, message):
+        # Медленному клиенту достаются последние события, старые отбрасываются
+        for queue in self._subscribers:
+            if queue.full():
+                queue.get_nowait()
+            queue.put_nowait(message)
+
+    def _run(self):
+        try:
+            asyncio.run(self._serve())
+        except OSError as e:
+            self.error = e
+            self._started.set()
+
+    async def _serve(self):
+        self._loop = asyncio.get_running_loop()
+        self._stop = asyncio.Event()
+        server = await asyncio.start_server(self._handle, self.host, self.port, limit=MAX_HEADER)
+        self.port = server.sockets[0].getsockname()[1]
+        self._started.set()
+        async with server:
+            await self._stop.wait()
+            self._broadcast(None)
+
+    async def _handle(self, reader, writer):
+        try:
+            try:
+                method, path, headers, body = await self._read_request(reader)
+            except ApiError as e:
+                await self._respond(writer, e.status, {"error": str(e)})
+                return
+            if self.token and headers.get("authorization") != f"Bearer {self.token}":
+                await self._respond(writer, 401, {"error": "Требуется токен доступа"})
+                return
+            if path == "/rpc":
+                if method != "POST":
+                    await self._respond(writer, 405, {"error": "Только POST"})
+                    return
+                response = await self._rpc(body)
+                if response is None:
+                    # Только уведомления — ответа JSON-RPC нет
+                    await self._respond(writer, 204, b"")
+                else:
+                    await self._respond(writer, 200, response)
+            elif path == "/metrics" and method == "GET":
+                await self._respond(writer, 200, render_metrics(), "text/plain; version=0.0.4; charset=utf-8")
+            elif path == "/events" and method == "GET":
+                await self._events(writer)
+            elif path.startswith("/reports/") and method == "GET":
+                await self._download(writer, path[len("/reports/"):])
+            else:
+                await self._respond(writer, 404, {"error": "Нет такого адреса"})
+        except (ConnectionError, asyncio.IncompleteReadError):
+            pass
+        finally:
+            writer.close()
+
+    async def _read_request(self, reader):
+        try:
+            head = await reader.readuntil(b"\r\n\r\n")
+        except asyncio.LimitOverrunError:
+            raise ApiError("Слишком велик заголовок запроса", 413)
+        lines = head.decode("latin-1").split("\r\n")
+        try:
+            method, target, _ = lines[0].split(" ", 2)
+        except ValueError:
+            raise ApiError("Неверная строка запроса")
+        headers = {}
+        for line in lines[1:]:
+            name, sep, value = line.partition(":")
+            if sep:
+                headers[name.strip().lower()] = value.strip()
+        try:
+            length = int(headers.get("content-length") or 0)
+        except ValueError:
+            raise ApiError("Неверный заголовок Content-Length")
+        if length < 0:
+            raise ApiError("Неверный заголовок Content-Length")
+        if length > MAX_BODY:
+            raise ApiError("Слишком велико тело запроса", 413)
+        body = await reader.readexactly(length) if length else b""
+        return method, unquote(target.split("?", 1)[0]), headers, body
+
+    async def _respond(self, writer, status, payload, content_type="application/json; charset=utf-8"):
+        if isinstance(payload, (bytes, str)):
+            body = payload.encode("utf-8") if isinstance(payload, str) else payload
+        else:
+            body = json.dumps(payload, ensure_ascii=False).encode("utf-8")
+        writer.write(
+            f"HTTP/1.1 {status} {STATUS_TEXT.get(status, '')}\r\n"
+            f"Content-Type: {content_type}\r\nContent-Length: {len(body)}\r\n"
+            f"Connection: close\r\n\r\n".encode("latin-1") + body
+        )
+        await writer.drain()
+
+    async def _rpc(self, body):
+        # Ответ на запрос или пакет; None — если ответа не будет (уведомления)
+        try:
+            request = json.loads(body)
+        except ValueError:
+            return rpc_error(None, -32700, "Parse error")
+        if isinstance(request, list):
+            if not request:
+                return rpc_error(None, -32600, "Invalid Request")
+            # Пакет запросов выполняется параллельно
+            responses = await asyncio.gather(*(self._rpc_call(item) for item in request))
+            return [response for response in responses if response is not None] or None
+        return await self._rpc_call(request)
+
+    async def _rpc_call(self, request):
+        # Ошибка одного вызова становится ответом с ошибкой и не влияет на
+        # остальные вызовы пакета. На уведомление (без id) ответа нет.
+        if not isinstance(request, dict):
+            return rpc_error(None, -32600, "Invalid Request")
+        notification = "id" not in request
+        response = await self._rpc_execute(request)
+        return None if notification else response
+
+    async def _rpc_execute(self, request):
+        request_id = request.get("id")
+        method = RPC_METHODS.get(request.get("method"))
+        if method is None:
+            return rpc_error(request_id, -32601, "Method not found")
+        params = request.get("params", {})
+        if isinstance(params, list):
+            args, kwargs = params, {}
+        elif isinstance(params, dict):
+            args, kwargs = [], params
+        else:
+            return rpc_error(request_id, -32602, "Invalid params")
+        # Параметры сверяются с сигнатурой до вызова: TypeError из самого
+        # метода — внутренняя ошибка, а не неверные параметры
+        try:
+            inspect.signature(method).bind(self.bridge, *args, **kwargs)
+        except TypeError as e:
+            return rpc_error(request_id, -32602, f"Invalid params: {e}")
+        try:
+            result = await asyncio.wrap_future(self.bridge.call(method, self.bridge, *args, **kwargs))
+        except ApiError as e:
+            return rpc_error(request_id, e.code, str(e))
+        except Exception as e:
+            logging.exception(f"API: ошибка в методе {request.get('method')}")
+            return rpc_error(request_id, -32603, f"Internal error: {type(e).__name__}: {e}")
+        return {"jsonrpc": "2.0", "id": request_id, "result": result}
+
+    async def _events(self, writer):
+        queue = asyncio.Queue(EVENT_BACKLOG)
+        self._subscribers.add(queue)
+        try:
+            writer.write(
+                b"HTTP/1.1 200 OK\r\nContent-Type: text/event-stream; charset=utf-8\r\n"
+                b"Cache-Control: no-cache\r\nConnection: close\r\n\r\n"
+            )
+            # Первое событие — текущее состояние всех стендов
+            for state in await asyncio.wrap_future(self.bridge.call(ApiBridge.rpc_stands, self.bridge)):
+                writer.write(f"event: stand\ndata: {json.dumps(state, ensure_ascii=False)}\n\n".encode("utf-8"))
+            await writer.drain()
+            while True:
+                try:
+                    message = await asyncio.wait_for(queue.get(), 15)
+                except asyncio.TimeoutError:
+                    message = b": ping\n\n"
+                if message is None:
+                    break
+                writer.write(message)
+                await writer.drain()
+        finally:
+            self._subscribers.discard(queue)
+
+    @staticmethod
+    def _pdf_header(name, size):
+        return (
+            f"HTTP/1.1 200 OK\r\nContent-Type: application/pdf\r\nContent-Length: {size}\r\n"
+            f"Content-Disposition: attachment; filename=\"{name}\"\r\nConnection: close\r\n\r\n"
+        ).encode("utf-8")
+
+    async def _download(self, writer, name):
+        name = os.path.basename(name)
+        path = os.path.join(self.report_dir, name)
+        if not name.endswith(".pdf"):
+            await self._respond(writer, 404, {"error": "Нет такого протокола"})
+            return
+        if not os.path.isfile(path):
+            # Протокол, перенесенный в архив, читается из сегмента одной записью
+            try:
+                data = await self._loop.run_in_executor(None, self.archive.read, name)
+            except (KeyError, OSError, ArchiveError):
+                await self._respond(writer, 404, {"error": "Нет такого протокола"})
+                return
+            writer.write(self._pdf_header(name, len(data)) + data)
+            await writer.drain()
+            return
+        # Файл отдается порциями, чтение — в пуле потоков, не в цикле событий
+        with open(path, "rb") as f:
+            writer.write(self._pdf_header(name, os.fstat(f.fileno()).st_size))
+            while chunk := await self._loop.run_in_executor(None, f.read, CHUNK):
+                writer.write(chunk)
+                await writer.drain()
@@ -1,66 +1,71 @@
+import time
+
+START_TIME = time.perf_counter()
+
 import sys
+import cProfile
+import multiprocessing
 import threading
-import random
-import time
-import json
 import hashlib
+import shutil
 from datetime import datetime
 
 from PySide6.QtWidgets import (
     QApplication, QMainWindow, QWidget, QVBoxLayout, QHBoxLayout,
-    QLabel, QPushButton, QTableWidget, QTableWidgetItem,
+    QLabel, QPushButton,
     QComboBox, QLineEdit, QMessageBox, QDialog, QFormLayout, QInputDialog,
-    QTabWidget, QHeaderView, QListWidget, QListWidgetItem, QDateEdit
+    QTabWidget, QHeaderView, QListWidget, QListWidgetItem, QDateEdit, QListView, QTableView, QFileDialog
 )
-from PySide6.QtCore import QTimer, Qt, Signal, QObject, QDate
-from reportlab.lib.pagesizes import A4
-from reportlab.pdfgen import canvas
+from PySide6.QtCore import QTimer, Qt, Signal, QDate
 import os
 import logging
-import hashlib
-from shutil import copyfile
-
-from reportlab.pdfbase import pdfmetrics
-from reportlab.pdfbase.ttfonts import TTFont
-import os
 
-font_path = "C:/Windows/Fonts/times.ttf"
-pdfmetrics.registerFont(TTFont("TimesNewRoman", font_path))
-
-logging.basicConfig(filename='app.log', level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+from stand import StandSession
+from report import make_snapshot, safe_name
+from audit import log_event, AuditHandler
+from report_queue import ReportQueue
+from catalogue import ReportCatalogue
+from archive import ReportArchive, ARCHIVE_DAYS
+from report_model import ReportListModel
+from results import TestResult, SC_TRIPPED, SC_NOT_TRIPPED
+from result_model import ResultTableModel
+from telemetry_view import TelemetryPlot
+from telemetry import TelemetryBuffer
+from rawstore import RawSegment, segment_path, EVENT_ANALYSIS
+from replay import ReplayPlayer
+from integrity import verify_archive, describe
+from userstore import UserStore
+from api import ApiServer, API_PORT
+from testplan import load_plan
+from metrics import span, write_metrics, METRICS_FILE, EXPORT_INTERVAL, STARTUP_SECONDS
+from diagnostics_view import DiagnosticsDialog
+from stats_view import StatisticsView
+from export import export_results
+from export_view import ExportDialog
+
+# Сообщения logging попадают в общий журнал аудита log.txt
+logging.basicConfig(level=logging.INFO, format='%(message)s', handlers=[AuditHandler()])
+
+# Несколько стендов задаются списком портов через запятую: "COM3,COM4"
+SERIAL_PORTS = [p.strip() for p in os.environ.get("BMS_SERIAL_PORT", "COM3").split(",") if p.strip()]
+# Программа испытаний (JSON, см. testplan.py); по умолчанию — встроенная
+TEST_PLAN = os.environ.get("BMS_TEST_PLAN")
+
+SHORT_CIRCUIT_RESULTS = {
+    SC_TRIPPED: "СКУ ЛИАБ сработало по короткому замыканию",
+    SC_NOT_TRIPPED: "СКУ ЛИАБ не сработало по короткому замыканию",
+}
+SHORT_CIRCUIT_NOT_REACHED = "Порог по КЗ не достигнут"
+
+# Целевое время от запуска до окна входа, с
+STARTUP_TARGET = 1.5
+# Файл для статистики cProfile по запуску (без времени в окне входа),
+# смотреть: python -m pstats <файл>
+STARTUP_PROFILE = os.environ.get("BMS_STARTUP_PROFILE")
 
 def hash_password(password):
     return hashlib.sha256(password.encode('utf-8')).hexdigest()
 
-def log_event(message):
-    timestamp = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
-    with open("log.txt", "a", encoding="utf-8") as log_file:
-        log_file.write(f"[{timestamp}] {message}\n")
-
-class SerialEmulator(QObject):
-    ping_response = Signal(bool)
-    test_started = Signal(str, float)
-
-    def __init__(self):
-        super().__init__()
-        self.running = False
-        self.enabled = True
-
-    def start_emulation(self):
-        QTimer.singleShot(1000, lambda: self.ping_response.emit(True))
-        self.running = True
-        threading.Thread(target=self.listen_for_start, daemon=True).start()
-
-    def listen_for_start(self):
-        while self.running:
-            if self.enabled:
-                time.sleep(random.randint(3, 10))
-                timestamp = datetime.now().strftime("%H:%M:%S")
-                duration = round(random.uniform(0.1, 1.0), 3)
-                self.test_started.emit(timestamp, duration)
-            else:
-                time.sleep(1)
-
 class LoginDialog(QDialog):
     def __init__(self, users):
         super().__init__()
@@ -182,30 +187,91 @@ class AddUserDialog(QDialog):
         }
 
 class MainWindow(QMainWindow):
+    integrity_checked = Signal(object)
+    report_scan_progress = Signal(int, int)
+    report_scan_finished = Signal(object)
+    export_progress = Signal(int)
+    export_finished = Signal(object)
+    archive_finished = Signal(object)
+
     def __init__(self):
         super().__init__()
+        self.profiler = None
+        if STARTUP_PROFILE:
+            self.profiler = cProfile.Profile()
+            self.profiler.enable()
         self.setWindowTitle("Стенд электрических испытаний СКУ ЛИАБ")
         self.resize(700, 500)
 
-        self.users = self.load_users()
+        self.user_store = UserStore()
         if not self.users:
-            self.users = {"Default": {"password": hash_password("admin"), "role": "admin"}}
-            self.save_users()
+            self.user_store.add("Default", {"password": hash_password("admin"), "role": "admin"})
 
         self.current_user = ""
 
-        self.serial = SerialEmulator()
-        self.serial.ping_response.connect(self.on_device_connected)
-        self.serial.test_started.connect(self.on_test_received)
+        try:
+            self.test_plan = load_plan(TEST_PLAN)
+        except (OSError, ValueError, KeyError) as e:
+            logging.warning(f"Программа испытаний {TEST_PLAN} не загружена: {e}")
+            self.test_plan = load_plan()
+
+        self.stands = [StandSession(f"Стенд {i + 1}", port) for i, port in enumerate(SERIAL_PORTS)]
+        for stand in self.stands:
+            stand.changed.connect(self.on_stand_changed)
 
-        self.device_connected = False
         self.reports = []
 
-        self.results_received = False
+        self.catalogue = ReportCatalogue()
+        self.archive = ReportArchive(self.catalogue)
+
+        self.report_queue = ReportQueue()
+        self.report_queue.job_changed.connect(self.on_report_job_changed)
+        self.report_queue.job_finished.connect(self.on_report_job_finished)
+        self.report_queue.job_failed.connect(self.on_report_job_failed)
+
+        self.api = None
+        if API_PORT:
+            self.api = ApiServer(self)
+            if self.api.start():
+                self.log_event(f"API автоматизации: http://{self.api.host}:{self.api.port}")
+            else:
+                logging.warning(f"API автоматизации не запущен: {self.api.error}")
+                self.api = None
+
+        self.diagnostics = None
+        if METRICS_FILE:
+            self.metrics_timer = QTimer(self)
+            self.metrics_timer.timeout.connect(self.export_metrics)
+            self.metrics_timer.start(EXPORT_INTERVAL * 1000)
 
         self.setup_ui()
-        self.serial.start_emulation()
+        for stand in self.stands:
+            stand.start()
+
+        self.startup_time = time.perf_counter() - START_TIME
+        STARTUP_SECONDS.set(self.startup_time, phase="login")
+        if self.startup_time > STARTUP_TARGET:
+            logging.warning(f"Запуск до окна входа: {self.startup_time:.3f} с, превышена цель {STARTUP_TARGET} с")
+        else:
+            self.log_event(f"Запуск до окна входа: {self.startup_time:.3f} с")
+        if self.profiler is not None:
+            self.profiler.disable()
         self.show_login_dialog()
+        if self.profiler is not None:
+            self.profiler.enable()
+        self.login_time = time.perf_counter()
+        QTimer.singleShot(0, self.on_ready)
+
+    def on_ready(self):
+        # Первая итерация цикла событий после входа: окно показано и отвечает
+        ready = time.perf_counter() - self.login_time
+        STARTUP_SECONDS.set(ready, phase="ready")
+        self.log_event(f"От входа до готовности: {ready:.3f} с")
+        if self.profiler is not None:
+            self.profiler.disable()
+            self.profiler.dump_stats(STARTUP_PROFILE)
+            self.profiler = None
+        self.scan_reports()
 
     def setup_ui(self):
         self.user_label = QLabel("Пользователь: не выбран")
@@ -215,37 +281,56 @@ class MainWindow(QMainWindow):
         self.main_tab = QWidget()
         self.settings_tab = QWidget()
         self.reports_tab = QWidget()
+        self.stats_tab = QWidget()
 
         self.tabs.addTab(self.main_tab, "Испытания")
         self.tabs.addTab(self.settings_tab, "Настройки")
         self.tabs.addTab(self.reports_tab, "Отчетность")
+        self.tabs.addTab(self.stats_tab, "Статистика")
 
         self.tabs.setTabPosition(QTabWidget.North)
 
+        # Все вкладки, кроме «Испытаний», строятся при первом показе
+        self.tab_builders = {
+            self.settings_tab: self.init_settings_tab,
+            self.reports_tab: self.init_reports_tab,
+            self.stats_tab: self.init_stats_tab,
+        }
+        self.tabs.currentChanged.connect(self.on_tab_changed)
+        self.report_scan_running = False
+        self.report_scan_progress.connect(self.on_report_scan_progress)
+        self.report_scan_finished.connect(self.on_report_scan_finished)
+        self.archive_finished.connect(self.on_archive_finished)
         self.init_main_tab()
-        self.init_settings_tab()
-        self.init_reports_tab()
+
+    def on_tab_changed(self, index):
+        build = self.tab_builders.pop(self.tabs.widget(index), None)
+        if build is not None:
+            build()
+
+    def tab_ready(self, tab):
+        return tab not in self.tab_builders
 
     def init_main_tab(self):
         layout = QVBoxLayout(self.main_tab)
 
+        self.stand_selector = QComboBox()
+        for stand in self.stands:
+            self.stand_selector.addItem(stand.title())
+        self.stand_selector.currentIndexChanged.connect(self.refresh_stand_view)
+        self.stand_selector.setVisible(len(self.stands) > 1)
+        layout.addWidget(self.stand_selector)
+
         self.status_label = QLabel("Ожидание подключения устройства...")
         layout.addWidget(self.status_label)
 
-        self.detailed_table = QTableWidget(8, 4)
-        self.detailed_table.setHorizontalHeaderLabels([
-            "Работа\nпри напряжении\nниже 4,2 В",
-            "Отключение\nпри напряжении\nвыше 4,3 В",
-            "Работа\nпри напряжении\nвыше 2,9 В",
-            "Отключение\nпри напряжении\nниже 2,8 В"
-        ])
+        self.result_model = ResultTableModel(self)
+        self.detailed_table = QTableView()
+        self.detailed_table.setModel(self.result_model)
         self.detailed_table.horizontalHeader().setSectionResizeMode(QHeaderView.Stretch)
         self.detailed_table.horizontalHeader().setFixedHeight(60)
-
-        for i in range(8):
-            self.detailed_table.setVerticalHeaderItem(i, QTableWidgetItem(f"Канал {i+1}"))
-        self.detailed_table.setEditTriggers(QTableWidget.NoEditTriggers)
-        self.detailed_table.setStyleSheet("QTableWidget::item { padding: 2px; }")
+        self.detailed_table.setEditTriggers(QTableView.NoEditTriggers)
+        self.detailed_table.setStyleSheet("QTableView::item { padding: 2px; }")
 
         layout.addWidget(QLabel("Результаты испытаний по каналам:"))
         layout.addWidget(self.detailed_table)
@@ -253,8 +338,23 @@ class MainWindow(QMainWindow):
         self.short_circuit_label = QLabel("Результат по КЗ: ...")
         layout.addWidget(self.short_circuit_label)
 
+        self.telemetry_button = QPushButton("Телеметрия")
+        self.telemetry_button.setCheckable(True)
+        self.telemetry_button.toggled.connect(self.toggle_telemetry)
+        layout.addWidget(self.telemetry_button)
+
+        self.telemetry_plot = TelemetryPlot()
+        self.telemetry_plot.setVisible(False)
+        layout.addWidget(self.telemetry_plot)
+
         control_layout = QHBoxLayout()
 
+        self.plan_button = QPushButton("Запустить программу испытаний")
+        self.plan_button.setToolTip(self.test_plan.name)
+        self.plan_button.clicked.connect(self.run_test_plan)
+        self.plan_button.setEnabled(False)
+        control_layout.addWidget(self.plan_button)
+
         self.reset_button = QPushButton("Сбросить результаты")
         self.reset_button.clicked.connect(self.confirm_reset)
         control_layout.addWidget(self.reset_button)
@@ -269,6 +369,15 @@ class MainWindow(QMainWindow):
         self.device_status = QLabel("Устройство не подключено")
         layout.addWidget(self.device_status)
 
+        layout.addWidget(QLabel("Очередь протоколов:"))
+        self.report_jobs_list = QListWidget()
+        self.report_jobs_list.setMaximumHeight(100)
+        layout.addWidget(self.report_jobs_list)
+
+        self.retry_report_button = QPushButton("Повторить формирование")
+        self.retry_report_button.clicked.connect(self.retry_report_job)
+        layout.addWidget(self.retry_report_button)
+
     def init_settings_tab(self):
         self.setWindowTitle("Управление пользователями")
         layout = QVBoxLayout(self.settings_tab)
@@ -276,9 +385,8 @@ class MainWindow(QMainWindow):
         layout.addWidget(QLabel("Список пользователей:"))
 
         self.user_list = QListWidget()
-        for uid, info in self.users.items():
-            full_display = f"{uid} — {info.get('lastname', '')} {info.get('firstname', '')}"
-            self.user_list.addItem(full_display)
+        self.update_user_list()
+        self.select_current_user()
         layout.addWidget(self.user_list)
 
         self.add_user_button = QPushButton("Добавить пользователя")
@@ -303,12 +411,37 @@ class MainWindow(QMainWindow):
         test_area_layout.addWidget(self.rename_area_button)
 
         layout.addLayout(test_area_layout)
+
+        self.diagnostics_button = QPushButton("Диагностика")
+        self.diagnostics_button.clicked.connect(self.show_diagnostics)
+        layout.addWidget(self.diagnostics_button)
     
+    def show_diagnostics(self):
+        if self.diagnostics is None:
+            self.diagnostics = DiagnosticsDialog(self)
+        self.diagnostics.show()
+        self.diagnostics.raise_()
+
+    def export_metrics(self):
+        try:
+            write_metrics()
+        except OSError as e:
+            logging.warning(f"Метрики не записаны в {METRICS_FILE}: {e}")
+
+    def update_user_list(self):
+        self.user_list_version = self.user_store.version
+        self.user_list.clear()
+        for uid, info in self.users.items():
+            item = QListWidgetItem(f"{uid} — {info.get('lastname', '')} {info.get('firstname', '')}")
+            item.setData(Qt.ItemDataRole.UserRole, uid)
+            self.user_list.addItem(item)
+
     def rename_test_area(self):
         new_name, ok = QInputDialog.getText(self, "Изменить название участка", "Введите новое название:")
         if ok and new_name.strip():
-            self.test_area_name = new_name.strip()
+            self.user_store.set_setting("test_area_name", new_name.strip())
             self.test_area_label.setText(f"Название: {self.test_area_name}")
+            self.log_user_action(f"изменил название участка на «{self.test_area_name}»")
 
     def init_reports_tab(self):
         layout = QVBoxLayout(self.reports_tab)
@@ -318,12 +451,26 @@ class MainWindow(QMainWindow):
         self.search_input.setPlaceholderText("Поиск по заводскому номеру")
         filter_layout.addWidget(self.search_input)
 
+        # Фильтр применяется по мере ввода, с задержкой после последнего символа
+        self.search_timer = QTimer(self)
+        self.search_timer.setSingleShot(True)
+        self.search_timer.setInterval(300)
+        self.search_timer.timeout.connect(self.update_report_list)
+        self.search_input.textChanged.connect(self.search_timer.start)
+
         self.date_filter_edit = QDateEdit()
         self.date_filter_edit.setCalendarPopup(True)
         self.date_filter_edit.setDate(QDate.currentDate())
         self.date_filter_edit.dateChanged.connect(self.update_date_filter)
         filter_layout.addWidget(self.date_filter_edit)
 
+        self.sort_selector = QComboBox()
+        self.sort_selector.addItem("По дате", "date")
+        self.sort_selector.addItem("По заводскому номеру", "serial")
+        self.sort_selector.addItem("По результату", "verdict")
+        self.sort_selector.currentIndexChanged.connect(self.update_report_list)
+        filter_layout.addWidget(self.sort_selector)
+
         self.clear_filters_button = QPushButton("Сбросить фильтры")
         self.clear_filters_button.clicked.connect(self.clear_filters)
         filter_layout.addWidget(self.clear_filters_button)
@@ -334,66 +481,230 @@ class MainWindow(QMainWindow):
 
         layout.addLayout(filter_layout)
 
-        self.report_list = QListWidget()
+        self.scan_label = QLabel("Сканирование папки протоколов…")
+        self.scan_label.setVisible(self.report_scan_running)
+        layout.addWidget(self.scan_label)
+
+        self.report_model = ReportListModel(self.catalogue, self)
+        self.report_list = QListView()
+        self.report_list.setUniformItemSizes(True)
+        self.report_list.setModel(self.report_model)
         layout.addWidget(QLabel("Сохраненные отчеты:"))
         layout.addWidget(self.report_list)
 
+        self.copy_button = QPushButton("Сохранить копию протокола")
+        self.copy_button.clicked.connect(self.save_report_copy)
+        layout.addWidget(self.copy_button)
+
+        self.replay_button = QPushButton("Воспроизвести испытание")
+        self.replay_button.clicked.connect(self.replay_selected_report)
+        layout.addWidget(self.replay_button)
+
+        self.verify_button = QPushButton("Проверить целостность архива")
+        self.verify_button.clicked.connect(self.verify_reports)
+        self.integrity_checked.connect(self.on_integrity_checked)
+        layout.addWidget(self.verify_button)
+
+        self.export_button = QPushButton("Выгрузить результаты")
+        self.export_button.clicked.connect(self.export_reports)
+        self.export_progress.connect(self.on_export_progress)
+        self.export_finished.connect(self.on_export_finished)
+        layout.addWidget(self.export_button)
+
+        # Сразу показывается то, что уже есть в индексе; сверка с папкой идет в фоне
         self.update_report_list()
 
+    def init_stats_tab(self):
+        layout = QVBoxLayout(self.stats_tab)
+        self.stats_view = StatisticsView(self.catalogue)
+        layout.addWidget(self.stats_view)
+
+    def scan_reports(self):
+        self.report_scan_running = True
+        if self.tab_ready(self.reports_tab):
+            self.scan_label.setVisible(True)
+        threading.Thread(target=self._scan_reports, daemon=True).start()
+
+    def _scan_reports(self):
+        try:
+            result = self.catalogue.rescan(progress=self.report_scan_progress.emit)
+        except Exception as e:
+            result = e
+        self.report_scan_finished.emit(result)
+
+    def on_report_scan_progress(self, done, total):
+        if self.tab_ready(self.reports_tab):
+            self.scan_label.setText(f"Сканирование папки протоколов: {done} из {total}")
+            self.update_report_list()
+
+    def on_report_scan_finished(self, result):
+        self.report_scan_running = False
+        if isinstance(result, Exception):
+            logging.warning(f"Не удалось сверить папку протоколов с индексом: {result}")
+        else:
+            added, removed = result
+            if added or removed:
+                self.log_event(f"Индекс протоколов: добавлено {added}, удалено {removed}")
+        if self.tab_ready(self.reports_tab):
+            self.scan_label.setVisible(False)
+            self.update_report_list()
+        if self.tab_ready(self.stats_tab) and not isinstance(result, Exception) and result[1]:
+            self.stats_view.on_test_indexed()
+        if ARCHIVE_DAYS > 0:
+            threading.Thread(target=self._archive_reports, daemon=True).start()
+
+    def _archive_reports(self):
+        # Перенос старых протоколов в архив после сверки папки при запуске
+        try:
+            result = self.archive.pack(ARCHIVE_DAYS)
+        except Exception as e:
+            result = e
+        self.archive_finished.emit(result)
+
+    def on_archive_finished(self, result):
+        if isinstance(result, Exception):
+            logging.warning(f"Не удалось перенести протоколы в архив: {result}")
+            return
+        packed, skipped = result
+        if packed or skipped:
+            self.log_event(f"Архив протоколов старше {ARCHIVE_DAYS} дн.: перенесено {packed}, пропущено {skipped}")
+            self.update_report_list()
+
+    def save_report_copy(self):
+        # Копия протокола из папки или из архива
+        index = self.report_list.currentIndex()
+        if not index.isValid():
+            QMessageBox.warning(self, "Ошибка", "Выберите отчет.")
+            return
+        entry = index.data(Qt.ItemDataRole.UserRole)
+        path, _ = QFileDialog.getSaveFileName(self, "Сохранить копию протокола", entry.filename, "PDF (*.pdf)")
+        if not path:
+            return
+        source = os.path.join(self.catalogue.report_dir, entry.filename)
+        try:
+            if os.path.exists(source):
+                shutil.copyfile(source, path)
+            else:
+                with open(path, "wb") as f:
+                    f.write(self.archive.read(entry.filename))
+        except Exception as e:
+            QMessageBox.critical(self, "Ошибка", f"Не удалось сохранить протокол: {e}")
+            return
+        self.log_user_action(f"сохранил копию протокола {entry.filename} в {path}")
+
+    def verify_reports(self):
+        # Хеширование архива идет в фоновом потоке, интерфейс не блокируется
+        self.verify_button.setEnabled(False)
+        self.verify_button.setText("Проверка целостности…")
+        threading.Thread(target=self._verify_reports, daemon=True).start()
+
+    def _verify_reports(self):
+        try:
+            report = verify_archive(self.catalogue)
+        except Exception as e:
+            report = e
+        self.integrity_checked.emit(report)
+
+    def on_integrity_checked(self, report):
+        self.verify_button.setEnabled(True)
+        self.verify_button.setText("Проверить целостность архива")
+        if isinstance(report, Exception):
+            QMessageBox.critical(self, "Ошибка", f"Не удалось проверить архив: {report}")
+            return
+        problems = len(report.modified) + len(report.missing) + len(report.unregistered) + len(report.failed)
+        self.log_event(
+            f"Проверка целостности архива: совпадает {len(report.ok)}, изменено {len(report.modified)}, "
+            f"отсутствует {len(report.missing)}, без хеша {len(report.unregistered)}"
+        )
+        text = "\n".join(describe(report, limit=10))
+        if problems:
+            QMessageBox.warning(self, "Целостность архива", text)
+        else:
+            QMessageBox.information(self, "Целостность архива", text)
+
+    def export_reports(self):
+        # Выгрузка идет в фоновом потоке построчно из индекса
+        date_filter = getattr(self, "selected_date", "")
+        day = datetime.strptime(date_filter, "%Y%m%d").date() if date_filter else None
+        dialog = ExportDialog(self.search_input.text().strip(), day, self)
+        if dialog.exec() != QDialog.Accepted:
+            return
+        fmt, extension = dialog.format()
+        path, _ = QFileDialog.getSaveFileName(self, "Выгрузка результатов", f"results{extension}", dialog.format_title())
+        if not path:
+            return
+        if not path.lower().endswith(extension):
+            path += extension
+        self.export_button.setEnabled(False)
+        self.export_button.setText("Выгрузка…")
+        self.log_user_action(f"запустил выгрузку результатов в {path}")
+        threading.Thread(target=self._export_reports, args=(path, fmt, dialog.filters()), daemon=True).start()
+
+    def _export_reports(self, path, fmt, filters):
+        try:
+            result = path, export_results(self.catalogue, path, fmt, self.export_progress.emit, **filters)
+        except Exception as e:
+            result = e
+        self.export_finished.emit(result)
+
+    def on_export_progress(self, count):
+        self.export_button.setText(f"Выгрузка: {count} записей…")
+
+    def on_export_finished(self, result):
+        self.export_button.setEnabled(True)
+        self.export_button.setText("Выгрузить результаты")
+        if isinstance(result, Exception):
+            QMessageBox.critical(self, "Ошибка", f"Не удалось выгрузить результаты: {result}")
+            return
+        path, count = result
+        self.log_event(f"Выгружено результатов: {count} в {path}")
+        QMessageBox.information(self, "Выгрузка результатов", f"Выгружено записей: {count}\n{path}")
+
     def update_date_filter(self):
         self.selected_date = self.date_filter_edit.date().toString("yyyyMMdd")
+        self.update_report_list()
 
     def clear_filters(self):
         self.search_input.clear()
-        self.selected_date = ""
         self.date_filter_edit.setDate(QDate.currentDate())
+        self.selected_date = ""
         self.update_report_list()
 
     def update_report_list(self):
-        self.report_list.clear()
-        report_dir = "reports"
-        os.makedirs(report_dir, exist_ok=True)
-        serial_filter = self.search_input.text().strip().lower()
+        if not self.tab_ready(self.reports_tab):
+            return
+        self.search_timer.stop()
+        serial_filter = self.search_input.text().strip()
         date_filter = getattr(self, "selected_date", "")
+        day = datetime.strptime(date_filter, "%Y%m%d").date() if date_filter else None
 
-        for file in sorted(os.listdir(report_dir)):
-            if file.endswith(".pdf"):
-                match_serial = serial_filter in file.lower() if serial_filter else True
-                match_date = date_filter in file if date_filter else True
-                if match_serial and match_date:
-                    self.report_list.addItem(QListWidgetItem(file))
-
-    def load_users(self):
-        if os.path.exists("users.json"):
-            with open("users.json", "r", encoding="utf-8") as f:
-                data = json.load(f)
-                self.test_area_name = data.get("test_area_name", "Участок 1")
-                return data.get("users", {})
-        self.test_area_name = "Участок 1"
-        return {}
-
-
-    def save_users(self):
-        data = {
-            "users": self.users,
-            "test_area_name": self.test_area_name
-        }
-        with open("users.json", "w", encoding="utf-8") as f:
-            json.dump(data, f, ensure_ascii=False, indent=2)
+        self.report_model.set_filter(
+            serial_prefix=serial_filter, date_from=day, date_to=day,
+            order=self.sort_selector.currentData()
+        )
 
+    @property
+    def users(self):
+        # Справочник общий для всех рабочих мест; кэш обновляется сам,
+        # если пользователей изменили на другом стенде
+        return self.user_store.users
+
+    @property
+    def test_area_name(self):
+        return self.user_store.test_area_name
 
     def show_login_dialog(self):
-        self.users = self.load_users()
+        self.user_store.refresh()
+        settings_ready = self.tab_ready(self.settings_tab)
+        if settings_ready and self.user_store.version != self.user_list_version:
+            self.update_user_list()
+            self.test_area_label.setText(f"Название: {self.test_area_name}")
         login = LoginDialog(self.users)
         if login.exec() == QDialog.Accepted:
             self.current_user = login.selected_user
             self.user_label.setText(f"Пользователь: {self.current_user}")
-
-            for i in range(self.user_list.count()):
-                item = self.user_list.item(i)
-                if item.data(Qt.ItemDataRole.UserRole) == self.current_user:
-                    self.user_list.setCurrentItem(item)
-                    break
+            if settings_ready:
+                self.select_current_user()
 
             is_admin = self.users[self.current_user]["role"] == "admin"
             if not is_admin:
@@ -402,6 +713,13 @@ class MainWindow(QMainWindow):
             elif self.tabs.indexOf(self.settings_tab) == -1:
                 self.tabs.insertTab(1, self.settings_tab, "Настройки")
 
+    def select_current_user(self):
+        for i in range(self.user_list.count()):
+            item = self.user_list.item(i)
+            if item.data(Qt.ItemDataRole.UserRole) == self.current_user:
+                self.user_list.setCurrentItem(item)
+                break
+
     def change_user(self, name):
         self.current_user = name
         self.user_label.setText(f"Пользователь: {name}")
@@ -413,7 +731,7 @@ class MainWindow(QMainWindow):
             self.tabs.insertTab(1, self.settings_tab, "Настройки")
 
     def log_event(self, message):
-        logging.info(message)
+        log_event(message)
 
     def log_user_action(self, action):
         self.log_event(f"Пользователь {self.current_user} {action}")
@@ -424,22 +742,19 @@ class MainWindow(QMainWindow):
             user_data = dialog.get_user_data()
             user_id = user_data["user_id"]
 
-            if user_id in self.users:
-                QMessageBox.information(self, "Информация", "Пользователь уже существует.")
-                return
-
-            self.users[user_id] = {
+            added = self.user_store.add(user_id, {
                 "lastname": user_data["lastname"],
                 "firstname": user_data["firstname"],
                 "middlename": user_data["middlename"],
                 "password": hash_password(user_data["password"]),
                 "role": "operator"
-            }
+            })
+            if not added:
+                QMessageBox.information(self, "Информация", "Пользователь уже существует.")
+                return
 
-            display_name = f"{user_id} — {user_data['lastname']} {user_data['firstname']}"
-            self.user_list.addItem(display_name)
+            self.update_user_list()
             self.log_user_action(f"добавил пользователя {user_id}")
-            self.save_users()
 
     def delete_user(self):
         item = self.user_list.currentItem()
@@ -447,8 +762,7 @@ class MainWindow(QMainWindow):
             QMessageBox.warning(self, "Ошибка", "Выберите пользователя для удаления.")
             return
 
-        display_text = item.text()
-        uid = display_text.split(" — ")[0]
+        uid = item.data(Qt.ItemDataRole.UserRole)
 
         if uid == "Default":
             QMessageBox.warning(self, "Ошибка", "Нельзя удалить пользователя по умолчанию.")
@@ -456,57 +770,85 @@ class MainWindow(QMainWindow):
 
         confirm = QMessageBox.question(self, "Подтверждение", f"Удалить пользователя {uid}?", QMessageBox.Yes | QMessageBox.No)
         if confirm == QMessageBox.Yes:
-            del self.users[uid]
-            row = self.user_list.row(item)
-            self.user_list.takeItem(row)
+            self.user_store.delete(uid)
+            self.update_user_list()
             self.log_user_action(f"удалил пользователя {uid}")
-            self.save_users()
             QMessageBox.information(self, "Удалено", f"Пользователь {uid} удален.")
 
+    @property
+    def current_stand(self):
+        return self.stands[max(self.stand_selector.currentIndex(), 0)]
+
     def confirm_reset(self):
         if QMessageBox.question(self, "Подтверждение", "Вы уверены, что хотите сбросить результаты?", QMessageBox.Yes | QMessageBox.No) == QMessageBox.Yes:
-            for i in range(8):
-                for j in range(4):
-                    self.detailed_table.setItem(i, j, QTableWidgetItem(""))
+            self.current_stand.reset()
+
+    def run_test_plan(self):
+        stand = self.current_stand
+        stand.run_plan(self.test_plan)
+        self.log_user_action(f"запустил программу «{self.test_plan.name}» на стенде {stand.name}")
+
+    def on_stand_changed(self, stand):
+        self.stand_selector.setItemText(self.stands.index(stand), stand.title())
+        # Перерисовывается только стенд, выбранный в интерфейсе
+        if stand is self.current_stand:
+            self.refresh_stand_view()
+
+    def toggle_telemetry(self, enabled):
+        stand = self.current_stand
+        if stand.transport.telemetry_enabled != enabled:
+            stand.set_telemetry(enabled)
+        self.telemetry_plot.setVisible(enabled)
+
+    def replay_selected_report(self):
+        index = self.report_list.currentIndex()
+        if not index.isValid():
+            QMessageBox.warning(self, "Ошибка", "Выберите отчет для воспроизведения.")
+            return
+        entry = index.data(Qt.ItemDataRole.UserRole)
+        path = segment_path(entry.serial_number, entry.timestamp)
+        if not os.path.exists(path):
+            QMessageBox.information(self, "Информация", "Для этого отчета нет записанных измерений.")
+            return
+
+        self.stop_replay()
+        segment = RawSegment(path)
+        self.replay_buffer = TelemetryBuffer()
+        self.replay = ReplayPlayer(segment, self.replay_buffer, parent=self)
+        # В протокол шел вердикт по телеметрии, если он был вычислен
+        self.result_model.set_result(segment.result(EVENT_ANALYSIS) or segment.result())
+        self.status_label.setText(f"Воспроизведение: {entry.filename}")
+        self.telemetry_plot.set_buffer(self.replay_buffer)
+        self.telemetry_plot.setVisible(True)
+        self.tabs.setCurrentWidget(self.main_tab)
+        self.replay.start()
+
+    def stop_replay(self):
+        if getattr(self, "replay", None) is not None:
+            self.replay.stop()
+            self.replay = None
+
+    def refresh_stand_view(self):
+        self.stop_replay()
+        stand = self.current_stand
+        self.telemetry_plot.set_buffer(stand.telemetry)
+        self.telemetry_button.setChecked(stand.transport.telemetry_enabled)
+        self.telemetry_plot.setVisible(stand.transport.telemetry_enabled)
+        self.status_label.setText(stand.status)
+        self.device_status.setText("Устройство подключено" if stand.device_connected else "Устройство не подключено")
+        self.report_button.setEnabled(stand.device_connected)
+        self.plan_button.setEnabled(stand.device_connected)
+
+        self.result_model.set_result(stand.result)
+        if stand.result is None:
             self.short_circuit_label.setText("Результат по КЗ: ...")
-            self.results_received = False
-            self.serial.enabled = True
-            self.status_label.setText("Ожидание результатов испытаний...")
-
-    def on_device_connected(self, success):
-        if success:
-            self.device_connected = True
-            self.status_label.setText("Ожидание результатов испытаний...")
-            self.device_status.setText("Устройство подключено")
-            self.report_button.setEnabled(True)
-
-    def on_test_received(self, timestamp, duration):
-        if not self.device_connected or self.results_received:
             return
-        for i in range(8):
-            for j in range(4):
-                val = random.choice(["+", "-"])
-                item = QTableWidgetItem(val)
-                font = item.font()
-                font.setPointSize(16)
-                item.setFont(font)
-                if val == "-":
-                    item.setForeground(Qt.red)
-                item.setTextAlignment(Qt.AlignCenter)
-                self.detailed_table.setItem(i, j, item)
-
-        result = random.choice([
-            "СКУ ЛИАБ сработало по короткому замыканию",
-            "СКУ ЛИАБ не сработало по короткому замыканию",
-            "Порог по КЗ не достигнут"
-        ])
+
+        result = SHORT_CIRCUIT_RESULTS.get(stand.result.short_circuit, SHORT_CIRCUIT_NOT_REACHED)
         self.short_circuit_label.setText("Результат по КЗ: " + result)
-        self.results_received = True
-        self.serial.enabled = False
-        self.status_label.setText("Результаты получены")
 
     def save_report_as_pdf(self):
-        from reportlab.lib.utils import simpleSplit
+        stand = self.current_stand
         system_name, ok1 = QInputDialog.getText(self, "Название системы контроля", "Введите название системы контроля:")
         if not ok1 or not system_name.strip():
             QMessageBox.warning(self, "Ошибка", "Название системы контроля обязательно.")
@@ -517,212 +859,86 @@ class MainWindow(QMainWindow):
         if not ok2 or not serial_number.strip():
             QMessageBox.warning(self, "Ошибка", "Заводской номер обязателен.")
             return
-        
-        system_name = system_name.strip().replace(" ", "_")
-        serial_number = serial_number.strip().replace(" ", "_")
-
-        os.makedirs("reports", exist_ok=True)
-        filename = f"reports/report_{system_name}_{serial_number}_{datetime.now().strftime('%Y%m%d_%H%M%S')}.pdf"
-
-        # Регистрация шрифтов
-        pdfmetrics.registerFont(TTFont("TimesNewRoman", "C:/Windows/Fonts/times.ttf"))
-        pdfmetrics.registerFont(TTFont("TimesNewRoman-Bold", "C:/Windows/Fonts/timesbd.ttf"))
-
-        c = canvas.Canvas(filename, pagesize=A4)
-        width, height = A4
-        min_y_margin = 50
-
-        def ensure_y_space(c, y, decrement=20, font="TimesNewRoman", size=12):
-            if y - decrement < min_y_margin:
-                c.showPage()
-                c.setFont(font, size)
-                return height - 50
-            return y
-
-        # Заголовки
-        c.setFont("TimesNewRoman-Bold", 12)
-        y = height - 140
-        c.drawCentredString(width / 2, height - 50, "ПРОТОКОЛ")
-        c.setFont("TimesNewRoman", 12)
-        c.drawCentredString(width / 2, height - 70, "Проверки соответствия системы контроля литий-ионной аккумуляторной батареи")
-        c.drawCentredString(width / 2, height - 85, "функциональным требованиям")
-
-        c.drawString(50, height - 110, "№ 1246")
-        date_str = datetime.now().strftime("«%d» %B %Y г.")
-        c.drawRightString(width - 50, height - 110, date_str)
-
-
-        bms_model = self.bms_model if hasattr(self, "bms_model") else "BMS_ABC123"
-        test_area = self.test_area_name if hasattr(self, "test_area_name") else "испытательный участок ООО «__________»"
-        date_str = datetime.now().strftime("«%d» %B %Y г.")
-
-        # Раздел 1
-        c.drawString(50, y, "1.  Объект испытания: система контроля литий-ионной аккумуляторной батареи")
-        y = ensure_y_space(c, y, 15)
-        y -= 15
-        c.setFont("TimesNewRoman-Bold", 12)
-        c.drawString(70, y, bms_model)
-        c.setFont("TimesNewRoman", 12)
-        c.drawString(150, y, f"зав. № {serial_number.strip()}.")
-        y = ensure_y_space(c, y, 25)
-        y -= 25
-
-        # Раздел 2
-        c.drawString(50, y, "2.  Цель испытания:")
-        y = ensure_y_space(c, y, 15)
-        y -= 15
-        lines = [
-            "Проверка соответствия системы контроля литий-ионной аккумуляторной батареи",
-            "функциональным требованиям",
-            "по защите аккумуляторной батареи от перезаряда, переразряда, токов короткого замыкания.",
-            "- отключение тока заряда при напряжении 4,25±0,05 В на любом из аккумуляторов;",
-            "- отключение тока разряда при напряжении 2,85±0,05 В на любом из аккумуляторов;",
-            "- отключение при превышении тока разряда свыше 50 А."
-        ]
-        for line in lines:
-            y = ensure_y_space(c, y, 15)
-            c.drawString(70, y, line)
-            y -= 15
-        y = ensure_y_space(c, y, 10)
-        y -= 10
-
-        # Раздел 3
-        c.drawString(50, y, f"3.  Дата проведения испытания: {date_str}")
-        y = ensure_y_space(c, y, 20)
-        y -= 20
-
-        # Раздел 4
-        c.drawString(50, y, f"4.  Место проведения испытания: {test_area}.")
-        y = ensure_y_space(c, y, 30)
-        y -= 30
-
-        # Раздел 5: Результаты испытания
-        y = ensure_y_space(c, y, 20)
-        c.drawString(50, y, "5.  Результаты испытания:")
-        y -= 20
-
-        y, has_negative_result = self.draw_results_table(c, y)
-
-        # Проверка отключения по превышению тока
-        sc_text = self.short_circuit_label.text().lower()
-        if "сработало по короткому замыканию" in sc_text:
-            discharge_status = "выполнено"
-        else:
-            discharge_status = "не выполнено"
-            has_negative_result = True  # если не сработало — это тоже негативный результат
-
-        y -= 5
-        y = ensure_y_space(c, y, 20)
-        c.drawString(50, y, f"Отключение разряда по превышению тока 50 А: {discharge_status}")
-        y -= 30
-
-        # Раздел 6: Заключение
-        text_width_limit = width - 100  # 50 отступ слева и справа
-
-        conclusion_text = (
-            f"6. Заключение\n"
-            f"Система контроля литий-ионной аккумуляторной батареи {system_name} "
-            f"зав. № {serial_number} прошла проверку на соответствие функциональным требованиям по "
-            f"защите аккумуляторной батареи от перезаряда, переразряда, токов короткого замыкания "
-            f"с {'отрицательным' if has_negative_result else 'положительным'} результатом и "
-            f"{'не ' if has_negative_result else ''}пригодна к использованию по назначению."
-        )
-
-        lines = simpleSplit(conclusion_text, "TimesNewRoman", 12, text_width_limit)
-
-        c.setFont("TimesNewRoman", 12)
-
-        for line in lines:
-            if y < min_y_margin + 20:  
-                c.showPage()
-                c.setFont("TimesNewRoman", 12)
-                y = height - 50
-            c.drawString(50, y, line)
-            y -= 15 
-
-        # Получение ФИО
-        user_info = self.users.get(self.current_user, {})
-        lastname = user_info.get("lastname", "")
-        firstname = user_info.get("firstname", "")
-        middlename = user_info.get("middlename", "")
-        fio_short = f"{lastname} {firstname[:1]}.{middlename[:1]}."
-
-        # Подпись
-        if y < min_y_margin + 60:
-            c.showPage()
-            c.setFont("TimesNewRoman", 12)
-            y = height - 50
-
-        y -= 20
-        c.drawString(50, y, "Испытание проводил:")
-
-        y -= 20
-        c.drawString(50, y, "Инженер:")
-        c.drawRightString(width - 50, y, fio_short)
-
-        y -= 20
-        c.drawString(50, y, "Контролер ОТК:")
-        c.drawRightString(width - 50, y, "Финогенова Е.С.")
+        try:
+            system_name = safe_name(system_name, "Название системы")
+            serial_number = safe_name(serial_number, "Заводской номер")
+        except ValueError as e:
+            QMessageBox.warning(self, "Ошибка", str(e))
+            return
 
-        c.save()
+        self.submit_report(stand, system_name, serial_number)
+        self.confirm_reset()
 
-        # Хеш-файл
-        file_hash = self.calculate_file_hash(filename)
-        log_event(f"Report: {filename}, hash: {file_hash}")
+    def submit_report(self, stand, system_name, serial_number):
+        # Постановка протокола в очередь без диалогов: из окна и из API
+        system_name = safe_name(system_name, "Название системы")
+        serial_number = safe_name(serial_number, "Заводской номер")
 
+        os.makedirs("reports", exist_ok=True)
+        snapshot = make_snapshot(
+            system_name, serial_number, datetime.now(),
+            stand.result if stand.result is not None else TestResult(),
+            self.current_user, self.users.get(self.current_user, {}),
+            test_area=self.test_area_name,
+            bms_model=getattr(self, "bms_model", None),
+        )
+        job = self.report_queue.submit(snapshot)
+        stand.archive_run(serial_number, snapshot.timestamp)
+        return job
+
+    def on_report_job_changed(self, job):
+        for i in range(self.report_jobs_list.count()):
+            item = self.report_jobs_list.item(i)
+            if item.data(Qt.ItemDataRole.UserRole) == job.job_id:
+                item.setText(job.title())
+                return
+        item = QListWidgetItem(job.title())
+        item.setData(Qt.ItemDataRole.UserRole, job.job_id)
+        self.report_jobs_list.insertItem(0, item)
+
+    def on_report_job_finished(self, job):
+        snapshot = job.snapshot
+        log_event(f"Report: {snapshot.filename}, hash: {job.file_hash}")
+        with span("index"):
+            self.catalogue.add(
+                os.path.basename(snapshot.filename), snapshot.system_name, snapshot.serial_number,
+                snapshot.timestamp, verdict=job.passed, operator=snapshot.operator, sha256=job.file_hash,
+                result=snapshot.result
+            )
         self.update_report_list()
-        self.confirm_reset()
+        if self.tab_ready(self.stats_tab):
+            self.stats_view.on_test_indexed()
+
+    def on_report_job_failed(self, job):
+        self.log_event(f"Ошибка формирования протокола {job.snapshot.filename}: {job.error}")
 
-    def draw_results_table(self, c, start_y):
-        from reportlab.platypus import Table, TableStyle
-        from reportlab.lib import colors
-        from reportlab.lib.units import mm
-
-        width, height = A4
-
-        data = [
-            ["№ канала",
-                "Работа при\nнапряжении\nниже 4,2 В",
-                "Отключение при\nнапряжении\nвыше 4,3 В",
-                "Работа при\nнапряжении\nвыше 2,9 В",
-                "Отключение при\nнапряжении\nниже 2,8 В"]
-        ]
-
-        has_negative_result = False
-
-        for i in range(self.detailed_table.rowCount()):
-            row = [str(i + 1)]
-            for j in range(self.detailed_table.columnCount()):
-                item = self.detailed_table.item(i, j)
-                value = item.text() if item else ""
-                if value == "-":
-                    has_negative_result = True
-                row.append(value)
-            data.append(row)
-
-        table = Table(data, colWidths=[20*mm, 40*mm, 40*mm, 40*mm, 40*mm])
-        table.setStyle(TableStyle([
-            ('FONT', (0, 0), (-1, -1), 'TimesNewRoman', 10),
-            ('GRID', (0, 0), (-1, -1), 0.5, colors.black),
-            ('ALIGN', (0, 0), (-1, -1), 'CENTER'),
-            ('VALIGN', (0, 0), (-1, -1), 'MIDDLE'),
-            ('BACKGROUND', (0, 0), (-1, 0), colors.white),
-        ]))
-
-        table.wrapOn(c, 50, start_y)
-        table.drawOn(c, 50, start_y - table._height)
-
-        return start_y - table._height - 40, has_negative_result
-
-    def calculate_file_hash(self, filepath):
-        sha256 = hashlib.sha256()
-        with open(filepath, "rb") as f:
-            while chunk := f.read(8192):
-                sha256.update(chunk)
-        return sha256.hexdigest()
+    def retry_report_job(self):
+        item = self.report_jobs_list.currentItem()
+        if not item:
+            QMessageBox.warning(self, "Ошибка", "Выберите протокол в очереди.")
+            return
+        job = self.report_queue.jobs[item.data(Qt.ItemDataRole.UserRole)]
+        if job.status != "ошибка":
+            QMessageBox.information(self, "Информация", "Повторить можно только протокол с ошибкой.")
+            return
+        self.report_queue.retry(job)
+
+    def closeEvent(self, event):
+        if self.api is not None:
+            self.api.stop()
+        for stand in self.stands:
+            stand.stop()
+        # Дожидаемся протоколов, которые еще формируются
+        self.report_queue.shutdown()
+        if METRICS_FILE:
+            self.export_metrics()
+        if self.tab_ready(self.reports_tab):
+            self.report_model.shutdown()
+        super().closeEvent(event)
 
 
 if __name__ == "__main__":
+    multiprocessing.freeze_support()
     app = QApplication(sys.argv)
     window = MainWindow()
     window.show()
@@ -0,0 +1,192 @@
+import os
+import zlib
+import struct
+import hashlib
+import logging
+import threading
+from datetime import datetime, timedelta
+
+# Архив старых протоколов: PDF дописываются по одному в сегменты
+# archive/reports-NNNNNN.bsa, место каждого (сегмент, смещение, длина)
+# хранится в индексе протоколов. Любой протокол читается одним seek без
+# распаковки остального сегмента, а в папке протоколов остаются только
+# свежие файлы. Сегменты только дописываются; запись самодостаточна
+# (имя, длина, crc32), поэтому сегмент читается и без индекса.
+ARCHIVE_DIR = "archive"
+MAGIC = b"BMSARC01"
+# Запись: сигнатура, способ хранения, длина имени, длина данных, длина PDF, crc32 PDF
+RECORD = struct.Struct("<8sBHIII")
+STORED = 0
+DEFLATED = 1
+# Размер, после которого начинается новый сегмент, байт
+SEGMENT_SIZE = 256 * 2 ** 20
+# Сколько протоколов переносить между записями в индекс
+ARCHIVE_BATCH = 500
+# Протоколы старше стольких дней переносятся в архив автоматически после
+# сверки папки при запуске; 0 — только вручную (batch.py archive)
+ARCHIVE_DAYS = int(os.environ.get("BMS_ARCHIVE_DAYS", "0"))
+
+
+class ArchiveError(Exception):
+    pass
+
+
+def pack_record(name, data):
+    # PDF уже сжаты внутри, поэтому zlib оставляется, только если он помог
+    packed = zlib.compress(data, 6)
+    method = DEFLATED if len(packed) < len(data) else STORED
+    payload = packed if method == DEFLATED else data
+    encoded = name.encode("utf-8")
+    header = RECORD.pack(MAGIC, method, len(encoded), len(payload), len(data), zlib.crc32(data))
+    return header + encoded + payload
+
+
+def unpack_record(record):
+    # (имя, PDF) из записи сегмента
+    if len(record) < RECORD.size:
+        raise ArchiveError("Запись архива обрезана")
+    magic, method, name_size, payload_size, size, crc = RECORD.unpack_from(record)
+    if magic != MAGIC or len(record) != RECORD.size + name_size + payload_size:
+        raise ArchiveError("Повреждена запись архива")
+    name = record[RECORD.size:RECORD.size + name_size].decode("utf-8")
+    payload = record[RECORD.size + name_size:]
+    try:
+        data = zlib.decompress(payload) if method == DEFLATED else payload
+    except zlib.error as e:
+        raise ArchiveError(f"Не удалось распаковать {name}: {e}")
+    if len(data) != size or zlib.crc32(data) != crc:
+        raise ArchiveError(f"Не совпала контрольная сумма {name}")
+    return name, data
+
+
+def iter_segment(path):
+    # Последовательное чтение сегмента: (смещение, имя, PDF) — для проверки
+    # и восстановления индекса без базы
+    with open(path, "rb") as f:
+        offset = 0
+        while header := f.read(RECORD.size):
+            if len(header) < RECORD.size:
+                raise ArchiveError(f"{path}: обрезана запись по смещению {offset}")
+            _, _, name_size, payload_size, _, _ = RECORD.unpack(header)
+            record = header + f.read(name_size + payload_size)
+            name, data = unpack_record(record)
+            yield offset, name, data
+            offset += len(record)
+
+
+class ReportArchive:
+    def __init__(self, catalogue, archive_dir=ARCHIVE_DIR):
+        self.catalogue = catalogue
+        self.archive_dir = archive_dir
+        self._lock = threading.Lock()
+
+    def pack(self, days, progress=None, now=None):
+        # Перенос протоколов старше days дней. Порядок: запись в сегмент и
+        # fsync, отметка в индексе, удаление PDF — при сбое на любом шаге
+        # протокол остается читаемым из папки или из архива. Файлы, хеш
+        # которых не совпал с индексом, не переносятся: их покажет проверка
+        # целостности. Возвращает (перенесено, пропущено).
+        cutoff = (now or datetime.now()) - timedelta(days=days)
+        with self._lock:
+            os.makedirs(self.archive_dir, exist_ok=True)
+            self._remove_leftovers()
+            candidates = self.catalogue.archive_candidates(cutoff.strftime("%Y-%m-%d %H:%M:%S"))
+            packed = skipped = 0
+            segment, f = self._open_segment()
+            try:
+                batch = []
+                for filename, sha256 in candidates:
+                    path = os.path.join(self.catalogue.report_dir, filename)
+                    try:
+                        with open(path, "rb") as source:
+                            data = source.read()
+                    except OSError as e:
+                        logging.warning(f"Архив: не удалось прочитать {filename}: {e}")
+                        skipped += 1
+                        continue
+                    if sha256 and hashlib.sha256(data).hexdigest() != sha256:
+                        logging.warning(f"Архив: {filename} не совпадает с хешем из индекса, оставлен в папке")
+                        skipped += 1
+                        continue
+                    if f.tell() >= SEGMENT_SIZE:
+                        self._commit(f, batch)
+                        packed += len(batch)
+                        batch = []
+                        f.close()
+                        segment, f = self._open_segment(new=True)
+                    record = pack_record(filename, data)
+                    batch.append((filename, segment, f.tell(), len(record)))
+                    f.write(record)
+                    if len(batch) >= ARCHIVE_BATCH:
+                        self._commit(f, batch)
+                        packed += len(batch)
+                        batch = []
+                        if progress is not None:
+                            progress(packed, len(candidates))
+                self._commit(f, batch)
+                packed += len(batch)
+            finally:
+                f.close()
+            if progress is not None:
+                progress(packed, len(candidates))
+            return packed, skipped
+
+    def read(self, filename):
+        # PDF протокола из архива; KeyError, если протокол не в архиве
+        location = self.catalogue.archive_location(filename)
+        if location is None:
+            raise KeyError(filename)
+        segment, offset, length, sha256 = location
+        with open(os.path.join(self.archive_dir, segment), "rb") as f:
+            f.seek(offset)
+            name, data = unpack_record(f.read(length))
+        if name != filename or (sha256 and hashlib.sha256(data).hexdigest() != sha256):
+            raise ArchiveError(f"Архив: запись {filename} не совпадает с индексом")
+        return data
+
+    def extract(self, filename, out_dir):
+        os.makedirs(out_dir, exist_ok=True)
+        path = os.path.join(out_dir, filename)
+        with open(path, "wb") as f:
+            f.write(self.read(filename))
+        return path
+
+    def segments(self):
+        if not os.path.isdir(self.archive_dir):
+            return []
+        return sorted(name for name in os.listdir(self.archive_dir) if name.endswith(".bsa"))
+
+    def _open_segment(self, new=False):
+        # Дозапись в последний сегмент, пока он меньше SEGMENT_SIZE
+        segments = self.segments()
+        number = int(segments[-1][8:14]) if segments else 0
+        if new or not segments or os.path.getsize(os.path.join(self.archive_dir, segments[-1])) >= SEGMENT_SIZE:
+            number += 1
+        segment = f"reports-{number:06d}.bsa"
+        f = open(os.path.join(self.archive_dir, segment), "ab")
+        return segment, f
+
+    def _commit(self, f, batch):
+        if not batch:
+            return
+        f.flush()
+        os.fsync(f.fileno())
+        self.catalogue.mark_archived([(segment, offset, length, filename) for filename, segment, offset, length in batch])
+        for filename, _, _, _ in batch:
+            self._remove(filename)
+
+    def _remove_leftovers(self):
+        # PDF, которые уже в архиве, но не были удалены из-за сбоя
+        archived = self.catalogue.archived_filenames()
+        if not archived or not os.path.isdir(self.catalogue.report_dir):
+            return
+        with os.scandir(self.catalogue.report_dir) as entries:
+            for entry in entries:
+                if entry.name in archived:
+                    self._remove(entry.name)
+
+    def _remove(self, filename):
+        try:
+            os.remove(os.path.join(self.catalogue.report_dir, filename))
+        except FileNotFoundError:
+            pass
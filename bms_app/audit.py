@@ -0,0 +1,230 @@
+import os
+import re
+import sys
+import glob
+import atexit
+import queue
+import hashlib
+import logging
+import threading
+from datetime import datetime
+
+# Журнал аудита: строки "[время] УРОВЕНЬ сообщение\tцепочка", где цепочка —
+# SHA-256 от предыдущей цепочки и текста строки. Изменение или удаление
+# любой строки (в том числе хеша протокола) ломает цепочку до конца журнала.
+LOG_PATH = "log.txt"
+MAX_BYTES = 5 * 1024 * 1024
+# Сколько записей писать за один проход фонового потока
+BATCH_SIZE = 256
+# Блок чтения журнала с конца при поиске последнего звена
+TAIL_BLOCK = 4096
+GENESIS = "0" * 64
+CHAIN_RE = re.compile(r"\t([0-9a-f]{64})$")
+
+
+def chain_hash(previous, line):
+    return hashlib.sha256(f"{previous}{line}".encode("utf-8")).hexdigest()
+
+
+def log_files(path=LOG_PATH):
+    # Архивные части журнала (log.ГГГГММДД-ЧЧММСС-мкс.txt) и текущий файл по порядку
+    root, ext = os.path.splitext(path)
+    files = sorted(glob.glob(f"{glob.escape(root)}.[0-9]*{ext}"))
+    if os.path.exists(path):
+        files.append(path)
+    return files
+
+
+class AuditLog:
+    # Запись из любого потока — только постановка в очередь; открытие,
+    # запись, ротацию и хеширование выполняет фоновый поток пачками.
+    def __init__(self, path=LOG_PATH, max_bytes=MAX_BYTES):
+        self.path = path
+        self.max_bytes = max_bytes
+        self._queue = queue.SimpleQueue()
+        self._thread = None
+        self._start_lock = threading.Lock()
+        self._file = None
+        self._day = None
+        self._chain = None
+        self._last_error = None
+
+    def log(self, message, level="INFO"):
+        # Время фиксируется в момент события, а не записи
+        timestamp = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+        text = " ".join(str(message).splitlines())
+        self._queue.put((timestamp, level, text))
+        if self._thread is None:
+            self._start()
+
+    def flush(self, timeout=None):
+        # Дождаться записи всего, что поставлено в очередь
+        if self._thread is None:
+            return
+        done = threading.Event()
+        self._queue.put(done)
+        done.wait(timeout)
+
+    def close(self):
+        if self._thread is None:
+            return
+        self._queue.put(None)
+        self._thread.join()
+        self._thread = None
+
+    def _start(self):
+        with self._start_lock:
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._run, name="audit-log", daemon=True)
+                self._thread.start()
+
+    def _run(self):
+        self._chain = last_chain(self.path)
+        running = True
+        while running:
+            items = [self._queue.get()]
+            while len(items) < BATCH_SIZE:
+                try:
+                    items.append(self._queue.get_nowait())
+                except queue.Empty:
+                    break
+            records = []
+            events = []
+            for item in items:
+                if item is None:
+                    running = False
+                elif isinstance(item, threading.Event):
+                    events.append(item)
+                else:
+                    records.append(item)
+            try:
+                self._write(records)
+                self._last_error = None
+            except OSError as e:
+                # Сообщение через logging тоже попадает в этот журнал, поэтому
+                # одна и та же ошибка пишется один раз, пока запись не наладится
+                message = str(e)
+                if message != self._last_error:
+                    self._last_error = message
+                    logging.error(f"Ошибка записи журнала {self.path}: {message}")
+            for event in events:
+                event.set()
+        if self._file:
+            self._file.close()
+            self._file = None
+
+    def _write(self, records):
+        # Цепочка продвигается только после записи: строки, которые не удалось
+        # записать, не становятся звеньями для следующих
+        if not records:
+            return
+        chain = self._chain
+        lines = []
+        for timestamp, level, text in records:
+            day = timestamp[:10]
+            if self._file is None:
+                self._open()
+            if day > self._day or self._file.tell() >= self.max_bytes:
+                if lines:
+                    self._file.write("".join(lines))
+                    self._file.flush()
+                    self._chain = chain
+                    lines = []
+                self._rotate()
+                self._day = day
+            line = f"[{timestamp}] {level} {text}"
+            chain = chain_hash(chain, line)
+            lines.append(f"{line}\t{chain}\n")
+        self._file.write("".join(lines))
+        self._file.flush()
+        self._chain = chain
+
+    def _open(self):
+        self._file = open(self.path, "a", encoding="utf-8")
+        if self._file.tell():
+            self._day = datetime.fromtimestamp(os.path.getmtime(self.path)).strftime("%Y-%m-%d")
+        else:
+            self._day = datetime.now().strftime("%Y-%m-%d")
+
+    def _rotate(self):
+        # Цепочка продолжается в новом файле, поэтому части проверяются подряд
+        self._file.close()
+        if os.path.getsize(self.path):
+            root, ext = os.path.splitext(self.path)
+            # Имя с микросекундами: архивные части сортируются по времени
+            stamp = datetime.now().strftime("%Y%m%d-%H%M%S-%f")
+            os.replace(self.path, f"{root}.{stamp}{ext}")
+        self._file = open(self.path, "a", encoding="utf-8")
+
+
+def last_chain(path=LOG_PATH):
+    # Последнее звено берется из последней строки с цепочкой в последнем
+    # непустом файле журнала. Файл читается с конца блоками: начало блока
+    # дочитывается со следующим, поэтому длинная строка не обрезается.
+    for filename in reversed(log_files(path)):
+        with open(filename, "rb") as f:
+            position = f.seek(0, os.SEEK_END)
+            rest = b""
+            while position > 0:
+                size = min(TAIL_BLOCK, position)
+                position -= size
+                f.seek(position)
+                lines = (f.read(size) + rest).split(b"\n")
+                rest = lines.pop(0) if position > 0 else b""
+                for line in reversed(lines):
+                    match = CHAIN_RE.search(line.decode("utf-8", errors="replace"))
+                    if match:
+                        return match.group(1)
+    return GENESIS
+
+
+def verify_chain(path=LOG_PATH):
+    # Возвращает (проверено строк, [(файл, номер строки), ...] с нарушениями).
+    # Строки старого формата без цепочки пропускаются; после нарушения
+    # проверка продолжается от записанного в файле звена.
+    checked = 0
+    broken = []
+    chain = GENESIS
+    for filename in log_files(path):
+        with open(filename, encoding="utf-8", errors="replace") as f:
+            for number, raw in enumerate(f, 1):
+                line = raw.rstrip("\n")
+                match = CHAIN_RE.search(line)
+                if not match:
+                    continue
+                text = line[:match.start()]
+                if chain_hash(chain, text) != match.group(1):
+                    broken.append((filename, number))
+                chain = match.group(1)
+                checked += 1
+    return checked, broken
+
+
+class AuditHandler(logging.Handler):
+    # Направляет стандартный logging в тот же журнал аудита
+    def emit(self, record):
+        try:
+            _audit.log(self.format(record), record.levelname)
+        except Exception:
+            self.handleError(record)
+
+
+_audit = AuditLog()
+atexit.register(_audit.close)
+
+
+def log_event(message, level="INFO"):
+    _audit.log(message, level)
+
+
+def flush():
+    _audit.flush()
+
+
+if __name__ == "__main__":
+    # Проверка целостности журнала: python audit.py [log.txt]
+    checked, broken = verify_chain(sys.argv[1] if len(sys.argv) > 1 else LOG_PATH)
+    for filename, number in broken:
+        print(f"{filename}:{number}: цепочка нарушена")
+    print(f"Проверено записей: {checked}, нарушений: {len(broken)}")
+    sys.exit(1 if broken else 0)
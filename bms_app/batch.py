@@ -0,0 +1,293 @@
+# Пакетная обработка без графического интерфейса.
+#   python batch.py render --from 2025-05-01 --to 2025-05-31
+#   python batch.py render --file results.jsonl
+#   python batch.py verify [--full]
+#   python batch.py export results.parquet --from 2025-01-01 --verdict fail
+#   python batch.py archive --days 90 [--check]
+#   python batch.py extract SN001234 --out extracted
+#   python batch.py lot lot_2025_05.pdf --name 2025-05 --from 2025-05-01 --to 2025-05-31
+import os
+import sys
+import json
+import math
+import shutil
+import argparse
+from array import array
+from datetime import datetime
+from concurrent.futures import ProcessPoolExecutor, FIRST_COMPLETED, wait
+
+from audit import log_event
+from catalogue import ReportCatalogue
+from integrity import verify_archive, describe
+from export import export_results, export_format, FORMATS
+from archive import ReportArchive, ArchiveError, iter_segment
+from report import make_snapshot, render_report, write_lot_protocol
+from results import TestResult, CHANNELS, CHECKS
+from userstore import UserStore
+
+
+def load_settings():
+    store = UserStore()
+    try:
+        return store.users, store.setting("test_area_name")
+    finally:
+        store.close()
+
+
+def snapshots_from_catalogue(catalogue, users, test_area, **filters):
+    # Перегенерация по индексу: файл протокола перезаписывается под тем же именем
+    for entry, result in catalogue.iter_results(**filters):
+        if result is None:
+            print(f"Пропущен {entry.filename}: в индексе нет результатов испытания", file=sys.stderr)
+            continue
+        moment = datetime.strptime(entry.timestamp, "%Y-%m-%d %H:%M:%S")
+        yield make_snapshot(
+            entry.system_name, entry.serial_number, moment, result,
+            entry.operator, users.get(entry.operator, {}), test_area=test_area,
+            filename=os.path.join(catalogue.report_dir, entry.filename).replace(os.sep, "/"),
+        )
+
+
+def snapshots_from_file(path, users, test_area):
+    # Одна строка JSON на испытание: system_name, serial_number, timestamp,
+    # operator, checks (8×4 из 0/1), short_circuit, необязательно measurements
+    with open(path, "r", encoding="utf-8") as f:
+        for line in f:
+            if not line.strip():
+                continue
+            record = json.loads(line)
+            checks = record["checks"]
+            if checks is None:
+                # Выгрузка batch.py export: протокол без результатов испытания
+                print(f"Пропущен {record.get('filename')}: нет результатов испытания", file=sys.stderr)
+                continue
+            if checks and isinstance(checks[0], list):
+                checks = [value for channel in checks for value in channel]
+            result = TestResult(
+                record.get("test_id", 0), "", record.get("duration", 0.0), record.get("short_circuit"),
+                array("b", checks),
+                array("f", [math.nan if value is None else value for value in record["measurements"]])
+                if record.get("measurements") is not None else None,
+            )
+            if len(result.checks) != CHANNELS * CHECKS:
+                raise ValueError(f"Ожидается {CHANNELS * CHECKS} проверок: {line.strip()}")
+            moment = datetime.strptime(record["timestamp"], "%Y-%m-%d %H:%M:%S")
+            operator = record.get("operator") or ""
+            yield make_snapshot(
+                record["system_name"], record["serial_number"], moment, result,
+                operator, users.get(operator, {}), test_area=test_area,
+            )
+
+
+def render_batch(snapshots, catalogue, jobs=None):
+    # Рендер на всех ядрах; в работе не больше jobs * 4 протоколов, поэтому
+    # выборку любого размера можно подавать генератором. Индекс пишет
+    # только этот процесс.
+    jobs = jobs or os.cpu_count()
+    done = failed = 0
+    pending = {}
+    snapshots = iter(snapshots)
+    os.makedirs(catalogue.report_dir, exist_ok=True)
+    with ProcessPoolExecutor(jobs) as pool:
+        while True:
+            for snapshot in snapshots:
+                pending[pool.submit(render_report, snapshot)] = snapshot
+                if len(pending) >= jobs * 4:
+                    break
+            if not pending:
+                break
+            finished, _ = wait(pending, return_when=FIRST_COMPLETED)
+            for future in finished:
+                snapshot = pending.pop(future)
+                try:
+                    filename, file_hash, passed = future.result()
+                except Exception as e:
+                    failed += 1
+                    print(f"Ошибка {snapshot.filename}: {e}", file=sys.stderr)
+                    continue
+                done += 1
+                log_event(f"Report: {filename}, hash: {file_hash}")
+                catalogue.add(
+                    os.path.basename(filename), snapshot.system_name, snapshot.serial_number,
+                    snapshot.timestamp, verdict=passed, operator=snapshot.operator,
+                    sha256=file_hash, result=snapshot.result
+                )
+    return done, failed
+
+
+def parse_date(text):
+    return datetime.strptime(text, "%Y-%m-%d").date()
+
+
+def add_filter_arguments(parser):
+    parser.add_argument("--serial", default="", help="префикс заводского номера")
+    parser.add_argument("--from", dest="date_from", type=parse_date, help="с даты ГГГГ-ММ-ДД")
+    parser.add_argument("--to", dest="date_to", type=parse_date, help="по дату ГГГГ-ММ-ДД")
+    parser.add_argument("--verdict", choices=["pass", "fail"])
+
+
+def filters_from_args(args):
+    return {
+        "serial_prefix": args.serial,
+        "date_from": args.date_from,
+        "date_to": args.date_to,
+        "verdict": None if args.verdict is None else args.verdict == "pass",
+    }
+
+
+def command_render(args):
+    catalogue = ReportCatalogue()
+    users, test_area = load_settings()
+    if args.file:
+        snapshots = snapshots_from_file(args.file, users, test_area)
+    else:
+        snapshots = snapshots_from_catalogue(catalogue, users, test_area, **filters_from_args(args))
+    done, failed = render_batch(snapshots, catalogue, args.jobs)
+    print(f"Сформировано протоколов: {done}, ошибок: {failed}")
+    return 1 if failed else 0
+
+
+def command_verify(args):
+    catalogue = ReportCatalogue()
+    report = verify_archive(catalogue, full=args.full, jobs=args.jobs)
+    for line in describe(report):
+        print(line)
+    log_event(
+        f"Проверка целостности архива: совпадает {len(report.ok)}, изменено {len(report.modified)}, "
+        f"отсутствует {len(report.missing)}, без хеша {len(report.unregistered)}"
+    )
+    return 1 if report.modified or report.missing or report.unregistered or report.failed else 0
+
+
+def command_export(args):
+    try:
+        fmt = export_format(args.path, args.format)
+    except (ValueError, RuntimeError) as e:
+        print(e, file=sys.stderr)
+        return 2
+    catalogue = ReportCatalogue()
+    progress = lambda count: print(f"Выгружено: {count}", file=sys.stderr, flush=True)
+    count = export_results(catalogue, args.path, fmt, progress, **filters_from_args(args))
+    print(f"Выгружено записей: {count} в {args.path}")
+    return 0
+
+
+def command_archive(args):
+    catalogue = ReportCatalogue()
+    archive = ReportArchive(catalogue)
+    if args.check:
+        # Полное чтение сегментов с проверкой crc32 каждой записи
+        records = errors = 0
+        for segment in archive.segments():
+            try:
+                for _ in iter_segment(os.path.join(archive.archive_dir, segment)):
+                    records += 1
+            except ArchiveError as e:
+                errors += 1
+                print(f"{segment}: {e}", file=sys.stderr)
+        print(f"Сегментов: {len(archive.segments())}, записей: {records}, ошибок: {errors}")
+        return 1 if errors else 0
+    catalogue.rescan()
+    progress = lambda done, total: print(f"Перенесено: {done} из {total}", file=sys.stderr, flush=True)
+    packed, skipped = archive.pack(args.days, progress)
+    log_event(f"Архив протоколов старше {args.days} дн.: перенесено {packed}, пропущено {skipped}")
+    print(f"Перенесено в архив: {packed}, пропущено: {skipped}")
+    return 1 if skipped else 0
+
+
+def command_extract(args):
+    # Протоколы по заводскому номеру (или имени файла) из папки или архива
+    catalogue = ReportCatalogue()
+    archive = ReportArchive(catalogue)
+    entry = catalogue.get(args.serial)
+    if entry is not None:
+        entries = [entry]
+    else:
+        key = args.serial.lower()
+        entries = [e for e in catalogue.query(serial_prefix=args.serial) if e.serial_number.lower() == key]
+    if not entries:
+        print(f"Нет протоколов для {args.serial}", file=sys.stderr)
+        return 1
+    os.makedirs(args.out, exist_ok=True)
+    for entry in entries:
+        if entry.archive_segment:
+            path = archive.extract(entry.filename, args.out)
+        else:
+            path = shutil.copy(os.path.join(catalogue.report_dir, entry.filename), args.out)
+        print(path)
+    return 0
+
+
+def command_lot(args):
+    # Два прохода по выборке: сводная таблица с итогами и протоколы изделий.
+    # Проходы по индексу читают один снимок, поэтому протокол, внесенный в
+    # индекс во время формирования, не собьет итоги. Из индекса берутся
+    # только протоколы с сохраненными результатами.
+    catalogue = ReportCatalogue()
+    users, test_area = load_settings()
+    name = args.name or os.path.splitext(os.path.basename(args.path))[0]
+
+    def write(source):
+        return write_lot_protocol(args.path, name, source(), source())
+
+    try:
+        if args.file:
+            count, passed = write(lambda: snapshots_from_file(args.file, users, test_area))
+        else:
+            filters = filters_from_args(args)
+            with catalogue.snapshot() as db:
+                count, passed = write(
+                    lambda: snapshots_from_catalogue(catalogue, users, test_area, snapshot=db, **filters)
+                )
+    except ValueError as e:
+        print(e, file=sys.stderr)
+        return 1
+    log_event(f"Протокол партии {name}: {args.path}, изделий {count}, годных {passed}")
+    print(f"Протокол партии {args.path}: изделий {count}, годных {passed}")
+    return 0
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Пакетная обработка протоколов испытаний СКУ ЛИАБ")
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    render = commands.add_parser("render", help="сформировать протоколы по индексу или файлу результатов")
+    add_filter_arguments(render)
+    render.add_argument("--file", help="файл JSON Lines с результатами испытаний")
+    render.add_argument("--jobs", type=int, help="число процессов (по умолчанию — все ядра)")
+    render.set_defaults(handler=command_render)
+
+    verify = commands.add_parser("verify", help="сверить файлы протоколов с хешами из индекса")
+    verify.add_argument("--full", action="store_true", help="перечитать и неизмененные файлы")
+    verify.add_argument("--jobs", type=int, help="число потоков хеширования")
+    verify.set_defaults(handler=command_verify)
+
+    export = commands.add_parser("export", help="выгрузить результаты испытаний из индекса в файл")
+    export.add_argument("path", help="файл .csv, .jsonl или .parquet")
+    add_filter_arguments(export)
+    export.add_argument("--format", choices=sorted(set(FORMATS.values())), help="по умолчанию — по расширению файла")
+    export.set_defaults(handler=command_export)
+
+    archive = commands.add_parser("archive", help="перенести старые протоколы в сжатый архив")
+    archive.add_argument("--days", type=int, default=90, help="переносить протоколы старше стольких дней")
+    archive.add_argument("--check", action="store_true", help="только проверить сегменты архива")
+    archive.set_defaults(handler=command_archive)
+
+    extract = commands.add_parser("extract", help="извлечь протоколы по заводскому номеру")
+    extract.add_argument("serial", help="заводской номер или имя файла протокола")
+    extract.add_argument("--out", default="extracted", help="папка для извлеченных протоколов")
+    extract.set_defaults(handler=command_extract)
+
+    lot = commands.add_parser("lot", help="сводный протокол партии в одном PDF")
+    lot.add_argument("path", help="файл PDF")
+    lot.add_argument("--name", help="обозначение партии (по умолчанию — имя файла)")
+    add_filter_arguments(lot)
+    lot.add_argument("--file", help="файл JSON Lines с результатами испытаний")
+    lot.set_defaults(handler=command_lot)
+
+    args = parser.parse_args(argv)
+    return args.handler(args)
+
+
+if __name__ == "__main__":
+    sys.exit(main())
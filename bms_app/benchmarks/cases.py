@@ -0,0 +1,225 @@
+# Замеры: каждый возвращает словарь метрика -> значение. Суффикс имени
+# метрики задает единицу и направление: _ms, _s, _mb, _kb — чем меньше,
+# тем лучше; _mbps, _per_s — чем больше, тем лучше.
+import os
+import time
+import timeit
+import tracemalloc
+from datetime import datetime, timedelta
+
+BENCH_SEED = 1
+# Операции короче миллисекунды повторяются, пока один замер не займет
+# MIN_TIME, с; из BEST_OF замеров берется лучший. Замеры через модели и
+# сигналы Qt однократные: их шум покрывает абсолютный допуск run.py.
+MIN_TIME = 0.1
+BEST_OF = 5
+
+
+def wait_until(app, condition, timeout=30.0):
+    deadline = time.perf_counter() + timeout
+    while not condition():
+        if time.perf_counter() > deadline:
+            raise TimeoutError("Замер не дождался ответа")
+        app.processEvents()
+        time.sleep(0.001)
+
+
+def best_time(fn, min_time=MIN_TIME, repeat=BEST_OF):
+    # Время одного вызова fn, с: как timeit.autorange, но с порогом min_time
+    timer = timeit.Timer(fn)
+    number = 1
+    while (elapsed := timer.timeit(number)) < min_time:
+        number = max(number * 2, int(number * min_time / max(elapsed, 1e-9) * 1.2))
+    return min([elapsed, *timer.repeat(repeat - 1, number)]) / number
+
+
+def bench_ingest(app, count=100):
+    # Прием результата стендом (StandSession.on_test_received, запись в
+    # сегмент измерений, сброс) и перерисовка таблицы результатов
+    from PySide6.QtWidgets import QTableView
+    from emulator import iter_results
+    from result_model import ResultTableModel
+    from stand import StandSession
+
+    results = [result for _, result in iter_results(count, BENCH_SEED)]
+    stand = StandSession("Замер", "emu://healthy")
+    stand.device_connected = True
+    model = ResultTableModel()
+    view = QTableView()
+    view.setModel(model)
+    view.resize(700, 320)
+    view.show()
+    stand.changed.connect(lambda session: model.set_result(session.result))
+
+    started = time.perf_counter()
+    for result in results:
+        stand.on_test_received(result)
+        stand.reset()
+    ingest = time.perf_counter() - started
+
+    started = time.perf_counter()
+    for result in results:
+        model.set_result(result)
+        view.viewport().repaint()
+    table = time.perf_counter() - started
+    view.close()
+    stand.recorder.close()
+    return {
+        "ingest_ms": ingest / count * 1000,
+        "table_update_ms": table / count * 1000,
+    }
+
+
+def bench_render(app, count=30):
+    # Формирование протокола: время, пиковая память Python и размер файла
+    from emulator import iter_results
+    from report import make_snapshot, render_report
+
+    os.makedirs("reports", exist_ok=True)
+    moment = datetime(2025, 1, 1, 8, 0)
+    snapshots = [
+        make_snapshot("СКУ", f"R{i:05d}", moment + timedelta(seconds=i), result, "Default", {"role": "admin"})
+        for i, (_, result) in enumerate(iter_results(count + 5, BENCH_SEED))
+    ]
+    # Первый протокол регистрирует шрифты и строит кэши, в замер он не входит
+    render_report(snapshots[0])
+    started = time.perf_counter()
+    for snapshot in snapshots[5:]:
+        render_report(snapshot)
+    elapsed = time.perf_counter() - started
+
+    peak = 0
+    for snapshot in snapshots[1:5]:
+        tracemalloc.start()
+        render_report(snapshot)
+        peak = max(peak, tracemalloc.get_traced_memory()[1])
+        tracemalloc.stop()
+    sizes = [os.path.getsize(snapshot.filename) for snapshot in snapshots[5:]]
+    return {
+        "render_ms": elapsed / count * 1000,
+        "render_peak_mb": peak / 2 ** 20,
+        "report_kb": sum(sizes) / len(sizes) / 1024,
+    }
+
+
+def bench_hash(app, size_mb=64, files=500):
+    # Хеширование протоколов: один большой файл и много файлов размера протокола
+    from integrity import hash_file
+
+    with open("large.bin", "wb") as f:
+        f.write(os.urandom(size_mb * 2 ** 20))
+    hash_file("large.bin")
+    started = time.perf_counter()
+    for _ in range(3):
+        hash_file("large.bin")
+    large = time.perf_counter() - started
+
+    os.makedirs("small", exist_ok=True)
+    paths = []
+    for i in range(files):
+        path = os.path.join("small", f"{i}.pdf")
+        with open(path, "wb") as f:
+            f.write(os.urandom(30 * 1024))
+        paths.append(path)
+    started = time.perf_counter()
+    for path in paths:
+        hash_file(path)
+    small = time.perf_counter() - started
+    return {
+        "hash_mbps": 3 * size_mb / large,
+        "hash_files_per_s": files / small,
+    }
+
+
+def make_report_dir(report_dir, count):
+    os.makedirs(report_dir, exist_ok=True)
+    moment = datetime(2025, 1, 1, 8, 0)
+    for i in range(count):
+        stamp = (moment + timedelta(minutes=i)).strftime("%Y%m%d_%H%M%S")
+        with open(os.path.join(report_dir, f"report_СКУ_SN{i:06d}_{stamp}.pdf"), "wb") as f:
+            f.write(b"%PDF-1.4\n")
+
+
+def bench_report_list(app, size=1000):
+    # Список протоколов на папке из size файлов: построение индекса,
+    # повторная сверка, первая страница списка, поиск по номеру, прокрутка
+    from catalogue import ReportCatalogue
+    from report_model import ReportListModel
+
+    report_dir = f"reports_{size}"
+    make_report_dir(report_dir, size)
+    catalogue = ReportCatalogue(report_dir, f"{report_dir}.db")
+
+    started = time.perf_counter()
+    catalogue.rescan(log_path=None)
+    rescan = time.perf_counter() - started
+    rescan_noop = best_time(lambda: catalogue.rescan(log_path=None))
+
+    model = ReportListModel(catalogue)
+    started = time.perf_counter()
+    model.set_filter()
+    wait_until(app, lambda: model.rowCount() > 0)
+    first_page = time.perf_counter() - started
+
+    started = time.perf_counter()
+    model.set_filter(serial_prefix=f"SN{size // 2:06d}"[:-1])
+    wait_until(app, lambda: 0 < model.rowCount() <= 10)
+    search = time.perf_counter() - started
+
+    model.set_filter()
+    wait_until(app, lambda: model.rowCount() > 10)
+    started = time.perf_counter()
+    pages = 0
+    while model.canFetchMore() and pages < 20:
+        # Страница читается в потоке модели — ждем, пока строки добавятся
+        rows = model.rowCount()
+        model.fetchMore()
+        wait_until(app, lambda: model.rowCount() > rows or not model.canFetchMore())
+        pages += 1
+    scroll = (time.perf_counter() - started) / max(pages, 1)
+    return {
+        "rescan_s": rescan,
+        "rescan_noop_ms": rescan_noop * 1000,
+        "first_page_ms": first_page * 1000,
+        "search_ms": search * 1000,
+        "fetch_page_ms": scroll * 1000,
+    }
+
+
+def bench_stats(app, size=1000):
+    # Статистика по size испытаниям: прибавление испытания к счетчикам и
+    # выборки вкладки «Статистика» за месяц и за все время
+    from catalogue import ReportCatalogue, update_stats
+    from emulator import iter_results
+
+    results = [result for _, result in iter_results(200, BENCH_SEED)]
+    catalogue = ReportCatalogue("reports", "stats.db")
+    db = catalogue.connection()
+    moment = datetime(2025, 1, 1, 8, 0)
+    started = time.perf_counter()
+    with db:
+        for i in range(size):
+            result = results[i % len(results)]
+            stamp = (moment + timedelta(minutes=5 * i)).strftime("%Y-%m-%d %H:%M:%S")
+            update_stats(db, f"СКУ-{i % 3}", stamp, result.passed, f"Оператор {i % 5}", result)
+    update = (time.perf_counter() - started) / size
+
+    since = moment + timedelta(minutes=5 * size) - timedelta(days=30)
+    return {
+        "stats_update_ms": update * 1000,
+        "stats_month_ms": best_time(lambda: catalogue.stats(since=since)) * 1000,
+        "stats_all_ms": best_time(lambda: catalogue.stats()) * 1000,
+        "stats_by_day_ms": best_time(lambda: catalogue.stats_by("day")) * 1000,
+    }
+
+
+# Замеры, зависящие от размера архива, выполняются для каждого --sizes
+CASES = {
+    "ingest": bench_ingest,
+    "render": bench_render,
+    "hash": bench_hash,
+    "report_list": bench_report_list,
+    "stats": bench_stats,
+}
+SIZED_CASES = {"report_list", "stats"}
+DEFAULT_SIZES = (1000, 10000, 100000)
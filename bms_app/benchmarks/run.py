@@ -0,0 +1,139 @@
+# Замеры производительности без экрана (QT_QPA_PLATFORM=offscreen).
+#   python benchmarks/run.py                          — все замеры, сравнение с baseline.json
+#   python benchmarks/run.py report_list --sizes 1000 10000
+#   python benchmarks/run.py --update                 — сохранить результаты как базовые
+# Результат хуже базового больше чем в --tolerance раз и больше чем на
+# абсолютный допуск ABSOLUTE_TOLERANCE считается регрессией, тогда код
+# возврата 1. Допуск отсекает шум у коротких замеров: разница в сотые доли
+# миллисекунды — не регрессия, во сколько бы раз она ни была. Сами короткие
+# операции повторяются, пока замер не займет не меньше cases.MIN_TIME.
+#
+# Базовые значения — абсолютное время на конкретной машине. Их пересчитывают
+# на той машине, где запускается сравнение, на незагруженной системе и с
+# теми же --sizes: после смены машины, обновления Python/Qt/SQLite или
+# намеренного изменения скорости. --update дописывает в baseline.json
+# только выполненные замеры, поэтому можно пересчитать и один:
+#   python benchmarks/run.py stats --update
+import os
+import sys
+import json
+import shutil
+import argparse
+import tempfile
+import subprocess
+
+os.environ.setdefault("QT_QPA_PLATFORM", "offscreen")
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from cases import CASES, SIZED_CASES, DEFAULT_SIZES
+
+BASELINE = os.path.join(os.path.dirname(os.path.abspath(__file__)), "baseline.json")
+TOLERANCE = 1.5
+REPEAT = 3
+HIGHER_IS_BETTER = ("_mbps", "_per_s")
+# Абсолютный допуск по единице метрики: меньшее ухудшение не считается
+# регрессией при любом отношении к базовому. Пропускная способность
+# (_mbps, _per_s) меряется на долгих прогонах и сравнивается только отношением.
+ABSOLUTE_TOLERANCE = {"_ms": 0.2, "_s": 0.05, "_mb": 0.5, "_kb": 2.0}
+
+
+def run_case(name, size=None):
+    # Выполняется в дочернем процессе, результат — JSON в stdout
+    from PySide6.QtWidgets import QApplication
+
+    app = QApplication.instance() or QApplication(sys.argv[:1])
+    kwargs = {} if size is None else {"size": size}
+    print(json.dumps(CASES[name](app, **kwargs)))
+
+
+def higher_is_better(metric):
+    return metric.split("@")[0].endswith(HIGHER_IS_BETTER)
+
+
+def absolute_tolerance(metric):
+    unit = "_" + metric.split("@")[0].rsplit("_", 1)[-1]
+    return 0.0 if higher_is_better(metric) else ABSOLUTE_TOLERANCE.get(unit, 0.0)
+
+
+def better(metric, a, b):
+    return max(a, b) if higher_is_better(metric) else min(a, b)
+
+
+def run_cases(names, sizes, repeat=REPEAT):
+    # Каждый замер — в отдельном процессе и в своей временной папке, чтобы
+    # кэши, память и файлы одного замера не влияли на другой. Из повторов
+    # берется лучший результат: он меньше всего зависит от фоновой нагрузки.
+    results = {}
+    for name in names:
+        for size in sizes if name in SIZED_CASES else [None]:
+            suffix = "" if size is None else f"@{size}"
+            print(f"{name}{suffix}...", file=sys.stderr, flush=True)
+            command = [sys.executable, os.path.abspath(__file__), "--child", name]
+            if size is not None:
+                command += ["--size", str(size)]
+            for _ in range(repeat):
+                work = tempfile.mkdtemp(prefix="bms_bench_")
+                try:
+                    output = subprocess.run(command, cwd=work, stdout=subprocess.PIPE, check=True).stdout
+                finally:
+                    shutil.rmtree(work, ignore_errors=True)
+                metrics = results.setdefault(name, {})
+                for metric, value in json.loads(output.decode("utf-8").strip().splitlines()[-1]).items():
+                    metric += suffix
+                    value = round(value, 4)
+                    metrics[metric] = better(metric, metrics[metric], value) if metric in metrics else value
+    return results
+
+
+def compare(results, baseline, tolerance):
+    # Строки отчета и число регрессий
+    lines, regressions = [], 0
+    for name, metrics in results.items():
+        for metric, value in metrics.items():
+            base = baseline.get(name, {}).get(metric)
+            if not base:
+                lines.append(f"{name:12} {metric:26} {value:12.4f}   (нет базового)")
+                continue
+            # Во сколько раз хуже базового (меньше 1 — лучше)
+            ratio = base / value if higher_is_better(metric) else value / base
+            noise = abs(value - base) <= absolute_tolerance(metric)
+            status = "РЕГРЕССИЯ" if ratio > tolerance and not noise else "ok"
+            regressions += status != "ok"
+            lines.append(f"{name:12} {metric:26} {value:12.4f} {base:12.4f} ×{ratio:5.2f} {status}")
+    return lines, regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Замеры производительности")
+    parser.add_argument("cases", nargs="*", choices=[[], *CASES], help="по умолчанию — все")
+    parser.add_argument("--sizes", nargs="+", type=int, default=DEFAULT_SIZES, help="число протоколов (испытаний) в архиве")
+    parser.add_argument("--baseline", default=BASELINE)
+    parser.add_argument("--tolerance", type=float, default=TOLERANCE)
+    parser.add_argument("--update", action="store_true", help="записать результаты в базовые")
+    parser.add_argument("--child", help=argparse.SUPPRESS)
+    parser.add_argument("--size", type=int, help=argparse.SUPPRESS)
+    args = parser.parse_args()
+    if args.child:
+        run_case(args.child, args.size)
+        return 0
+
+    results = run_cases(args.cases or list(CASES), args.sizes)
+    baseline = {}
+    if os.path.exists(args.baseline):
+        with open(args.baseline, "r", encoding="utf-8") as f:
+            baseline = json.load(f)
+    lines, regressions = compare(results, baseline, args.tolerance)
+    for line in lines:
+        print(line)
+    if args.update:
+        for name, metrics in results.items():
+            baseline.setdefault(name, {}).update(metrics)
+        with open(args.baseline, "w", encoding="utf-8") as f:
+            json.dump(baseline, f, ensure_ascii=False, indent=2, sort_keys=True)
+        print(f"Базовые значения записаны в {args.baseline}")
+        return 0
+    return 1 if regressions else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
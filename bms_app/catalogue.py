@@ -0,0 +1,492 @@
+import os
+import re
+import sqlite3
+import threading
+from contextlib import contextmanager
+from collections import namedtuple
+from datetime import datetime, timedelta
+
+from audit import log_files
+from results import TestResult, CHANNELS, CHECKS, NO_DATA, SC_TRIPPED, SC_NOT_TRIPPED, SC_NOT_REACHED
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS reports (
+    filename TEXT PRIMARY KEY,
+    system_name TEXT NOT NULL,
+    serial_number TEXT NOT NULL,
+    serial_key TEXT NOT NULL,
+    timestamp TEXT NOT NULL,
+    verdict INTEGER,
+    operator TEXT,
+    sha256 TEXT,
+    size INTEGER,
+    mtime REAL,
+    result BLOB,
+    verified_size INTEGER,
+    verified_mtime REAL,
+    archive_segment TEXT,
+    archive_offset INTEGER,
+    archive_length INTEGER
+);
+DROP INDEX IF EXISTS reports_serial;
+DROP INDEX IF EXISTS reports_timestamp;
+DROP INDEX IF EXISTS reports_verdict;
+CREATE INDEX IF NOT EXISTS reports_date ON reports(timestamp DESC, filename DESC);
+CREATE INDEX IF NOT EXISTS reports_serial_date ON reports(serial_key, timestamp DESC, filename DESC);
+CREATE INDEX IF NOT EXISTS reports_verdict_date ON reports(verdict, timestamp DESC, filename DESC);
+"""
+
+# Накопленная статистика испытаний: счетчики за каждый час (stats_hour) и
+# день (stats_day) для каждой пары система/оператор. Строки обновляются в
+# той же транзакции, что и индекс протоколов, поэтому выборка за любой
+# период — сумма по нескольким тысячам строк без чтения результатов.
+# Счетчики: изделия, каналы и столбцы проверок (проверено/годных) и исходы КЗ.
+SC_CODES = (SC_TRIPPED, SC_NOT_TRIPPED, SC_NOT_REACHED)
+STAT_FIELDS = (
+    "unit_total", "unit_passed",
+    *(f"channel{i}_{kind}" for i in range(CHANNELS) for kind in ("total", "passed")),
+    *(f"check{i}_{kind}" for i in range(CHECKS) for kind in ("total", "passed")),
+    *(f"sc{code}" for code in SC_CODES),
+)
+# Таблица -> длина префикса времени испытания в столбце period
+STAT_TABLES = {"stats_hour": 13, "stats_day": 10}
+STATS_SCHEMA = "".join(
+    f"CREATE TABLE IF NOT EXISTS {table} (period TEXT NOT NULL, system_name TEXT NOT NULL, "
+    f"operator TEXT NOT NULL, {', '.join(f'{field} INTEGER NOT NULL' for field in STAT_FIELDS)}, "
+    f"PRIMARY KEY (period, system_name, operator)) WITHOUT ROWID;\n"
+    for table in STAT_TABLES
+)
+STATS_UPSERT = {
+    table: f"INSERT INTO {table} VALUES ({', '.join('?' * (len(STAT_FIELDS) + 3))}) "
+           f"ON CONFLICT (period, system_name, operator) DO UPDATE SET "
+           + ", ".join(f"{field} = {field} + excluded.{field}" for field in STAT_FIELDS)
+    for table in STAT_TABLES
+}
+# Группировки для stats_by
+STAT_GROUPS = {
+    "day": "day",
+    "system": "system_name",
+    "operator": "operator",
+}
+
+COLUMNS = "filename system_name serial_number timestamp verdict operator sha256 size mtime archive_segment"
+ReportEntry = namedtuple("ReportEntry", COLUMNS)
+
+# Столбцы, добавленные после первой версии индекса
+MIGRATIONS = {
+    "result": "BLOB",
+    "verified_size": "INTEGER",
+    "verified_mtime": "REAL",
+    "archive_segment": "TEXT",
+    "archive_offset": "INTEGER",
+    "archive_length": "INTEGER",
+}
+# Полная запись строки при добавлении
+INSERT = (
+    "INSERT OR REPLACE INTO reports (filename, system_name, serial_number, serial_key, timestamp, "
+    "verdict, operator, sha256, size, mtime, result, verified_size, verified_mtime) "
+    "VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)"
+)
+# Строка, найденная сканированием папки, не заменяет строку, которую между
+# сканированием и вставкой внес add() — с вердиктом, результатом и вкладом
+# в статистику
+INSERT_SCANNED = INSERT.replace("INSERT OR REPLACE", "INSERT OR IGNORE", 1)
+
+# Порядки списка: столбцы и направления; имя файла делает порядок полным,
+# поэтому следующая страница начинается сразу за последней строкой
+# предыдущей (query(after=...)) и читается по индексу без OFFSET
+ORDERS = {
+    "date": (("timestamp", "DESC"), ("filename", "DESC")),
+    "serial": (("serial_key", "ASC"), ("timestamp", "DESC"), ("filename", "DESC")),
+    "verdict": (("verdict", "ASC"), ("timestamp", "DESC"), ("filename", "DESC")),
+}
+
+
+def order_by(order):
+    return ", ".join(f"{column} {direction}" for column, direction in ORDERS[order])
+
+
+def sort_key(entry, column):
+    if column == "serial_key":
+        return entry.serial_number.lower()
+    return getattr(entry, column)
+
+# Сколько новых файлов вносить в индекс одной транзакцией при сканировании
+RESCAN_BATCH = 5000
+
+FILENAME_RE = re.compile(r"^report_(.+)_(\d{8})_(\d{6})\.pdf$")
+LOG_HASH_RE = re.compile(r"Report: (.+?), hash: ([0-9a-f]{64})")
+
+
+def stat_counts(verdict, result):
+    # Счетчики одного испытания в порядке STAT_FIELDS
+    counts = [1, int(result.passed if verdict is None else bool(verdict))]
+    for channel in range(CHANNELS):
+        checks = result.channel(channel)
+        known = max(checks) != NO_DATA
+        counts += [int(known), int(known and min(checks) == 1)]
+    for check in range(CHECKS):
+        known = [value for value in (result.check(channel, check) for channel in range(CHANNELS)) if value != NO_DATA]
+        counts += [len(known), known.count(1)]
+    counts += [int(result.short_circuit == code) for code in SC_CODES]
+    return counts
+
+
+def update_stats(db, system_name, timestamp, verdict, operator, result, sign=1):
+    # Прибавить испытание к счетчикам; sign=-1 — вычесть
+    if result is None:
+        return
+    if isinstance(result, bytes):
+        result = TestResult.from_bytes(result)
+    counts = [sign * value for value in stat_counts(verdict, result)]
+    for table, length in STAT_TABLES.items():
+        db.execute(STATS_UPSERT[table], (timestamp[:length], system_name, operator or "", *counts))
+
+
+def stat_summary(sums):
+    # {(разрез, элемент): (проверено, годных)}: unit — изделия, channel —
+    # каналы, check — столбцы проверок, short_circuit — исходы КЗ (код SC_*)
+    values = dict(zip(STAT_FIELDS, sums))
+    summary = {("unit", 0): (values["unit_total"], values["unit_passed"])}
+    for i in range(CHANNELS):
+        summary["channel", i] = values[f"channel{i}_total"], values[f"channel{i}_passed"]
+    for i in range(CHECKS):
+        summary["check", i] = values[f"check{i}_total"], values[f"check{i}_passed"]
+    for code in SC_CODES:
+        count = values[f"sc{code}"]
+        summary["short_circuit", code] = count, count if code == SC_TRIPPED else 0
+    return summary
+
+
+def parse_report_filename(filename):
+    # Старые отчеты: report_<зав. номер>_<дата>_<время>.pdf,
+    # новые: report_<система>_<зав. номер>_<дата>_<время>.pdf
+    match = FILENAME_RE.match(filename)
+    if not match:
+        return None
+    name, date, time = match.groups()
+    system_name, _, serial_number = name.rpartition("_")
+    timestamp = datetime.strptime(date + time, "%Y%m%d%H%M%S")
+    return system_name, serial_number, timestamp.strftime("%Y-%m-%d %H:%M:%S")
+
+
+class ReportCatalogue:
+    # Индекс протоколов в SQLite. Соединения открываются отдельно для
+    # каждого потока, чтобы поиск и пересканирование можно было вести в фоне.
+    def __init__(self, report_dir="reports", path="reports.db"):
+        self.report_dir = report_dir
+        self.path = path
+        self._local = threading.local()
+        with self.connection() as db:
+            db.executescript(SCHEMA)
+            columns = {row[1] for row in db.execute("PRAGMA table_info(reports)")}
+            for column, kind in MIGRATIONS.items():
+                if column not in columns:
+                    db.execute(f"ALTER TABLE reports ADD COLUMN {column} {kind}")
+            has_stats = db.execute("SELECT 1 FROM sqlite_master WHERE name = 'stats_day'").fetchone()
+            db.executescript(STATS_SCHEMA)
+        if not has_stats:
+            # Индекс из версии без статистики — накопить ее по уже внесенным испытаниям
+            self.rebuild_stats()
+
+    def connection(self):
+        db = getattr(self._local, "db", None)
+        if db is None:
+            db = sqlite3.connect(self.path, timeout=10)
+            db.execute("PRAGMA journal_mode=WAL")
+            self._local.db = db
+        return db
+
+    def add(self, filename, system_name, serial_number, timestamp, verdict=None, operator=None, sha256=None, result=None):
+        # Хеш только что посчитан по этому файлу, поэтому он сразу считается сверенным
+        path = os.path.join(self.report_dir, filename)
+        stat = os.stat(path)
+        verified = (stat.st_size, stat.st_mtime) if sha256 else (None, None)
+        with self.connection() as db:
+            # Повторно сформированный протокол заменяет прежнюю строку — ее
+            # вклад в статистику вычитается
+            old = db.execute(
+                "SELECT system_name, timestamp, verdict, operator, result FROM reports WHERE filename = ?", (filename,)
+            ).fetchone()
+            if old is not None:
+                update_stats(db, *old, sign=-1)
+            update_stats(db, system_name, timestamp, verdict, operator, result)
+            db.execute(
+                INSERT,
+                (filename, system_name, serial_number, serial_number.lower(), timestamp,
+                 verdict, operator, sha256, stat.st_size, stat.st_mtime,
+                 result.to_bytes() if result is not None else None, *verified)
+            )
+
+    def query(self, serial_prefix="", date_from=None, date_to=None, verdict=None, order="date", limit=None, after=None):
+        # after — последняя строка предыдущей страницы. Строки после нее —
+        # несколько диапазонов индекса: с тем же началом ключа и следующим
+        # значением в последнем столбце (сначала самые глубокие); каждый
+        # читается поиском по индексу, пока не наберется limit строк
+        where, params = self._filters(serial_prefix, date_from, date_to, verdict)
+        select = f"SELECT {COLUMNS.replace(' ', ', ')} FROM reports"
+        if after is None:
+            sql = f"{select}{where} ORDER BY {order_by(order)}"
+            if limit is not None:
+                sql += " LIMIT ?"
+                params.append(limit)
+            return [ReportEntry(*row) for row in self.connection().execute(sql, params)]
+        keys = ORDERS[order]
+        values = [sort_key(after, column) for column, _ in keys]
+        rows = []
+        for depth in range(len(keys) - 1, -1, -1):
+            clauses, range_params = [], list(params)
+            for (column, _), value in zip(keys[:depth], values[:depth]):
+                if value is None:
+                    clauses.append(f"{column} IS NULL")
+                else:
+                    clauses.append(f"{column} = ?")
+                    range_params.append(value)
+            (column, direction), value = keys[depth], values[depth]
+            if direction == "DESC":
+                # Столбцы с порядком по убыванию — NOT NULL
+                clauses.append(f"{column} < ?")
+                range_params.append(value)
+            elif value is None:
+                clauses.append(f"{column} IS NOT NULL")
+            else:
+                clauses.append(f"{column} > ?")
+                range_params.append(value)
+            sql = f"{select}{where}{' AND ' if where else ' WHERE '}{' AND '.join(clauses)} ORDER BY {order_by(order)}"
+            if limit is not None:
+                sql += " LIMIT ?"
+                range_params.append(limit - len(rows))
+            rows += [ReportEntry(*row) for row in self.connection().execute(sql, range_params)]
+            if limit is not None and len(rows) >= limit:
+                break
+        return rows
+
+    def count(self, serial_prefix="", date_from=None, date_to=None, verdict=None):
+        where, params = self._filters(serial_prefix, date_from, date_to, verdict)
+        return self.connection().execute(f"SELECT COUNT(*) FROM reports{where}", params).fetchone()[0]
+
+    def get(self, filename):
+        row = self.connection().execute(
+            f"SELECT {COLUMNS.replace(' ', ', ')} FROM reports WHERE filename = ?", (filename,)
+        ).fetchone()
+        return ReportEntry(*row) if row else None
+
+    def iter_results(self, serial_prefix="", date_from=None, date_to=None, verdict=None, order="date", snapshot=None):
+        # Построчное чтение вместе с упакованными результатами, без загрузки выборки
+        # целиком. Отдельное соединение читает неизменный снимок индекса, даже если
+        # по ходу чтения в индекс пишут; snapshot — соединение из snapshot(),
+        # чтобы несколько проходов прочитали один и тот же снимок.
+        where, params = self._filters(serial_prefix, date_from, date_to, verdict)
+        db = snapshot or sqlite3.connect(self.path, timeout=10)
+        try:
+            cursor = db.execute(
+                f"SELECT {COLUMNS.replace(' ', ', ')}, result FROM reports{where} ORDER BY {order_by(order)}", params
+            )
+            for row in cursor:
+                yield ReportEntry(*row[:-1]), TestResult.from_bytes(row[-1]) if row[-1] else None
+        finally:
+            if snapshot is None:
+                db.close()
+
+    @contextmanager
+    def snapshot(self):
+        # Соединение с открытой транзакцией чтения: в режиме WAL все выборки
+        # через него видят индекс на момент первого чтения
+        db = sqlite3.connect(self.path, timeout=10, isolation_level=None)
+        try:
+            db.execute("BEGIN")
+            db.execute("SELECT count(*) FROM reports").fetchone()
+            yield db
+        finally:
+            db.execute("ROLLBACK")
+            db.close()
+
+    def get_result(self, filename):
+        row = self.connection().execute("SELECT result FROM reports WHERE filename = ?", (filename,)).fetchone()
+        return TestResult.from_bytes(row[0]) if row and row[0] else None
+
+    def _filters(self, serial_prefix, date_from, date_to, verdict):
+        clauses, params = [], []
+        if serial_prefix:
+            # Поиск по префиксу как диапазон, чтобы работал индекс
+            key = serial_prefix.lower()
+            clauses.append("serial_key >= ? AND serial_key < ?")
+            params += [key, key + "\uffff"]
+        if date_from is not None:
+            clauses.append("timestamp >= ?")
+            params.append(date_from.strftime("%Y-%m-%d"))
+        if date_to is not None:
+            clauses.append("timestamp < ?")
+            params.append((date_to + timedelta(days=1)).strftime("%Y-%m-%d"))
+        if verdict is not None:
+            clauses.append("verdict = ?")
+            params.append(int(verdict))
+        return (" WHERE " + " AND ".join(clauses) if clauses else ""), params
+
+    def rescan(self, log_path="log.txt", progress=None):
+        # Сверка индекса с папкой: новые файлы добавляются по имени файла
+        # (хеш берется из журнала, если он там есть), удаленные — убираются.
+        # Протоколы, перенесенные в архив (archive.py), в папке не ищутся.
+        # Новые записи вставляются порциями от новых к старым, после каждой
+        # вызывается progress(добавлено, всего) — список можно показывать,
+        # не дожидаясь конца сканирования.
+        os.makedirs(self.report_dir, exist_ok=True)
+        on_disk = {}
+        with os.scandir(self.report_dir) as entries:
+            for entry in entries:
+                if entry.name.endswith(".pdf") and entry.is_file():
+                    on_disk[entry.name] = entry.stat()
+
+        db = self.connection()
+        indexed, archived = set(), set()
+        for filename, segment in db.execute("SELECT filename, archive_segment FROM reports"):
+            (indexed if segment is None else archived).add(filename)
+        missing = indexed - on_disk.keys()
+        new = on_disk.keys() - indexed - archived
+        if not missing and not new:
+            return 0, 0
+
+        hashes = self.logged_hashes(log_path) if new else {}
+        rows = []
+        for filename in new:
+            parsed = parse_report_filename(filename)
+            if parsed is None:
+                continue
+            system_name, serial_number, timestamp = parsed
+            stat = on_disk[filename]
+            rows.append((filename, system_name, serial_number, serial_number.lower(), timestamp,
+                         None, None, hashes.get(filename), stat.st_size, stat.st_mtime, None, None, None))
+        rows.sort(key=lambda row: row[4], reverse=True)
+        with db:
+            for filename in missing:
+                old = db.execute(
+                    "SELECT system_name, timestamp, verdict, operator, result FROM reports WHERE filename = ?",
+                    (filename,)
+                ).fetchone()
+                if old is not None:
+                    update_stats(db, *old, sign=-1)
+            db.executemany("DELETE FROM reports WHERE filename = ?", [(f,) for f in missing])
+        for start in range(0, len(rows), RESCAN_BATCH):
+            with db:
+                db.executemany(INSERT_SCANNED, rows[start:start + RESCAN_BATCH])
+            if progress is not None:
+                progress(min(start + RESCAN_BATCH, len(rows)), len(rows))
+        return len(rows), len(missing)
+
+    def rebuild_stats(self):
+        # Полный пересчет статистики по результатам, сохраненным в индексе
+        totals = {table: {} for table in STAT_TABLES}
+        cursor = self.connection().execute(
+            "SELECT system_name, timestamp, verdict, operator, result FROM reports WHERE result IS NOT NULL"
+        )
+        for system_name, timestamp, verdict, operator, result in cursor:
+            counts = stat_counts(verdict, TestResult.from_bytes(result))
+            for table, length in STAT_TABLES.items():
+                key = (timestamp[:length], system_name, operator or "")
+                current = totals[table].get(key)
+                totals[table][key] = counts if current is None else [a + b for a, b in zip(current, counts)]
+        with self.connection() as db:
+            for table, rows in totals.items():
+                db.execute(f"DELETE FROM {table}")
+                db.executemany(STATS_UPSERT[table], [(*key, *counts) for key, counts in rows.items()])
+
+    def stats(self, since=None, system_name=None, operator=None):
+        # Сводка stat_summary за период с since (None — за все время)
+        source, params = self._stat_source(since, system_name, operator)
+        sums = ", ".join(f"COALESCE(SUM({field}), 0)" for field in STAT_FIELDS)
+        return stat_summary(self.connection().execute(f"SELECT {sums} FROM ({source})", params).fetchone())
+
+    def stats_by(self, group, since=None, system_name=None, operator=None):
+        # [(значение группы, изделий, годных)], группы — из STAT_GROUPS
+        column = STAT_GROUPS[group]
+        source, params = self._stat_source(since, system_name, operator)
+        sql = (f"SELECT {column} AS key, SUM(unit_total), SUM(unit_passed) FROM ({source}) "
+               f"GROUP BY key HAVING SUM(unit_total) > 0 ORDER BY key")
+        return self.connection().execute(sql, params).fetchall()
+
+    def stat_values(self, column):
+        # Встречающиеся в статистике системы или операторы — для фильтров
+        if column not in ("system_name", "operator"):
+            raise ValueError(column)
+        return [row[0] for row in self.connection().execute(
+            f"SELECT DISTINCT {column} FROM stats_day ORDER BY {column}"
+        )]
+
+    def _stat_source(self, since, system_name, operator):
+        # Подзапрос счетчиков за период: неполный первый день — по часам,
+        # остальные дни — из дневных строк
+        clauses, params = [], []
+        for column, value in (("system_name", system_name), ("operator", operator)):
+            if value is not None:
+                clauses.append(f" AND {column} = ?")
+                params.append(value)
+        filters = "".join(clauses)
+        fields = ", ".join(STAT_FIELDS)
+        if since is None:
+            return f"SELECT period AS day, system_name, operator, {fields} FROM stats_day WHERE 1{filters}", params
+        next_day = (since + timedelta(days=1)).strftime("%Y-%m-%d")
+        sql = (
+            f"SELECT substr(period, 1, 10) AS day, system_name, operator, {fields} FROM stats_hour "
+            f"WHERE period >= ? AND period < ?{filters} UNION ALL "
+            f"SELECT period AS day, system_name, operator, {fields} FROM stats_day WHERE period >= ?{filters}"
+        )
+        return sql, [since.strftime("%Y-%m-%d %H"), next_day, *params, next_day, *params]
+
+    def integrity_rows(self):
+        # (имя файла, записанный хеш, размер и время изменения на момент последней сверки)
+        # для протоколов в папке; архивные сверяются при чтении из архива
+        return self.connection().execute(
+            "SELECT filename, sha256, verified_size, verified_mtime FROM reports WHERE archive_segment IS NULL"
+        ).fetchall()
+
+    def archive_candidates(self, before):
+        # [(имя файла, хеш)] протоколов в папке старше before, от старых к новым
+        return self.connection().execute(
+            "SELECT filename, sha256 FROM reports WHERE archive_segment IS NULL AND timestamp < ? ORDER BY timestamp",
+            (before,)
+        ).fetchall()
+
+    def mark_archived(self, locations):
+        # locations: [(сегмент, смещение, длина записи, имя файла)]
+        with self.connection() as db:
+            db.executemany(
+                "UPDATE reports SET archive_segment = ?, archive_offset = ?, archive_length = ?, "
+                "verified_size = NULL, verified_mtime = NULL WHERE filename = ?",
+                locations
+            )
+
+    def archive_location(self, filename):
+        # (сегмент, смещение, длина записи, хеш) или None, если протокол не в архиве
+        return self.connection().execute(
+            "SELECT archive_segment, archive_offset, archive_length, sha256 FROM reports "
+            "WHERE filename = ? AND archive_segment IS NOT NULL",
+            (filename,)
+        ).fetchone()
+
+    def archived_filenames(self):
+        return {row[0] for row in self.connection().execute(
+            "SELECT filename FROM reports WHERE archive_segment IS NOT NULL"
+        )}
+
+    def mark_verified(self, verified, modified=()):
+        # verified: [(имя файла, размер, время изменения)]; у измененных
+        # файлов отметка снимается, чтобы следующая проверка их перечитала
+        with self.connection() as db:
+            db.executemany(
+                "UPDATE reports SET verified_size = ?, verified_mtime = ? WHERE filename = ?",
+                [(size, mtime, filename) for filename, size, mtime in verified]
+            )
+            db.executemany(
+                "UPDATE reports SET verified_size = NULL, verified_mtime = NULL WHERE filename = ?",
+                [(filename,) for filename in modified]
+            )
+
+    def logged_hashes(self, log_path="log.txt"):
+        hashes = {}
+        for path in log_files(log_path) if log_path else []:
+            with open(path, encoding="utf-8", errors="replace") as f:
+                for line in f:
+                    match = LOG_HASH_RE.search(line)
+                    if match:
+                        hashes[os.path.basename(match.group(1))] = match.group(2)
+        return hashes
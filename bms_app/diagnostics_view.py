@@ -0,0 +1,68 @@
+from PySide6.QtCore import QTimer
+from PySide6.QtWidgets import QDialog, QVBoxLayout, QLabel, QTableWidget, QTableWidgetItem, QHeaderView
+
+from metrics import STAGES, STAGE_SECONDS, STARTUP_SECONDS, TESTS, TESTS_LAST_HOUR, REPORTS, REPORT_RETRIES
+
+STAGE_TITLES = {
+    "delivery": "Очередь сигналов",
+    "decode": "Разбор кадра",
+    "analysis": "Обработка результата",
+    "report": "Протокол (от постановки в очередь)",
+    "render": "Отрисовка PDF",
+    "hash": "Хеш протокола",
+    "index": "Запись в индекс",
+    "report_list": "Обновление списка протоколов",
+    "stats": "Обновление статистики",
+}
+
+
+class DiagnosticsDialog(QDialog):
+    # Сводка метрик процесса; обновляется раз в секунду, пока окно открыто
+    def __init__(self, parent=None):
+        super().__init__(parent)
+        self.setWindowTitle("Диагностика")
+        self.resize(640, 360)
+        layout = QVBoxLayout(self)
+
+        self.counters_label = QLabel()
+        layout.addWidget(self.counters_label)
+
+        self.table = QTableWidget(len(STAGES), 4)
+        self.table.setHorizontalHeaderLabels(["Число", "Среднее, мс", "Медиана, мс", "95%, мс"])
+        self.table.setVerticalHeaderLabels([STAGE_TITLES[stage] for stage in STAGES])
+        self.table.horizontalHeader().setSectionResizeMode(QHeaderView.Stretch)
+        layout.addWidget(self.table)
+
+        self.timer = QTimer(self)
+        self.timer.setInterval(1000)
+        self.timer.timeout.connect(self.refresh)
+        self.refresh()
+
+    def showEvent(self, event):
+        self.timer.start()
+        super().showEvent(event)
+
+    def hideEvent(self, event):
+        self.timer.stop()
+        super().hideEvent(event)
+
+    @staticmethod
+    def seconds(value):
+        return "—" if value is None else f"{value:.3f} с"
+
+    def refresh(self):
+        self.counters_label.setText(
+            f"Испытаний: {TESTS.value()} (годных {TESTS.value(verdict='passed')}), "
+            f"за последний час: {TESTS_LAST_HOUR.value()}\n"
+            f"Протоколов: {REPORTS.value(status='done')}, ошибок: {REPORTS.value(status='failed')}, "
+            f"повторов: {REPORT_RETRIES.value()}\n"
+            f"Запуск: до окна входа {self.seconds(STARTUP_SECONDS.value(phase='login'))}, "
+            f"от входа до готовности {self.seconds(STARTUP_SECONDS.value(phase='ready'))}"
+        )
+        for row, stage in enumerate(STAGES):
+            summary = STAGE_SECONDS.summary(stage=stage)
+            values = ["—"] * 4 if summary is None else [
+                str(summary[0]), *(f"{value * 1000:.2f}" for value in summary[1:])
+            ]
+            for column, value in enumerate(values):
+                self.table.setItem(row, column, QTableWidgetItem(value))
@@ -0,0 +1,416 @@
+# Эмулятор стенда внутри процесса: порт вида
+#   emu://mixed?seed=42&speed=1000      — модель СКУ (профили PROFILES)
+#   emu://replay?path=raw/SN001&speed=10 — воспроизведение записанных испытаний
+# задается в BMS_SERIAL_PORT вместо COM-порта. Модель живет в виртуальном
+# времени: при одном seed поток кадров одинаков при любой скорости, а
+# speed=0 — без ожидания, часы сразу переходят к следующему событию.
+# Генерация результатов для пакетной обработки (batch.py render --file):
+#   python emulator.py --count 10000 --seed 1 --profile mixed --out results.jsonl
+import os
+import sys
+import json
+import time
+import heapq
+import random
+import argparse
+import threading
+from collections import namedtuple
+from datetime import datetime, timedelta
+from urllib.parse import urlsplit, parse_qs
+
+import numpy as np
+
+from protocol import (
+    FrameParser, encode_frame, encode_result, encode_samples, decode_result, MAX_SAMPLES,
+    PONG, STEP, STEP_DONE, FRAME_PING, FRAME_PONG, FRAME_RESET, FRAME_TELEMETRY, FRAME_STEP,
+    FRAME_STEP_DONE, FRAME_RESULT, CHANNELS, SC_TRIPPED, SC_NOT_TRIPPED, SC_NOT_REACHED
+)
+from rawstore import RawSegment, KIND_SAMPLE, EVENT_RESULT, RAW_DIR
+from telemetry import SAMPLE_RATE
+
+EMULATOR_SCHEME = "emu://"
+
+# Нормы напряжений отключения, В, и допуск, которым их проверяет стенд
+CHARGE_NOMINAL = 4.25
+DISCHARGE_NOMINAL = 2.85
+TOLERANCE = 0.05
+
+# fault_rate — доля неисправных СКУ, spread — разброс напряжений
+# отключения исправной СКУ (σ, В)
+Profile = namedtuple("Profile", "fault_rate spread")
+PROFILES = {
+    "healthy": Profile(0.0, 0.012),
+    "mixed": Profile(0.2, 0.015),
+    "faulty": Profile(1.0, 0.015),
+}
+FAULTS = ("charge", "discharge", "short_circuit")
+
+
+class VirtualClock:
+    # Виртуальное время, с: speed — во сколько раз быстрее реального
+    def __init__(self, speed=1.0):
+        self.speed = speed
+        self._origin = time.monotonic()
+        self._offset = 0.0
+
+    def now(self):
+        if not self.speed:
+            return self._offset
+        return self._offset + (time.monotonic() - self._origin) * self.speed
+
+    def delay(self, moment):
+        # Реальное время до наступления moment, с
+        if not self.speed:
+            return 0.0
+        return max(0.0, (moment - self.now()) / self.speed)
+
+    def wait(self, moment, timeout):
+        # Ожидание момента moment, но не дольше timeout реальных секунд
+        if moment == float("inf"):
+            time.sleep(timeout)
+        elif not self.speed:
+            self._offset = max(self._offset, moment)
+        else:
+            time.sleep(min(self.delay(moment), timeout))
+
+
+class BmsModel:
+    # Модель СКУ ЛИАБ на стенде. Все случайные величины берутся из
+    # генераторов с общим seed; время — только виртуальное (advance), поэтому
+    # последовательность кадров воспроизводима.
+    def __init__(self, seed=None, profile="mixed", rate=1000, interval=(3, 10), burst=1):
+        self.random = random.Random(seed)
+        self.noise = np.random.default_rng(seed)
+        self.profile = PROFILES[profile]
+        self.rate = rate
+        self.interval = interval
+        self.burst = burst
+        self.block = min(MAX_SAMPLES, max(1, rate // 40))
+        self.test_id = 0
+        self.streaming = False
+        self.sample_seq = 0
+        self.now = 0.0
+        self.next_test = self.random.uniform(*interval)
+        self.next_block = 0.0
+        # Выполняемые шаги программы: (время окончания, номер шага, канал, начало)
+        self.steps = []
+        self.output = bytearray()
+        self.new_unit()
+        self.parser = FrameParser(self.on_frame)
+
+    def feed(self, data):
+        self.parser.feed(data)
+
+    def on_frame(self, frame_type, payload):
+        if frame_type == FRAME_PING:
+            self.output += encode_frame(FRAME_PONG, PONG.pack(self.rate))
+        elif frame_type == FRAME_RESET:
+            self.test_id = 0
+        elif frame_type == FRAME_TELEMETRY:
+            self.streaming = bool(payload[0])
+            self.next_block = self.now
+        elif frame_type == FRAME_STEP:
+            step, _, channel, _, dwell = STEP.unpack_from(payload)
+            heapq.heappush(self.steps, (self.now + dwell * self.random.uniform(1.0, 1.05), step, channel, self.now))
+
+    def new_unit(self):
+        # Очередная СКУ: напряжения, на которых каждый канал прекращает заряд
+        # и разряд, и неисправность, если она есть
+        spread = self.profile.spread
+        self.charge_cutoffs = [self.random.gauss(CHARGE_NOMINAL, spread) for _ in range(CHANNELS)]
+        self.discharge_cutoffs = [self.random.gauss(DISCHARGE_NOMINAL, spread) for _ in range(CHANNELS)]
+        self.fault = None
+        self.short_circuit = SC_TRIPPED
+        if self.random.random() < self.profile.fault_rate:
+            self.fault = self.random.choice(FAULTS)
+        channel = self.random.randrange(CHANNELS)
+        shift = self.random.choice((-1, 1)) * self.random.uniform(2 * TOLERANCE, 4 * TOLERANCE)
+        if self.fault == "charge":
+            self.charge_cutoffs[channel] = CHARGE_NOMINAL + shift
+        elif self.fault == "discharge":
+            self.discharge_cutoffs[channel] = DISCHARGE_NOMINAL + shift
+        elif self.fault == "short_circuit":
+            self.short_circuit = self.random.choice((SC_NOT_TRIPPED, SC_NOT_REACHED))
+
+    def samples(self, t):
+        # Отсчеты в моменты t (массив, с): подъем и спад напряжения 2,7–4,4 В
+        # со сдвигом по каналам, ограниченный напряжениями отключения; ток
+        # разряда 5 А с импульсом КЗ 60 А раз в 10 с: 20 мс до срабатывания
+        # защиты, затем цепь разомкнута 80 мс
+        phase = (t[:, None] / 10.0 + np.arange(CHANNELS) / CHANNELS) % 1.0
+        ramp = np.where(phase < 0.5, 2 * phase, 2 * (1 - phase))
+        voltage = np.clip(2.7 + 1.7 * ramp, self.discharge_cutoffs, self.charge_cutoffs)
+        voltage += self.noise.normal(0, 0.003, voltage.shape)
+        pulse = t % 10.0
+        peak, trip = 60.0, 0.02
+        if self.short_circuit == SC_NOT_TRIPPED:
+            trip = 0.15
+        elif self.short_circuit == SC_NOT_REACHED:
+            peak = 40.0
+        current = np.where(
+            pulse < trip, peak,
+            np.where(pulse < trip + 0.08, 0.0, 5.0 + self.noise.normal(0, 0.1, t.shape))
+        )
+        return np.column_stack([voltage, current]).astype(np.float32)
+
+    def samples_block(self, count):
+        t = (self.sample_seq + np.arange(count)) / self.rate
+        frame = encode_samples(self.sample_seq, self.samples(t))
+        self.sample_seq += count
+        return frame
+
+    def result(self):
+        self.test_id += 1
+        checks, measurements = [], []
+        for i in range(CHANNELS):
+            charge = self.charge_cutoffs[i]
+            discharge = self.discharge_cutoffs[i]
+            charge_ok = abs(charge - CHARGE_NOMINAL) <= TOLERANCE
+            discharge_ok = abs(discharge - DISCHARGE_NOMINAL) <= TOLERANCE
+            checks.append([charge_ok, charge_ok, discharge_ok, discharge_ok])
+            measurements += [charge, charge, discharge, discharge]
+        duration = self.random.uniform(0.1, 1.0)
+        frame = encode_result(self.test_id, checks, self.short_circuit, duration, measurements)
+        self.new_unit()
+        return frame
+
+    def next_event(self):
+        moment = self.next_test
+        if self.steps:
+            moment = min(moment, self.steps[0][0])
+        if self.streaming:
+            moment = min(moment, self.next_block)
+        return moment
+
+    def advance(self, until):
+        # Все события до момента until по порядку; возвращает переданные кадры
+        while (moment := self.next_event()) <= until:
+            self.now = moment
+            if self.streaming and moment == self.next_block:
+                self.output += self.samples_block(self.block)
+                self.next_block += self.block / self.rate
+            elif self.steps and moment == self.steps[0][0]:
+                _, step, channel, started = heapq.heappop(self.steps)
+                self.output += encode_frame(FRAME_STEP_DONE, STEP_DONE.pack(step, channel, moment - started))
+            else:
+                for _ in range(self.burst):
+                    self.output += self.result()
+                self.next_test = moment + self.random.uniform(*self.interval)
+        self.now = max(self.now, until)
+        return self.take()
+
+    def take(self):
+        data = bytes(self.output)
+        self.output.clear()
+        return data
+
+
+class ReplayModel:
+    # Повтор записанных испытаний (сегменты rawstore) в исходном темпе:
+    # телеметрия — когда приложение ее включило, результат — в момент,
+    # когда он был получен. Между сегментами — пауза gap, с. Частота
+    # отсчетов сегмента сообщается в PONG, при смене сегмента — без запроса.
+    def __init__(self, paths, loop=False, gap=1.0):
+        self.paths = paths
+        self.loop = loop
+        self.gap = gap
+        self.rate = SAMPLE_RATE
+        self.streaming = False
+        self.now = 0.0
+        self.output = bytearray()
+        self.parser = FrameParser(self.on_frame)
+        self._events = self._replay()
+        self._pending = next(self._events, None)
+
+    def feed(self, data):
+        self.parser.feed(data)
+
+    def on_frame(self, frame_type, payload):
+        if frame_type == FRAME_PING:
+            self.output += encode_frame(FRAME_PONG, PONG.pack(self.rate))
+        elif frame_type == FRAME_TELEMETRY:
+            self.streaming = bool(payload[0])
+
+    def _replay(self):
+        offset = 0.0
+        while True:
+            for path in self.paths:
+                segment = RawSegment(path)
+                records = segment.records
+                if not len(records):
+                    continue
+                if segment.rate != self.rate:
+                    self.rate = segment.rate
+                    yield offset, encode_frame(FRAME_PONG, PONG.pack(self.rate)), False
+                start = records["time"][0]
+                # Записи одной порции имеют одно время и один вид
+                bounds = np.flatnonzero(
+                    (np.diff(records["time"]) != 0) | (np.diff(records["kind"]) != 0)
+                ) + 1
+                for first, last in zip([0, *bounds], [*bounds, len(records)]):
+                    chunk = records[first:last]
+                    moment = offset + float(chunk["time"][0] - start)
+                    if chunk["kind"][0] == KIND_SAMPLE:
+                        for i in range(0, len(chunk), MAX_SAMPLES):
+                            part = chunk[i:i + MAX_SAMPLES]
+                            values = np.ascontiguousarray(part["values"])
+                            yield moment, encode_samples(int(part["seq"][0]), values), True
+                    elif (chunk["code"] == EVENT_RESULT).any():
+                        result = segment.result()
+                        if result is not None:
+                            yield moment, encode_result(
+                                result.test_id, [result.channel(i) for i in range(CHANNELS)],
+                                SC_NOT_REACHED if result.short_circuit is None else result.short_circuit,
+                                result.duration, result.measurements,
+                            ), False
+                offset += float(records["time"][-1] - start) + self.gap
+            if not self.loop or not self.paths:
+                return
+
+    def next_event(self):
+        return float("inf") if self._pending is None else self._pending[0]
+
+    def advance(self, until):
+        while self._pending is not None and self._pending[0] <= until:
+            self.now, frame, telemetry = self._pending
+            if self.streaming or not telemetry:
+                self.output += frame
+            self._pending = next(self._events, None)
+        self.now = max(self.now, until)
+        return self.take()
+
+    def take(self):
+        data = bytes(self.output)
+        self.output.clear()
+        return data
+
+
+def segment_paths(path):
+    # Файл сегмента или каталог (rawstore), в котором ищутся все сегменты
+    if os.path.isfile(path):
+        return [path]
+    paths = []
+    for root, dirs, files in os.walk(path):
+        dirs[:] = sorted(d for d in dirs if d != "_current")
+        paths += [os.path.join(root, name) for name in sorted(files) if name.endswith(".bin")]
+    return paths
+
+
+class EmulatedPort:
+    # Замена serial.Serial для SerialTransport: чтение продвигает модель до
+    # текущего виртуального времени и отдает переданные ею кадры
+    def __init__(self, model, clock, timeout=0.1):
+        self.model = model
+        self.clock = clock
+        self.timeout = timeout
+        self._output = bytearray()
+        self._lock = threading.Lock()
+
+    @property
+    def in_waiting(self):
+        return len(self._output)
+
+    def write(self, data):
+        with self._lock:
+            self._output += self.model.advance(self.clock.now())
+            self.model.feed(bytes(data))
+            self._output += self.model.take()
+        return len(data)
+
+    def read(self, size=1):
+        deadline = time.monotonic() + self.timeout
+        while True:
+            with self._lock:
+                self._output += self.model.advance(self.clock.now())
+                if self._output:
+                    data = bytes(self._output[:size])
+                    del self._output[:size]
+                    return data
+                moment = self.model.next_event()
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                return b""
+            self.clock.wait(moment, remaining)
+
+    def close(self):
+        pass
+
+
+def open_port(url):
+    # emu://<профиль>?seed=&speed=&rate=&interval=мин-макс&burst=
+    # (не через запятую: запятая разделяет порты в BMS_SERIAL_PORT)
+    # emu://replay?path=<файл или каталог>&speed=&loop=1
+    parts = urlsplit(url)
+    query = {key: values[-1] for key, values in parse_qs(parts.query).items()}
+    clock = VirtualClock(float(query.get("speed", 1)))
+    kind = parts.netloc or "mixed"
+    if kind == "replay":
+        paths = segment_paths(query.get("path", RAW_DIR))
+        return EmulatedPort(ReplayModel(paths, loop=query.get("loop") == "1"), clock)
+    if kind not in PROFILES:
+        raise ValueError(f"Неизвестный профиль эмулятора: {kind}")
+    interval = tuple(float(value) for value in query.get("interval", "3-10").split("-"))
+    if len(interval) != 2 or not 0 <= interval[0] <= interval[1]:
+        raise ValueError(f"Интервал эмулятора задается как interval=мин-макс: {query['interval']}")
+    model = BmsModel(
+        int(query["seed"]) if "seed" in query else None, kind,
+        int(query.get("rate", 1000)), interval, int(query.get("burst", 1)),
+    )
+    return EmulatedPort(model, clock)
+
+
+def iter_results(count, seed=None, profile="mixed"):
+    # (виртуальное время, TestResult) — результаты модели, прошедшие
+    # кодирование и разбор кадров
+    model = BmsModel(seed, profile)
+    results = []
+
+    def on_frame(frame_type, payload):
+        if frame_type == FRAME_RESULT:
+            results.append(decode_result(payload))
+
+    parser = FrameParser(on_frame)
+    produced = 0
+    while produced < count:
+        parser.feed(model.advance(model.next_event()))
+        for result in results[:count - produced]:
+            produced += 1
+            yield model.now, result
+        results.clear()
+
+
+def generate_results(count, seed=None, profile="mixed", start=datetime(2025, 1, 1, 8, 0)):
+    # Строки в формате batch.py render --file
+    for number, (elapsed, result) in enumerate(iter_results(count, seed, profile), 1):
+        moment = start + timedelta(seconds=elapsed)
+        yield {
+            "system_name": f"СКУ_{profile}",
+            "serial_number": f"EMU{seed if seed is not None else 0}-{number:06d}",
+            "timestamp": moment.strftime("%Y-%m-%d %H:%M:%S"),
+            "operator": "Default",
+            "test_id": result.test_id,
+            "duration": result.duration,
+            "short_circuit": result.short_circuit,
+            "checks": list(result.checks),
+            "measurements": [round(value, 4) for value in result.measurements],
+        }
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Генерация результатов испытаний эмулятором стенда")
+    parser.add_argument("--count", type=int, default=1000)
+    parser.add_argument("--seed", type=int)
+    parser.add_argument("--profile", choices=sorted(PROFILES), default="mixed")
+    parser.add_argument("--out", help="файл JSONL (по умолчанию — stdout)")
+    args = parser.parse_args()
+
+    started = time.perf_counter()
+    out = open(args.out, "w", encoding="utf-8") if args.out else sys.stdout
+    try:
+        for record in generate_results(args.count, args.seed, args.profile):
+            out.write(json.dumps(record, ensure_ascii=False) + "\n")
+    finally:
+        if args.out:
+            out.close()
+    elapsed = time.perf_counter() - started
+    print(f"{args.count} испытаний за {elapsed:.2f} с", file=sys.stderr)
@@ -0,0 +1,140 @@
+# Выгрузка результатов испытаний из индекса протоколов в CSV, JSON Lines
+# или Parquet. Записи идут генератором от курсора SQLite до файла, поэтому
+# память не зависит от размера выборки.
+#   python batch.py export results.csv --from 2025-01-01 --to 2025-12-31
+# Строки JSON Lines совместимы с batch.py render --file.
+import os
+import csv
+import json
+import math
+import importlib.util
+
+from results import CHANNELS, CHECKS
+
+FORMATS = {".csv": "csv", ".jsonl": "jsonl", ".parquet": "parquet"}
+# Parquet пишется через pyarrow, если пакет установлен
+PARQUET_AVAILABLE = importlib.util.find_spec("pyarrow") is not None
+# Строк в группе Parquet и между вызовами progress
+BATCH_SIZE = 10000
+
+FIELDS = (
+    "filename", "system_name", "serial_number", "timestamp", "operator", "verdict", "sha256",
+    "test_id", "duration", "short_circuit",
+)
+CELLS = [f"{channel + 1}_{check + 1}" for channel in range(CHANNELS) for check in range(CHECKS)]
+CSV_HEADER = [*FIELDS, *(f"check_{cell}" for cell in CELLS), *(f"voltage_{cell}" for cell in CELLS)]
+
+
+def export_format(path, fmt=None):
+    fmt = fmt or FORMATS.get(os.path.splitext(path)[1].lower())
+    if fmt not in FORMATS.values():
+        raise ValueError(f"Неизвестный формат выгрузки: {path}")
+    if fmt == "parquet" and not PARQUET_AVAILABLE:
+        raise RuntimeError("Для выгрузки в Parquet нужен пакет pyarrow (pip install pyarrow)")
+    return fmt
+
+
+def records(catalogue, **filters):
+    # Запись на каждый протокол выборки; у протоколов, внесенных в индекс по
+    # имени файла, результатов испытания нет — поля результата пустые
+    for entry, result in catalogue.iter_results(**filters):
+        record = {
+            "filename": entry.filename,
+            "system_name": entry.system_name,
+            "serial_number": entry.serial_number,
+            "timestamp": entry.timestamp,
+            "operator": entry.operator,
+            "verdict": None if entry.verdict is None else bool(entry.verdict),
+            "sha256": entry.sha256,
+            "test_id": None,
+            "duration": None,
+            "short_circuit": None,
+            "checks": None,
+            "measurements": None,
+        }
+        if result is not None:
+            record.update(
+                test_id=result.test_id,
+                duration=result.duration,
+                short_circuit=result.short_circuit,
+                checks=list(result.checks),
+                measurements=[None if math.isnan(value) else round(value, 4) for value in result.measurements],
+            )
+        yield record
+
+
+def write_jsonl(rows, path):
+    with open(path, "w", encoding="utf-8") as f:
+        for count, record in enumerate(rows, 1):
+            f.write(json.dumps(record, ensure_ascii=False) + "\n")
+            yield count
+
+
+def write_csv(rows, path):
+    # Проверки и напряжения — по столбцу на ячейку таблицы 8×4.
+    # utf-8-sig — чтобы Excel правильно открыл кириллицу.
+    with open(path, "w", encoding="utf-8-sig", newline="") as f:
+        writer = csv.writer(f)
+        writer.writerow(CSV_HEADER)
+        empty = [None] * len(CELLS)
+        for count, record in enumerate(rows, 1):
+            writer.writerow([
+                *(record[field] for field in FIELDS),
+                *(record["checks"] or empty),
+                *(record["measurements"] or empty),
+            ])
+            yield count
+
+
+def write_parquet(rows, path):
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+
+    schema = pa.schema([
+        ("filename", pa.string()),
+        ("system_name", pa.string()),
+        ("serial_number", pa.string()),
+        ("timestamp", pa.string()),
+        ("operator", pa.string()),
+        ("verdict", pa.bool_()),
+        ("sha256", pa.string()),
+        ("test_id", pa.int64()),
+        ("duration", pa.float32()),
+        ("short_circuit", pa.int8()),
+        ("checks", pa.list_(pa.int8())),
+        ("measurements", pa.list_(pa.float32())),
+    ])
+    count = 0
+    batch = []
+    with pq.ParquetWriter(path, schema) as writer:
+        for record in rows:
+            batch.append(record)
+            if len(batch) == BATCH_SIZE:
+                writer.write_batch(pa.RecordBatch.from_pylist(batch, schema=schema))
+                count += len(batch)
+                batch.clear()
+                yield count
+        if batch:
+            writer.write_batch(pa.RecordBatch.from_pylist(batch, schema=schema))
+            yield count + len(batch)
+
+
+WRITERS = {"csv": write_csv, "jsonl": write_jsonl, "parquet": write_parquet}
+
+
+def export_results(catalogue, path, fmt=None, progress=None, **filters):
+    # Файл пишется под временным именем и заменяет прежний только целиком;
+    # progress(выгружено) вызывается каждые BATCH_SIZE записей
+    fmt = export_format(path, fmt)
+    temp = f"{path}.tmp"
+    count = 0
+    try:
+        for count in WRITERS[fmt](records(catalogue, **filters), temp):
+            if progress is not None and count % BATCH_SIZE == 0:
+                progress(count)
+    except BaseException:
+        if os.path.exists(temp):
+            os.remove(temp)
+        raise
+    os.replace(temp, path)
+    return count
@@ -0,0 +1,70 @@
+from PySide6.QtCore import QDate
+from PySide6.QtWidgets import (
+    QDialog, QFormLayout, QLineEdit, QCheckBox, QDateEdit, QComboBox, QDialogButtonBox
+)
+
+from export import PARQUET_AVAILABLE
+
+FORMAT_TITLES = [
+    ("csv", "CSV", ".csv"),
+    ("jsonl", "JSON Lines", ".jsonl"),
+    ("parquet", "Parquet", ".parquet"),
+]
+
+
+class ExportDialog(QDialog):
+    # Условия выгрузки; по умолчанию — фильтры списка протоколов
+    def __init__(self, serial_prefix="", day=None, parent=None):
+        super().__init__(parent)
+        self.setWindowTitle("Выгрузка результатов")
+        layout = QFormLayout(self)
+
+        self.serial_input = QLineEdit(serial_prefix)
+        self.serial_input.setPlaceholderText("все")
+        layout.addRow("Заводской номер начинается с:", self.serial_input)
+
+        self.period_check = QCheckBox("Только за период")
+        self.period_check.setChecked(day is not None)
+        layout.addRow(self.period_check)
+        start = QDate(day.year, day.month, day.day) if day is not None else QDate.currentDate().addMonths(-1)
+        self.date_from_edit = QDateEdit(start)
+        self.date_to_edit = QDateEdit(start if day is not None else QDate.currentDate())
+        for edit in (self.date_from_edit, self.date_to_edit):
+            edit.setCalendarPopup(True)
+            edit.setEnabled(self.period_check.isChecked())
+            self.period_check.toggled.connect(edit.setEnabled)
+        layout.addRow("С:", self.date_from_edit)
+        layout.addRow("По:", self.date_to_edit)
+
+        self.verdict_selector = QComboBox()
+        self.verdict_selector.addItem("Все", None)
+        self.verdict_selector.addItem("Годные", True)
+        self.verdict_selector.addItem("Не годные", False)
+        layout.addRow("Результат:", self.verdict_selector)
+
+        self.format_selector = QComboBox()
+        for fmt, title, extension in FORMAT_TITLES:
+            if fmt != "parquet" or PARQUET_AVAILABLE:
+                self.format_selector.addItem(f"{title} (*{extension})", (fmt, extension))
+        layout.addRow("Формат:", self.format_selector)
+
+        buttons = QDialogButtonBox(QDialogButtonBox.Ok | QDialogButtonBox.Cancel)
+        buttons.accepted.connect(self.accept)
+        buttons.rejected.connect(self.reject)
+        layout.addRow(buttons)
+
+    def filters(self):
+        period = self.period_check.isChecked()
+        return {
+            "serial_prefix": self.serial_input.text().strip(),
+            "date_from": self.date_from_edit.date().toPython() if period else None,
+            "date_to": self.date_to_edit.date().toPython() if period else None,
+            "verdict": self.verdict_selector.currentData(),
+        }
+
+    def format(self):
+        # (формат, расширение файла)
+        return self.format_selector.currentData()
+
+    def format_title(self):
+        return self.format_selector.currentText()
@@ -0,0 +1,51 @@
+import os
+import sys
+from functools import lru_cache
+
+# Дополнительные каталоги шрифтов задаются через BMS_FONT_DIR
+# (несколько путей разделяются os.pathsep).
+FONT_DIRS = [p for p in os.environ.get("BMS_FONT_DIR", "").split(os.pathsep) if p]
+if sys.platform == "win32":
+    FONT_DIRS.append(os.path.join(os.environ.get("WINDIR", "C:/Windows"), "Fonts"))
+else:
+    FONT_DIRS += [
+        "/usr/share/fonts/truetype/msttcorefonts",
+        "/usr/share/fonts/msttcore",
+        "/usr/share/fonts/truetype/liberation",
+        "/usr/share/fonts/truetype/liberation2",
+        "/usr/share/fonts/liberation-serif",
+        "/usr/share/fonts/truetype/dejavu",
+        "/usr/share/fonts/dejavu",
+    ]
+
+# Имя шрифта в протоколе -> файлы в порядке предпочтения
+FONT_FILES = {
+    "TimesNewRoman": ["times.ttf", "Times_New_Roman.ttf", "LiberationSerif-Regular.ttf", "DejaVuSerif.ttf"],
+    "TimesNewRoman-Bold": ["timesbd.ttf", "Times_New_Roman_Bold.ttf", "LiberationSerif-Bold.ttf", "DejaVuSerif-Bold.ttf"],
+}
+
+_registered = False
+
+
+@lru_cache(maxsize=None)
+def find_font(name):
+    for filename in FONT_FILES[name]:
+        for directory in FONT_DIRS:
+            path = os.path.join(directory, filename)
+            if os.path.isfile(path):
+                return path
+    raise FileNotFoundError(f"Не найден шрифт {name}: {', '.join(FONT_FILES[name])}")
+
+
+def register_fonts():
+    # Файлы TTF разбираются один раз на процесс, при первом протоколе
+    global _registered
+    if _registered:
+        return
+    from reportlab.pdfbase import pdfmetrics
+    from reportlab.pdfbase.ttfonts import TTFont
+
+    for name in FONT_FILES:
+        pdfmetrics.registerFont(TTFont(name, find_font(name)))
+    _registered = True
+
@@ -0,0 +1,114 @@
+import os
+import mmap
+import hashlib
+from collections import namedtuple
+from concurrent.futures import ThreadPoolExecutor
+
+# Итог сверки архива протоколов с индексом:
+#   ok — хеш совпал (в том числе пропущенные как неизмененные),
+#   modified — хеш не совпал, missing — хеш записан, а файла нет на диске,
+#   unregistered — файл есть, но хеш для него нигде не записан,
+#   failed — файл не удалось прочитать: [(имя, ошибка)]
+VerifyReport = namedtuple("VerifyReport", "ok skipped modified missing unregistered failed")
+
+
+def hash_file(path):
+    # Чтение через mmap: хеш считается прямо по страницам файла без
+    # копирования в буферы Python, а hashlib на время расчета отпускает GIL,
+    # поэтому несколько файлов хешируются параллельно в потоках.
+    sha256 = hashlib.sha256()
+    with open(path, "rb") as f:
+        if os.fstat(f.fileno()).st_size:
+            with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as data:
+                sha256.update(data)
+    return sha256.hexdigest()
+
+
+def _check(path):
+    stat = os.stat(path)
+    return hash_file(path), stat.st_size, stat.st_mtime
+
+
+def verify_archive(catalogue, full=False, jobs=None, log_path="log.txt"):
+    # Эталон — хеш из индекса, а для файлов, которых в индексе нет или
+    # которые пересканирование убрало из него, — последний хеш из журнала.
+    # Инкрементальная сверка: файлы, у которых размер и время изменения не
+    # поменялись с последней успешной сверки, повторно не читаются (full=True
+    # перечитывает все). Результат сверки сохраняется в индексе.
+    on_disk = {}
+    if os.path.isdir(catalogue.report_dir):
+        with os.scandir(catalogue.report_dir) as entries:
+            for entry in entries:
+                if entry.name.endswith(".pdf") and entry.is_file():
+                    on_disk[entry.name] = entry.stat()
+
+    recorded = catalogue.logged_hashes(log_path)
+    verified_stat = {}
+    for filename, sha256, verified_size, verified_mtime in catalogue.integrity_rows():
+        if sha256:
+            recorded[filename] = sha256
+        verified_stat[filename] = (verified_size, verified_mtime)
+    # Протоколы в архиве сверяются с хешем при каждом чтении из него
+    for filename in catalogue.archived_filenames():
+        recorded.pop(filename, None)
+        on_disk.pop(filename, None)
+
+    ok, skipped, modified, failed = [], [], [], []
+    missing = sorted(recorded.keys() - on_disk.keys())
+    unregistered = sorted(on_disk.keys() - recorded.keys())
+    to_hash = {}
+    for filename, sha256 in recorded.items():
+        stat = on_disk.get(filename)
+        if stat is None:
+            continue
+        if not full and (stat.st_size, stat.st_mtime) == verified_stat.get(filename):
+            skipped.append(filename)
+        else:
+            to_hash[filename] = sha256
+
+    verified = []
+    workers = jobs or min(32, (os.cpu_count() or 1) + 4)
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        futures = {
+            filename: pool.submit(_check, os.path.join(catalogue.report_dir, filename))
+            for filename in to_hash
+        }
+        for filename, future in futures.items():
+            try:
+                file_hash, size, mtime = future.result()
+            except OSError as e:
+                failed.append((filename, str(e)))
+                continue
+            if file_hash == to_hash[filename]:
+                ok.append(filename)
+                verified.append((filename, size, mtime))
+            else:
+                modified.append(filename)
+    catalogue.mark_verified(verified, modified)
+
+    return VerifyReport(
+        sorted(ok + skipped), len(skipped), sorted(modified), missing, unregistered, sorted(failed)
+    )
+
+
+def describe(report, limit=None):
+    # Текстовый отчет о сверке; limit ограничивает число имен в каждом разделе
+    lines = [
+        f"Совпадает: {len(report.ok)} (без повторного чтения: {report.skipped})",
+        f"Изменены: {len(report.modified)}",
+        f"Отсутствуют: {len(report.missing)}",
+        f"Без записанного хеша: {len(report.unregistered)}",
+    ]
+    if report.failed:
+        lines.append(f"Ошибки чтения: {len(report.failed)}")
+    sections = [
+        ("Изменен", report.modified), ("Отсутствует", report.missing),
+        ("Не зарегистрирован", report.unregistered),
+        ("Ошибка чтения", [f"{name}: {error}" for name, error in report.failed]),
+    ]
+    for title, names in sections:
+        shown = names if limit is None else names[:limit]
+        lines += [f"{title}: {name}" for name in shown]
+        if len(shown) < len(names):
+            lines.append(f"{title}: … еще {len(names) - len(shown)}")
+    return lines
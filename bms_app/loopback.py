@@ -0,0 +1,50 @@
+# Имитатор стенда на псевдотерминале (Linux).
+# Запуск: python loopback.py [--interval 3 10] [--burst N] [--rate 1000]
+#                            [--seed N] [--profile mixed] [--speed 1]
+# Путь к pty печатается при старте, его нужно передать приложению
+# через переменную окружения BMS_SERIAL_PORT. Модель СКУ — emulator.BmsModel;
+# без pty тот же эмулятор подключается портом emu://.
+import os
+import sys
+import tty
+import select
+import argparse
+
+from emulator import BmsModel, VirtualClock, PROFILES
+
+
+class LoopbackDevice:
+    def __init__(self, interval=(3, 10), burst=1, rate=1000, seed=None, profile="mixed", speed=1.0):
+        self.master, self.slave = os.openpty()
+        tty.setraw(self.slave)
+        self.port = os.ttyname(self.slave)
+        self.model = BmsModel(seed, profile, rate, interval, burst)
+        self.clock = VirtualClock(speed)
+
+    def run(self):
+        while True:
+            timeout = self.clock.delay(self.model.next_event())
+            ready, _, _ = select.select([self.master], [], [], timeout)
+            if ready:
+                self.model.feed(os.read(self.master, 4096))
+            data = self.model.advance(self.clock.now())
+            if data:
+                os.write(self.master, data)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Имитатор стенда на псевдотерминале")
+    parser.add_argument("--interval", nargs=2, type=float, default=(3, 10), metavar=("MIN", "MAX"))
+    parser.add_argument("--burst", type=int, default=1)
+    parser.add_argument("--rate", type=int, default=1000, help="частота отсчетов телеметрии, Гц")
+    parser.add_argument("--seed", type=int, help="начальное значение генератора, для повторяемости")
+    parser.add_argument("--profile", choices=sorted(PROFILES), default="mixed")
+    parser.add_argument("--speed", type=float, default=1.0, help="ускорение времени (больше 0)")
+    args = parser.parse_args()
+
+    device = LoopbackDevice(tuple(args.interval), args.burst, args.rate, args.seed, args.profile, args.speed)
+    print(f"BMS_SERIAL_PORT={device.port}", flush=True)
+    try:
+        device.run()
+    except KeyboardInterrupt:
+        sys.exit(0)
@@ -0,0 +1,210 @@
+import os
+import time
+import bisect
+import threading
+from collections import deque
+from contextlib import contextmanager
+
+# Метрики процесса: счетчики и гистограммы длительностей этапов от кадра
+# стенда до строки в списке протоколов. Экспорт — текстовый формат
+# Prometheus: файл BMS_METRICS_FILE (для textfile-коллектора node_exporter)
+# и GET /metrics локального API.
+METRICS_FILE = os.environ.get("BMS_METRICS_FILE")
+# Период записи файла метрик, с
+EXPORT_INTERVAL = 15
+
+# Границы корзин гистограмм длительностей, с
+BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+
+# Этапы обработки (метка stage): ожидание в очереди сигналов, разбор кадра,
+# обработка результата стендом, постановка в очередь и формирование
+# протокола, отрисовка PDF и хеш в рабочем процессе, запись в индекс,
+# выборка для списка протоколов и для вкладки статистики
+STAGES = ("delivery", "decode", "analysis", "report", "render", "hash", "index", "report_list", "stats")
+
+
+def _labels(labels):
+    return tuple(sorted(labels.items()))
+
+
+def _format_labels(key, extra=()):
+    pairs = [*key, *extra]
+    if not pairs:
+        return ""
+    return "{" + ",".join(f'{name}="{_escape(value)}"' for name, value in pairs) + "}"
+
+
+def _escape(value):
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+class Counter:
+    def __init__(self, name, help_text):
+        self.name = name
+        self.help = help_text
+        self._values = {}
+        self._lock = threading.Lock()
+
+    def inc(self, amount=1, **labels):
+        key = _labels(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def value(self, **labels):
+        # Сумма по всем рядам с заданными метками (без меток — общий итог)
+        wanted = set(labels.items())
+        with self._lock:
+            return sum(value for key, value in self._values.items() if wanted <= set(key))
+
+    def render(self):
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} counter"]
+        with self._lock:
+            for key, value in sorted(self._values.items()):
+                lines.append(f"{self.name}{_format_labels(key)} {value}")
+        return lines
+
+
+class Histogram:
+    # Счетчики по корзинам, сумма и число наблюдений — для каждого набора меток
+    def __init__(self, name, help_text, buckets=BUCKETS):
+        self.name = name
+        self.help = help_text
+        self.buckets = buckets
+        self._series = {}
+        self._lock = threading.Lock()
+
+    def observe(self, value, **labels):
+        key = _labels(labels)
+        with self._lock:
+            series = self._series.get(key)
+            if series is None:
+                series = self._series[key] = [[0] * (len(self.buckets) + 1), 0.0, 0]
+            series[0][bisect.bisect_left(self.buckets, value)] += 1
+            series[1] += value
+            series[2] += 1
+
+    def summary(self, **labels):
+        # (число, среднее, медиана, 95-й процентиль) или None
+        with self._lock:
+            series = self._series.get(_labels(labels))
+            if series is None:
+                return None
+            counts, total, count = list(series[0]), series[1], series[2]
+        return count, total / count, self._quantile(counts, count, 0.5), self._quantile(counts, count, 0.95)
+
+    def _quantile(self, counts, count, q):
+        # Линейная интерполяция внутри корзины, как histogram_quantile()
+        rank = q * count
+        seen = 0
+        for i, bucket_count in enumerate(counts):
+            if seen + bucket_count >= rank and bucket_count:
+                if i == len(self.buckets):
+                    return self.buckets[-1]
+                lower = self.buckets[i - 1] if i else 0.0
+                return lower + (self.buckets[i] - lower) * (rank - seen) / bucket_count
+            seen += bucket_count
+        return 0.0
+
+    def render(self):
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} histogram"]
+        with self._lock:
+            series = sorted((key, list(counts), total, count) for key, (counts, total, count) in self._series.items())
+        for key, counts, total, count in series:
+            cumulative = 0
+            for bound, bucket_count in zip([*self.buckets, "+Inf"], counts):
+                cumulative += bucket_count
+                lines.append(f"{self.name}_bucket{_format_labels(key, [('le', bound)])} {cumulative}")
+            lines.append(f"{self.name}_sum{_format_labels(key)} {total:.6f}")
+            lines.append(f"{self.name}_count{_format_labels(key)} {count}")
+        return lines
+
+
+class Gauge:
+    def __init__(self, name, help_text):
+        self.name = name
+        self.help = help_text
+        self._values = {}
+        self._lock = threading.Lock()
+
+    def set(self, value, **labels):
+        with self._lock:
+            self._values[_labels(labels)] = value
+
+    def value(self, **labels):
+        return self._values.get(_labels(labels))
+
+    def render(self):
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} gauge"]
+        with self._lock:
+            for key, value in sorted(self._values.items()):
+                lines.append(f"{self.name}{_format_labels(key)} {value:.6f}")
+        return lines
+
+
+class RateWindow:
+    # Число событий за последний час: для «испытаний в час» без запроса к Prometheus
+    def __init__(self, name, help_text, window=3600):
+        self.name = name
+        self.help = help_text
+        self.window = window
+        self._times = deque()
+        self._lock = threading.Lock()
+
+    def mark(self):
+        with self._lock:
+            self._times.append(time.monotonic())
+
+    def value(self):
+        limit = time.monotonic() - self.window
+        with self._lock:
+            while self._times and self._times[0] < limit:
+                self._times.popleft()
+            return len(self._times)
+
+    def render(self):
+        return [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} gauge", f"{self.name} {self.value()}"]
+
+
+TESTS = Counter("bms_tests_total", "Получено результатов испытаний")
+REPORTS = Counter("bms_reports_total", "Протоколы по итогу формирования")
+REPORT_RETRIES = Counter("bms_report_retries_total", "Повторные попытки формирования протокола")
+STAGE_SECONDS = Histogram("bms_stage_seconds", "Длительность этапов обработки, с")
+TESTS_LAST_HOUR = RateWindow("bms_tests_last_hour", "Испытаний за последний час")
+# phase="login" — от запуска до окна входа, "ready" — от входа до готового окна
+STARTUP_SECONDS = Gauge("bms_startup_seconds", "Время запуска, с")
+METRICS = (TESTS, TESTS_LAST_HOUR, REPORTS, REPORT_RETRIES, STAGE_SECONDS, STARTUP_SECONDS)
+
+
+def observe(stage, seconds):
+    STAGE_SECONDS.observe(seconds, stage=stage)
+
+
+@contextmanager
+def span(stage):
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        observe(stage, time.perf_counter() - started)
+
+
+def count_test(stand, passed):
+    TESTS.inc(stand=stand, verdict="passed" if passed else "failed")
+    TESTS_LAST_HOUR.mark()
+
+
+def render_metrics():
+    lines = []
+    for metric in METRICS:
+        lines += metric.render()
+    return "\n".join(lines) + "\n"
+
+
+def write_metrics(path=METRICS_FILE):
+    # Файл заменяется целиком, чтобы коллектор не прочитал его недописанным
+    if not path:
+        return
+    temp = f"{path}.tmp"
+    with open(temp, "w", encoding="utf-8") as f:
+        f.write(render_metrics())
+    os.replace(temp, path)
@@ -0,0 +1,135 @@
+import struct
+import binascii
+from array import array
+from datetime import datetime
+
+from results import TestResult, CHANNELS, CHECKS, SC_TRIPPED, SC_NOT_TRIPPED, SC_NOT_REACHED
+
+# Формат кадра: SYNC | LEN (2 байта, LE) | TYPE | PAYLOAD | CRC16-CCITT (2 байта, LE)
+# CRC считается по полям LEN, TYPE и PAYLOAD.
+SYNC = 0xA5
+HEADER = struct.Struct("<BHB")
+CRC = struct.Struct("<H")
+MAX_PAYLOAD = 1024
+
+FRAME_PING = 0x01
+FRAME_PONG = 0x02
+FRAME_RESET = 0x03
+FRAME_RESULT = 0x11
+FRAME_STEP = 0x12
+FRAME_STEP_DONE = 0x13
+FRAME_TELEMETRY = 0x20
+FRAME_SAMPLES = 0x21
+
+# Результат испытания: номер испытания, 8 байт флагов каналов
+# (бит j — проверка j пройдена), код результата по КЗ, длительность, с.
+# Необязательный хвост — 32 значения float32 с напряжениями срабатывания.
+RESULT = struct.Struct("<I8sBf")
+MEASUREMENTS = struct.Struct(f"<{CHANNELS * CHECKS}f")
+
+# Шаг программы испытаний: номер шага, вид шага, канал (ALL_CHANNELS —
+# вся батарея), уставка, выдержка, с. Ответ стенда по окончании шага:
+# номер шага, канал, фактическая длительность, с.
+STEP = struct.Struct("<BBBff")
+STEP_DONE = struct.Struct("<BBf")
+ALL_CHANNELS = 0xFF
+
+# Ответ на PING: необязательно — частота отсчетов телеметрии, Гц. Без нее
+# считается telemetry.SAMPLE_RATE.
+PONG = struct.Struct("<I")
+
+# Пакет телеметрии: номер первого отсчета, число отсчетов, затем отсчеты
+# по SAMPLE_FIELDS значений float32 (8 напряжений и ток разряда)
+SAMPLES = struct.Struct("<IH")
+SAMPLE_FIELDS = CHANNELS + 1
+SAMPLE_SIZE = SAMPLE_FIELDS * 4
+MAX_SAMPLES = (MAX_PAYLOAD - SAMPLES.size) // SAMPLE_SIZE
+
+
+def crc16(data):
+    return binascii.crc_hqx(data, 0xFFFF)
+
+
+def encode_frame(frame_type, payload=b""):
+    if len(payload) > MAX_PAYLOAD:
+        raise ValueError(f"Слишком длинный кадр: {len(payload)} байт")
+    header = HEADER.pack(SYNC, len(payload), frame_type)
+    crc = binascii.crc_hqx(payload, crc16(header[1:]))
+    return header + payload + CRC.pack(crc)
+
+
+def encode_result(test_id, checks, short_circuit, duration, measurements=None):
+    flags = bytes(
+        sum(1 << j for j, passed in enumerate(channel) if passed)
+        for channel in checks
+    )
+    payload = RESULT.pack(test_id, flags, short_circuit, duration)
+    if measurements is not None:
+        payload += MEASUREMENTS.pack(*measurements)
+    return encode_frame(FRAME_RESULT, payload)
+
+
+def encode_samples(seq, samples):
+    data = memoryview(samples).cast("B")
+    count = len(data) // SAMPLE_SIZE
+    return encode_frame(FRAME_SAMPLES, SAMPLES.pack(seq, count) + data[:count * SAMPLE_SIZE])
+
+
+def decode_result(payload):
+    test_id, flags, short_circuit, duration = RESULT.unpack_from(payload)
+    checks = array("b", [mask >> j & 1 for mask in flags for j in range(CHECKS)])
+    measurements = None
+    if len(payload) >= RESULT.size + MEASUREMENTS.size:
+        measurements = array("f")
+        measurements.frombytes(payload[RESULT.size:RESULT.size + MEASUREMENTS.size])
+    timestamp = datetime.now().strftime("%H:%M:%S")
+    return TestResult(test_id, timestamp, round(duration, 3), short_circuit, checks, measurements)
+
+
+class FrameParser:
+    # Инкрементальный разбор потока: байты копятся в одном bytearray,
+    # кадры передаются обработчику срезами memoryview без копирования,
+    # а обработанная часть буфера удаляется один раз за вызов feed().
+    def __init__(self, handler):
+        self.handler = handler
+        self.buffer = bytearray()
+        self.crc_errors = 0
+
+    def feed(self, data):
+        buf = self.buffer
+        buf += data
+        pos = 0
+        end = len(buf)
+        with memoryview(buf) as view:
+            while True:
+                start = buf.find(SYNC, pos)
+                if start < 0:
+                    pos = end
+                    break
+                if end - start < HEADER.size:
+                    pos = start
+                    break
+                _, length, frame_type = HEADER.unpack_from(buf, start)
+                if length > MAX_PAYLOAD:
+                    pos = start + 1
+                    continue
+                frame_end = start + HEADER.size + length + CRC.size
+                if frame_end > end:
+                    pos = start
+                    break
+                body = view[start + 1:frame_end - CRC.size]
+                (crc,) = CRC.unpack_from(buf, frame_end - CRC.size)
+                if crc16(body) != crc:
+                    body.release()
+                    self.crc_errors += 1
+                    pos = start + 1
+                    continue
+                payload = body[HEADER.size - 1:]
+                try:
+                    self.handler(frame_type, payload)
+                finally:
+                    payload.release()
+                    body.release()
+                pos = frame_end
+        if pos:
+            del buf[:pos]
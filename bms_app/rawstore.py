@@ -0,0 +1,196 @@
+import os
+import time
+import struct
+import threading
+from array import array
+
+import numpy as np
+
+from results import TestResult, CHANNELS, CHECKS
+from telemetry import FIELDS, SAMPLE_RATE
+
+RAW_DIR = "raw"
+MAGIC = b"BMSRAW02"
+# Заголовок сегмента: сигнатура, размер записи, имя стенда, время начала,
+# частота отсчетов, Гц. Частота — последнее поле: ее дописывает set_rate.
+FILE_HEADER = struct.Struct("<8sH32sdI")
+RATE = struct.Struct("<I")
+# Сегменты первой версии — без частоты, записаны на SAMPLE_RATE
+MAGIC_V1 = b"BMSRAW01"
+FILE_HEADER_V1 = struct.Struct("<8sH32sd")
+HEADER_SIZE = 64
+
+# Запись фиксированной длины. Колонки читаются из memmap срезами без копирования:
+# segment.records["values"][:, 3] — напряжение 4-го канала.
+RECORD = np.dtype([
+    ("time", "<f8"),
+    ("seq", "<u4"),
+    ("kind", "u1"),
+    ("code", "u1"),
+    ("reserved", "<u2"),
+    ("values", "<f4", (FIELDS,)),
+])
+
+KIND_SAMPLE = 0
+KIND_EVENT = 1
+
+EVENT_START = 0
+EVENT_TELEMETRY = 1
+EVENT_RESULT = 2
+EVENT_CHANNEL = 3
+EVENT_RESET = 4
+# Вердикт, вычисленный по телеметрии; EVENT_RESULT — вердикт самого стенда
+EVENT_ANALYSIS = 5
+
+
+def segment_path(serial_number, timestamp, raw_dir=RAW_DIR):
+    # Один каталог на заводской номер, один сегмент на испытание
+    stamp = timestamp.replace("-", "").replace(":", "").replace(" ", "_")
+    return os.path.join(raw_dir, serial_number, f"{stamp}.bin")
+
+
+class RawRecorder:
+    # Запись испытания в текущий сегмент стенда (только дозапись).
+    # Отсчеты пишет поток чтения порта, события — GUI; доступ под блокировкой.
+    def __init__(self, stand_name, raw_dir=RAW_DIR, rate=SAMPLE_RATE):
+        self.stand_name = stand_name
+        self.raw_dir = raw_dir
+        self.rate = rate
+        self.path = None
+        self.has_result = False
+        self._file = None
+        self._lock = threading.Lock()
+
+    def start_run(self):
+        with self._lock:
+            self._close()
+            directory = os.path.join(self.raw_dir, "_current")
+            os.makedirs(directory, exist_ok=True)
+            self.path = os.path.join(directory, f"{self.stand_name.replace(' ', '_')}.bin")
+            self._file = open(self.path, "wb")
+            self.has_result = False
+            header = FILE_HEADER.pack(
+                MAGIC, RECORD.itemsize, self.stand_name.encode("utf-8")[:32], time.time(), self.rate
+            )
+            self._file.write(header.ljust(HEADER_SIZE, b"\0"))
+        self.append_event(EVENT_START)
+
+    def set_rate(self, rate):
+        # Частота, о которой сообщил стенд (PONG); сегмент уже может быть
+        # открыт, тогда частота исправляется в его заголовке
+        with self._lock:
+            if rate == self.rate:
+                return
+            self.rate = rate
+            if self._file is not None:
+                self._file.seek(FILE_HEADER.size - RATE.size)
+                self._file.write(RATE.pack(rate))
+                self._file.seek(0, os.SEEK_END)
+
+    def append_samples(self, seq, samples):
+        records = np.zeros(len(samples) // FIELDS, dtype=RECORD)
+        records["time"] = time.time()
+        records["seq"] = np.arange(seq, seq + len(records), dtype=np.uint64).astype(np.uint32)
+        records["kind"] = KIND_SAMPLE
+        records["values"] = np.reshape(samples, (-1, FIELDS))
+        with self._lock:
+            if self._file is not None:
+                self._file.write(records.tobytes())
+
+    def append_event(self, code, values=(), seq=0):
+        record = np.zeros(1, dtype=RECORD)
+        record["time"] = time.time()
+        record["seq"] = seq
+        record["kind"] = KIND_EVENT
+        record["code"] = code
+        record["values"][0, :len(values)] = values
+        with self._lock:
+            if self._file is not None:
+                self._file.write(record.tobytes())
+                self._file.flush()
+
+    def append_result(self, result, code=EVENT_RESULT):
+        self.has_result = True
+        short_circuit = -1 if result.short_circuit is None else result.short_circuit
+        self.append_event(code, (result.duration, short_circuit), seq=result.test_id)
+        for i in range(CHANNELS):
+            start = i * CHECKS
+            values = list(result.checks[start:start + CHECKS]) + list(result.measurements[start:start + CHECKS])
+            self.append_event(EVENT_CHANNEL, values, seq=i)
+
+    def finish(self, serial_number=None, timestamp=None):
+        # Сегмент сохраненного испытания переносится в каталог заводского номера,
+        # несохраненного — в raw/_unsaved (если результат был получен)
+        with self._lock:
+            self._close()
+            if self.path is None or not os.path.exists(self.path):
+                return None
+            if not serial_number and not self.has_result:
+                os.remove(self.path)
+                self.path = None
+                return None
+            if serial_number:
+                target = segment_path(serial_number, timestamp, self.raw_dir)
+            else:
+                stamp = time.strftime("%Y%m%d_%H%M%S")
+                target = os.path.join(self.raw_dir, "_unsaved", f"{os.path.basename(self.path)[:-4]}_{stamp}.bin")
+            os.makedirs(os.path.dirname(target), exist_ok=True)
+            os.replace(self.path, target)
+            self.path = None
+            return target
+
+    def close(self):
+        with self._lock:
+            self._close()
+
+    def _close(self):
+        if self._file is not None:
+            self._file.close()
+            self._file = None
+
+
+class RawSegment:
+    # Чтение сегмента через memmap: данные не загружаются в память целиком
+    def __init__(self, path):
+        self.path = path
+        with open(path, "rb") as f:
+            header = f.read(HEADER_SIZE)
+        if header[:len(MAGIC)] == MAGIC:
+            magic, record_size, stand_name, started, self.rate = FILE_HEADER.unpack_from(header)
+        elif header[:len(MAGIC_V1)] == MAGIC_V1:
+            magic, record_size, stand_name, started = FILE_HEADER_V1.unpack_from(header)
+            self.rate = SAMPLE_RATE
+        else:
+            raise ValueError(f"Неверный формат файла измерений: {path}")
+        if record_size != RECORD.itemsize or not self.rate:
+            raise ValueError(f"Неверный формат файла измерений: {path}")
+        self.stand_name = stand_name.rstrip(b"\0").decode("utf-8")
+        self.started = started
+        count = (os.path.getsize(path) - HEADER_SIZE) // RECORD.itemsize
+        if count > 0:
+            self.records = np.memmap(path, dtype=RECORD, mode="r", offset=HEADER_SIZE, shape=(count,))
+        else:
+            self.records = np.zeros(0, dtype=RECORD)
+
+    def samples(self):
+        mask = self.records["kind"] == KIND_SAMPLE
+        return self.records["values"][mask]
+
+    def events(self):
+        return self.records[self.records["kind"] == KIND_EVENT]
+
+    def result(self, code=EVENT_RESULT):
+        events = self.events()
+        results = np.flatnonzero(events["code"] == code)
+        if not len(results):
+            return None
+        head = events[results[-1]]
+        channels = events[results[-1] + 1:results[-1] + 1 + CHANNELS]
+        checks = array("b", channels["values"][:, :CHECKS].astype(np.int8).ravel().tobytes())
+        measurements = array("f", channels["values"][:, CHECKS:2 * CHECKS].ravel().tobytes())
+        short_circuit = int(head["values"][1])
+        return TestResult(
+            int(head["seq"]), time.strftime("%H:%M:%S", time.localtime(head["time"])),
+            round(float(head["values"][0]), 3), None if short_circuit < 0 else short_circuit,
+            checks, measurements
+        )
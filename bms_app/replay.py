@@ -0,0 +1,38 @@
+from PySide6.QtCore import QObject, QTimer, Signal
+
+from rawstore import KIND_SAMPLE
+
+
+class ReplayPlayer(QObject):
+    # Воспроизведение сегмента измерений в буфер телеметрии. Записи читаются
+    # из memmap порциями, поэтому в памяти одновременно только одна порция.
+    # Темп — по частоте отсчетов из заголовка сегмента.
+    finished = Signal()
+
+    def __init__(self, segment, buffer, speed=1.0, fps=25, parent=None):
+        super().__init__(parent)
+        self.segment = segment
+        self.buffer = buffer
+        self.position = 0
+        self.step = max(1, int(segment.rate * speed / fps))
+        self.timer = QTimer(self)
+        self.timer.setInterval(1000 // fps)
+        self.timer.timeout.connect(self.on_timer)
+
+    def start(self):
+        self.buffer.clear()
+        self.position = 0
+        self.timer.start()
+
+    def stop(self):
+        self.timer.stop()
+
+    def on_timer(self):
+        chunk = self.segment.records[self.position:self.position + self.step]
+        self.position += len(chunk)
+        samples = chunk["values"][chunk["kind"] == KIND_SAMPLE]
+        if len(samples):
+            self.buffer.append(samples)
+        if self.position >= len(self.segment.records):
+            self.stop()
+            self.finished.emit()
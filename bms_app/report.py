@@ -0,0 +1,460 @@
+import re
+import hashlib
+from collections import namedtuple
+from functools import lru_cache
+
+from fonts import register_fonts
+from results import SC_TRIPPED, CHANNELS, CHECKS
+
+# Неизменяемый снимок всего, что нужно для протокола: его можно передать
+# в рабочий процесс, не трогая состояние окна.
+ReportSnapshot = namedtuple(
+    "ReportSnapshot",
+    "filename system_name serial_number bms_model test_area date_str timestamp result operator engineer"
+)
+
+DEFAULT_BMS_MODEL = "BMS_ABC123"
+DEFAULT_TEST_AREA = "испытательный участок ООО «__________»"
+
+
+# Название системы и заводской номер входят в имена файлов протокола и
+# сегмента измерений, поэтому в них нет разделителей пути и «..»
+NAME_PATTERN = re.compile(r"[\w.-]{1,64}")
+
+
+def safe_name(value, title="Имя"):
+    name = str(value).strip().replace(" ", "_")
+    if not NAME_PATTERN.fullmatch(name) or ".." in name:
+        raise ValueError(f"{title}: допустимы буквы, цифры, «_», «-» и «.» (без «..»), не длиннее 64 знаков")
+    return name
+
+
+def report_filename(system_name, serial_number, moment, report_dir="reports"):
+    return f"{report_dir}/report_{system_name}_{serial_number}_{moment.strftime('%Y%m%d_%H%M%S')}.pdf"
+
+
+def engineer_name(user_info):
+    # Получение ФИО
+    lastname = user_info.get("lastname", "")
+    firstname = user_info.get("firstname", "")
+    middlename = user_info.get("middlename", "")
+    return f"{lastname} {firstname[:1]}.{middlename[:1]}."
+
+
+def make_snapshot(system_name, serial_number, moment, result, operator, user_info,
+                  test_area=None, bms_model=None, filename=None):
+    return ReportSnapshot(
+        filename=filename or report_filename(system_name, serial_number, moment),
+        system_name=system_name,
+        serial_number=serial_number,
+        bms_model=bms_model or DEFAULT_BMS_MODEL,
+        test_area=test_area or DEFAULT_TEST_AREA,
+        date_str=moment.strftime("«%d» %B %Y г."),
+        timestamp=moment.strftime("%Y-%m-%d %H:%M:%S"),
+        result=result,
+        operator=operator,
+        engineer=engineer_name(user_info),
+    )
+
+
+# Имена PDF-форм со статическим содержимым протокола
+FORM_HEADER = "ProtocolHeader"
+FORM_TABLE = "ProtocolTable"
+FORM_SIGNATURE = "ProtocolSignature"
+FORM_LOT_HEADER = "LotTableHeader"
+FORM_LOT_TOTALS = "LotTotals"
+
+FONT = "TimesNewRoman"
+FONT_BOLD = "TimesNewRoman-Bold"
+MARGIN = 50
+MIN_Y_MARGIN = 50
+LINE = 15
+
+GOAL_LINES = [
+    "Проверка соответствия системы контроля литий-ионной аккумуляторной батареи",
+    "функциональным требованиям",
+    "по защите аккумуляторной батареи от перезаряда, переразряда, токов короткого замыкания.",
+    "- отключение тока заряда при напряжении 4,25±0,05 В на любом из аккумуляторов;",
+    "- отключение тока разряда при напряжении 2,85±0,05 В на любом из аккумуляторов;",
+    "- отключение при превышении тока разряда свыше 50 А."
+]
+TABLE_HEADER = [
+    "№ канала",
+    "Работа при\nнапряжении\nниже 4,2 В",
+    "Отключение при\nнапряжении\nвыше 4,3 В",
+    "Работа при\nнапряжении\nвыше 2,9 В",
+    "Отключение при\nнапряжении\nниже 2,8 В",
+]
+TABLE_FONT_SIZE = 10
+TABLE_LEADING = 12
+TABLE_PADDING = 3
+SHORT_CIRCUIT_LABEL = "Отключение разряда по превышению тока 50 А: "
+INSPECTOR = "Финогенова Е.С."
+
+# Сводная таблица протокола партии: (заголовок, ширина столбца)
+LOT_COLUMNS = [
+    ("№", 30),
+    ("Зав. №", 110),
+    ("Дата и время", 115),
+    ("Каналы с отказом", 120),
+    ("КЗ", 50),
+    ("Результат", 70),
+]
+LOT_ROW = 16
+
+
+class ProtocolTemplate:
+    # Раскладка протокола до заключения не зависит от испытания, поэтому
+    # координаты считаются один раз на процесс, а неизменный текст, сетка
+    # и шапка таблицы рисуются в PDF-формы и на странице вызываются одной
+    # командой. На страницу выводятся только поля конкретного изделия.
+    def __init__(self):
+        from reportlab import rl_config
+        from reportlab.lib.pagesizes import A4
+        from reportlab.lib.units import mm
+        from reportlab.pdfbase.pdfmetrics import stringWidth
+
+        register_fonts()
+        # Потоки страниц, форм и шрифтов сжимаются без ASCII85-обертки:
+        # она лишь увеличивает файл на четверть и заметно тормозит
+        rl_config.useA85 = 0
+        self.pagesize = A4
+        self.width, self.height = A4
+
+        # Поля после неизменных подписей
+        self.model_x = 70
+        self.serial_label = "зав. № "
+        self.serial_x = 150 + stringWidth(self.serial_label, FONT, 12)
+        self.date_label = "3.  Дата проведения испытания: "
+        self.date_x = MARGIN + stringWidth(self.date_label, FONT, 12)
+        self.area_label = "4.  Место проведения испытания: "
+        self.area_x = MARGIN + stringWidth(self.area_label, FONT, 12)
+        self.short_circuit_x = MARGIN + stringWidth(SHORT_CIRCUIT_LABEL, FONT, 12)
+
+        # Разделы 1–5 целиком помещаются на первой странице
+        y = self.height - 140
+        self.object_y = y
+        y -= LINE
+        self.serial_y = y
+        y -= 25
+        self.goal_y = y
+        y -= LINE
+        self.goal_lines_y = []
+        for _ in GOAL_LINES:
+            self.goal_lines_y.append(y)
+            y -= LINE
+        y -= 10
+        self.date_y = y
+        y -= 20
+        self.area_y = y
+        y -= 30
+        self.results_y = y
+        y -= 20
+
+        # Таблица результатов: шапка из трех строк и по строке на канал
+        self.col_widths = [20 * mm, 40 * mm, 40 * mm, 40 * mm, 40 * mm]
+        header_height = 3 * TABLE_LEADING + 2 * TABLE_PADDING
+        row_height = TABLE_LEADING + 2 * TABLE_PADDING
+        self.table_top = y
+        self.row_tops = [y - header_height - row_height * i for i in range(CHANNELS + 1)]
+        self.table_bottom = self.row_tops[-1]
+        self.col_lefts = [MARGIN]
+        for col_width in self.col_widths:
+            self.col_lefts.append(self.col_lefts[-1] + col_width)
+        self.col_centers = [
+            left + col_width / 2 for left, col_width in zip(self.col_lefts, self.col_widths)
+        ]
+        # Базовая линия однострочной ячейки при выравнивании по середине
+        self.cell_y = [
+            top - row_height + (row_height + TABLE_LEADING) / 2 - TABLE_FONT_SIZE
+            for top in self.row_tops[:-1]
+        ]
+        self.short_circuit_y = self.table_bottom - 40 - 5
+        self.conclusion_y = self.short_circuit_y - 30
+        self.text_width = self.width - 2 * MARGIN
+
+    def define_forms(self, c):
+        # Формы принадлежат документу: определяются один раз на холст
+        # и используются на всех его страницах
+        self._header_form(c)
+        self._table_form(c)
+        self._signature_form(c)
+
+    def _header_form(self, c):
+        width, height = self.width, self.height
+        c.beginForm(FORM_HEADER)
+        c.setFont(FONT_BOLD, 12)
+        c.drawCentredString(width / 2, height - 50, "ПРОТОКОЛ")
+        c.setFont(FONT, 12)
+        c.drawCentredString(width / 2, height - 70, "Проверки соответствия системы контроля литий-ионной аккумуляторной батареи")
+        c.drawCentredString(width / 2, height - 85, "функциональным требованиям")
+        c.drawString(MARGIN, height - 110, "№ 1246")
+
+        c.drawString(MARGIN, self.object_y, "1.  Объект испытания: система контроля литий-ионной аккумуляторной батареи")
+        c.drawString(150, self.serial_y, self.serial_label)
+        c.drawString(MARGIN, self.goal_y, "2.  Цель испытания:")
+        for line, y in zip(GOAL_LINES, self.goal_lines_y):
+            c.drawString(70, y, line)
+        c.drawString(MARGIN, self.date_y, self.date_label)
+        c.drawString(MARGIN, self.area_y, self.area_label)
+        c.drawString(MARGIN, self.results_y, "5.  Результаты испытания:")
+        c.drawString(MARGIN, self.short_circuit_y, SHORT_CIRCUIT_LABEL)
+        c.endForm()
+
+    def _table_form(self, c):
+        c.beginForm(FORM_TABLE)
+        c.setLineWidth(0.5)
+        left, right = self.col_lefts[0], self.col_lefts[-1]
+        for y in [self.table_top] + self.row_tops:
+            c.line(left, y, right, y)
+        for x in self.col_lefts:
+            c.line(x, self.table_top, x, self.table_bottom)
+
+        c.setFont(FONT, TABLE_FONT_SIZE)
+        header_height = self.table_top - self.row_tops[0]
+        for text, x in zip(TABLE_HEADER, self.col_centers):
+            lines = text.split("\n")
+            y = self.row_tops[0] + (header_height + len(lines) * TABLE_LEADING) / 2 - TABLE_FONT_SIZE
+            for line in lines:
+                c.drawCentredString(x, y, line)
+                y -= TABLE_LEADING
+        for i, y in enumerate(self.cell_y):
+            c.drawCentredString(self.col_centers[0], y, str(i + 1))
+        c.endForm()
+
+    def _signature_form(self, c):
+        # Координаты отсчитываются от строки «Испытание проводил:»,
+        # форма выводится со сдвигом туда, где закончилось заключение
+        c.beginForm(FORM_SIGNATURE, 0, -3 * 20, self.width, 20)
+        c.setFont(FONT, 12)
+        c.drawString(MARGIN, 0, "Испытание проводил:")
+        c.drawString(MARGIN, -20, "Инженер:")
+        c.drawString(MARGIN, -40, "Контролер ОТК:")
+        c.drawRightString(self.width - MARGIN, -40, INSPECTOR)
+        c.endForm()
+
+    def draw_form(self, c, name, y=0):
+        c.saveState()
+        if y:
+            c.translate(0, y)
+        c.doForm(name)
+        c.restoreState()
+
+
+@lru_cache(maxsize=None)
+def protocol_template():
+    return ProtocolTemplate()
+
+
+def wrap_text(text, width, font=FONT, size=12):
+    from reportlab.lib.utils import simpleSplit
+
+    return simpleSplit(text, font, size, width)
+
+
+def render_report(snapshot):
+    passed = write_report(snapshot)
+    return snapshot.filename, calculate_file_hash(snapshot.filename), passed
+
+
+def write_report(snapshot):
+    # PDF протокола без расчета хеша; возвращает признак годности.
+    # reportlab импортируется только при формировании первого протокола
+    from reportlab.pdfgen import canvas
+
+    template = protocol_template()
+    c = canvas.Canvas(snapshot.filename, pagesize=template.pagesize, pageCompression=1)
+    template.define_forms(c)
+    passed = draw_protocol(c, template, snapshot)
+    c.save()
+    return passed
+
+
+def draw_protocol(c, template, snapshot):
+    # Протокол одного изделия начиная с текущей страницы холста; формы
+    # шаблона должны быть уже определены. Возвращает признак годности.
+    width, height = template.width, template.height
+    serial_number = snapshot.serial_number
+
+    template.draw_form(c, FORM_HEADER)
+    c.setFont(FONT, 12)
+    c.drawRightString(width - MARGIN, height - 110, snapshot.date_str)
+    c.drawString(template.serial_x, template.serial_y, f"{serial_number.strip()}.")
+    c.drawString(template.date_x, template.date_y, snapshot.date_str)
+    c.drawString(template.area_x, template.area_y, f"{snapshot.test_area}.")
+    c.setFont(FONT_BOLD, 12)
+    c.drawString(template.model_x, template.serial_y, snapshot.bms_model)
+
+    draw_results_table(c, template, snapshot.result)
+    # Вердикт протокола — тот же TestResult.passed, что в индексе и статистике:
+    # проверка без данных, как и несработавшая защита от КЗ, — отрицательный результат
+    has_negative_result = not snapshot.result.passed
+
+    # Проверка отключения по превышению тока
+    if snapshot.result.short_circuit == SC_TRIPPED:
+        discharge_status = "выполнено"
+    else:
+        discharge_status = "не выполнено"
+
+    c.setFont(FONT, 12)
+    c.drawString(template.short_circuit_x, template.short_circuit_y, discharge_status)
+
+    # Раздел 6: Заключение
+    conclusion_text = (
+        f"6. Заключение\n"
+        f"Система контроля литий-ионной аккумуляторной батареи {snapshot.system_name} "
+        f"зав. № {serial_number} прошла проверку на соответствие функциональным требованиям по "
+        f"защите аккумуляторной батареи от перезаряда, переразряда, токов короткого замыкания "
+        f"с {'отрицательным' if has_negative_result else 'положительным'} результатом и "
+        f"{'не ' if has_negative_result else ''}пригодна к использованию по назначению."
+    )
+
+    y = template.conclusion_y
+    for line in wrap_text(conclusion_text, template.text_width):
+        if y < MIN_Y_MARGIN + 20:
+            c.showPage()
+            c.setFont(FONT, 12)
+            y = height - 50
+        c.drawString(MARGIN, y, line)
+        y -= LINE
+
+    # Подпись
+    if y < MIN_Y_MARGIN + 60:
+        c.showPage()
+        c.setFont(FONT, 12)
+        y = height - 50
+
+    y -= 20
+    template.draw_form(c, FORM_SIGNATURE, y)
+    c.drawRightString(width - MARGIN, y - 20, snapshot.engineer)
+    return not has_negative_result
+
+
+def draw_results_table(c, template, result):
+    # Сетка, шапка и номера каналов — в форме, здесь только отметки
+    template.draw_form(c, FORM_TABLE)
+    c.setFont(FONT, TABLE_FONT_SIZE)
+    for i in range(CHANNELS):
+        y = template.cell_y[i]
+        for j in range(CHECKS):
+            value = result.check(i, j)
+            if value == 0:
+                c.drawCentredString(template.col_centers[j + 1], y, "-")
+            elif value == 1:
+                c.drawCentredString(template.col_centers[j + 1], y, "+")
+
+
+def write_lot_protocol(filename, lot_name, summary, snapshots):
+    # Протокол партии в одном PDF: сводная таблица, затем протоколы изделий
+    # по странице на изделие. summary и snapshots — два прохода по одной
+    # выборке (генераторы ReportSnapshot), которые должны читать один снимок
+    # данных (ReportCatalogue.snapshot). Итоги считаются в проходе summary.
+    # Изделия рисуются по одному, формы шаблона общие для всех страниц,
+    # поэтому на изделие в памяти до save() остается только поток его
+    # страницы (~12 КБ). Возвращает (изделий, годных).
+    from reportlab.pdfgen import canvas
+
+    class LotCanvas(canvas.Canvas):
+        # Колонтитул изделия выводится при закрытии каждой страницы, в том
+        # числе страниц, на которые перенесено продолжение его протокола
+        footer = None
+
+        def showPage(self):
+            if self.footer:
+                self.saveState()
+                self.setFont(FONT, 9)
+                self.drawRightString(template.width - MARGIN, 25, self.footer)
+                self.restoreState()
+            super().showPage()
+
+    template = protocol_template()
+    c = LotCanvas(filename, pagesize=template.pagesize, pageCompression=1)
+    template.define_forms(c)
+    define_lot_forms(c, template)
+
+    units, _ = draw_lot_summary(c, template, lot_name, summary)
+    if not units:
+        raise ValueError("В выборке нет изделий с результатами испытаний")
+    count = passed = 0
+    for count, snapshot in enumerate(snapshots, 1):
+        c.showPage()
+        c.footer = f"Партия {lot_name} — изделие {count} из {units}"
+        passed += draw_protocol(c, template, snapshot)
+    c.save()
+    return count, passed
+
+
+def define_lot_forms(c, template):
+    c.beginForm(FORM_LOT_HEADER)
+    c.setFont(FONT_BOLD, TABLE_FONT_SIZE)
+    x = MARGIN
+    for title, width in LOT_COLUMNS:
+        c.drawCentredString(x + width / 2, 5, title)
+        x += width
+    c.setLineWidth(0.5)
+    c.line(MARGIN, 0, x, 0)
+    c.line(MARGIN, LOT_ROW, x, LOT_ROW)
+    c.endForm()
+
+
+def draw_lot_summary(c, template, lot_name, summary):
+    # Итоги стоят над таблицей, а известны только после нее: на странице
+    # выводится форма FORM_LOT_TOTALS, которая определяется в конце прохода
+    # (PDF допускает ссылку на форму, определенную позже). Возвращает
+    # (изделий, годных).
+    width, height = template.width, template.height
+    c.setFont(FONT_BOLD, 12)
+    c.drawCentredString(width / 2, height - 50, "СВОДНЫЙ ПРОТОКОЛ ИСПЫТАНИЙ ПАРТИИ")
+    c.setFont(FONT, 12)
+    c.drawCentredString(width / 2, height - 70, "систем контроля литий-ионных аккумуляторных батарей")
+    y = height - 100
+    c.drawString(MARGIN, y, f"Партия: {lot_name}")
+    y -= LINE
+    template.draw_form(c, FORM_LOT_TOTALS, y)
+    y -= LINE
+
+    y -= 10
+    y = draw_lot_header(c, template, y)
+    units = passed = 0
+    for units, snapshot in enumerate(summary, 1):
+        if y < MIN_Y_MARGIN:
+            c.showPage()
+            y = draw_lot_header(c, template, height - 50)
+        result = snapshot.result
+        failed = result.failed_channels()
+        short_circuit = "да" if result.short_circuit == SC_TRIPPED else "нет"
+        passed += result.passed
+        cells = [
+            str(units), snapshot.serial_number, snapshot.timestamp,
+            ", ".join(str(i + 1) for i in failed) or "—", short_circuit,
+            "годен" if result.passed else "не годен",
+        ]
+        x = MARGIN
+        for text, (_, column_width) in zip(cells, LOT_COLUMNS):
+            c.drawCentredString(x + column_width / 2, y + 4, text)
+            x += column_width
+        y -= LOT_ROW
+
+    c.beginForm(FORM_LOT_TOTALS)
+    c.setFont(FONT, 12)
+    c.drawString(
+        MARGIN, 0, f"Изделий: {units}, годных: {passed}, не годных: {units - passed}"
+        + (f" ({passed / units * 100:.1f} % годных)" if units else "")
+    )
+    c.endForm()
+    return units, passed
+
+
+def draw_lot_header(c, template, y):
+    # Шапка таблицы с новой строки; возвращает базу первой строки таблицы
+    template.draw_form(c, FORM_LOT_HEADER, y - LOT_ROW)
+    c.setFont(FONT, TABLE_FONT_SIZE)
+    return y - 2 * LOT_ROW
+
+
+def calculate_file_hash(filepath):
+    sha256 = hashlib.sha256()
+    with open(filepath, "rb") as f:
+        while chunk := f.read(8192):
+            sha256.update(chunk)
+    return sha256.hexdigest()
@@ -0,0 +1,119 @@
+import time
+import itertools
+from concurrent.futures import ThreadPoolExecutor
+
+from PySide6.QtCore import Qt, Signal, QAbstractListModel, QModelIndex
+from PySide6.QtGui import QColor
+
+from metrics import observe
+
+PAGE_SIZE = 200
+
+
+class ReportListModel(QAbstractListModel):
+    # Список отчетов из индекса. Новый фильтр и следующие страницы при
+    # прокрутке (canFetchMore/fetchMore) читаются в отдельном потоке;
+    # устаревшие ответы отбрасываются по номеру запроса. Фильтр и порядок
+    # меняются, только когда пришли строки по ним.
+    _loaded = Signal(int, int, list, object, str)
+    _fetched = Signal(int, list)
+
+    def __init__(self, catalogue, parent=None):
+        super().__init__(parent)
+        self.catalogue = catalogue
+        self.filters = {}
+        self.order = "date"
+        self.total = 0
+        self._rows = []
+        self._generation = itertools.count(1)
+        self._current = 0
+        self._shown = 0
+        self._fetching = False
+        self._requested_at = None
+        self._executor = ThreadPoolExecutor(max_workers=1)
+        self._loaded.connect(self._on_loaded)
+        self._fetched.connect(self._on_fetched)
+
+    def rowCount(self, parent=QModelIndex()):
+        return 0 if parent.isValid() else len(self._rows)
+
+    def data(self, index, role=Qt.ItemDataRole.DisplayRole):
+        if not index.isValid():
+            return None
+        entry = self._rows[index.row()]
+        if role == Qt.ItemDataRole.DisplayRole:
+            return entry.filename
+        if role == Qt.ItemDataRole.ToolTipRole:
+            verdict = {None: "нет данных", 1: "годен", 0: "не годен"}[entry.verdict]
+            text = f"{entry.system_name} зав. № {entry.serial_number}\n{entry.timestamp}\nРезультат: {verdict}"
+            if entry.archive_segment:
+                text += f"\nВ архиве: {entry.archive_segment}"
+            return text
+        if role == Qt.ItemDataRole.ForegroundRole and entry.verdict == 0:
+            return QColor(Qt.red)
+        if role == Qt.ItemDataRole.UserRole:
+            return entry
+        return None
+
+    def canFetchMore(self, parent=QModelIndex()):
+        return not parent.isValid() and len(self._rows) < self.total
+
+    def fetchMore(self, parent=QModelIndex()):
+        # Страница запрашивается одна за раз и только для показанного фильтра
+        if self._fetching or self._shown != self._current or not self._rows:
+            return
+        self._fetching = True
+        self._executor.submit(self._fetch, self._current, dict(self.filters), self.order, self._rows[-1])
+
+    def _fetch(self, generation, filters, order, after):
+        rows = self.catalogue.query(order=order, limit=PAGE_SIZE, after=after, **filters)
+        self._fetched.emit(generation, rows)
+
+    def _on_fetched(self, generation, rows):
+        if generation != self._current:
+            return
+        self._fetching = False
+        if not rows:
+            self.total = len(self._rows)
+            return
+        start = len(self._rows)
+        self.beginInsertRows(QModelIndex(), start, start + len(rows) - 1)
+        self._rows.extend(rows)
+        self.endInsertRows()
+
+    def set_filter(self, serial_prefix="", date_from=None, date_to=None, verdict=None, order=None):
+        filters = {
+            "serial_prefix": serial_prefix,
+            "date_from": date_from,
+            "date_to": date_to,
+            "verdict": verdict,
+        }
+        self.refresh(filters, order)
+
+    def refresh(self, filters=None, order=None):
+        generation = next(self._generation)
+        self._current = generation
+        self._fetching = False
+        self._requested_at = time.perf_counter()
+        filters = dict(self.filters if filters is None else filters)
+        self._executor.submit(self._load, generation, filters, order or self.order)
+
+    def _load(self, generation, filters, order):
+        total = self.catalogue.count(**filters)
+        rows = self.catalogue.query(order=order, limit=PAGE_SIZE, **filters)
+        self._loaded.emit(generation, total, rows, filters, order)
+
+    def _on_loaded(self, generation, total, rows, filters, order):
+        if generation != self._current:
+            return
+        self.beginResetModel()
+        self.filters = filters
+        self.order = order
+        self.total = total
+        self._rows = rows
+        self._shown = generation
+        self.endResetModel()
+        observe("report_list", time.perf_counter() - self._requested_at)
+
+    def shutdown(self):
+        self._executor.shutdown(wait=False)
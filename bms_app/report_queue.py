@@ -0,0 +1,131 @@
+import time
+import itertools
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+
+from PySide6.QtCore import Signal, QObject
+
+from report import write_report, calculate_file_hash
+from metrics import REPORTS, REPORT_RETRIES, observe
+
+MAX_ATTEMPTS = 3
+
+
+def render_job(snapshot):
+    # Выполняется в рабочем процессе: протокол, его хеш и длительности этапов
+    started = time.perf_counter()
+    passed = write_report(snapshot)
+    rendered = time.perf_counter()
+    file_hash = calculate_file_hash(snapshot.filename)
+    timings = {"render": rendered - started, "hash": time.perf_counter() - rendered}
+    return snapshot.filename, file_hash, passed, timings
+
+
+class ReportJob:
+    def __init__(self, job_id, snapshot):
+        self.job_id = job_id
+        self.snapshot = snapshot
+        self.status = "в очереди"
+        self.attempts = 0
+        self.file_hash = None
+        self.passed = None
+        self.error = None
+        self.submitted_at = time.perf_counter()
+
+    def title(self):
+        text = f"#{self.job_id} {self.snapshot.system_name} зав. № {self.snapshot.serial_number}: {self.status}"
+        if self.error:
+            text += f" ({self.error})"
+        return text
+
+
+class ReportQueue(QObject):
+    # Формирование протоколов в пуле процессов. Окно передает только
+    # неизменяемый ReportSnapshot, результат возвращается сигналом.
+    job_changed = Signal(object)
+    job_finished = Signal(object)
+    job_failed = Signal(object)
+    _job_done = Signal(object, object, object, object)
+
+    def __init__(self, max_workers=None):
+        super().__init__()
+        self.jobs = {}
+        self._ids = itertools.count(1)
+        self._pool = None
+        self._max_workers = max_workers
+        self._job_done.connect(self._on_job_done)
+
+    def submit(self, snapshot):
+        job = ReportJob(next(self._ids), snapshot)
+        self.jobs[job.job_id] = job
+        self._run(job)
+        return job
+
+    def retry(self, job):
+        if job.status == "ошибка":
+            job.attempts = 0
+            job.error = None
+            job.submitted_at = time.perf_counter()
+            self._run(job)
+
+    def pending(self):
+        return [job for job in self.jobs.values() if job.status not in ("готов", "ошибка")]
+
+    def shutdown(self):
+        if self._pool is not None:
+            self._pool.shutdown(wait=True)
+            self._pool = None
+
+    def _run(self, job):
+        if self._pool is None:
+            self._pool = ProcessPoolExecutor(self._max_workers)
+        job.attempts += 1
+        job.status = "формируется" if job.attempts == 1 else f"повтор {job.attempts - 1}"
+        self.job_changed.emit(job)
+        pool = self._pool
+        try:
+            future = pool.submit(render_job, job.snapshot)
+        except BrokenProcessPool:
+            # Рабочий процесс упал — пул пересоздается
+            self._drop_pool(pool)
+            pool = self._pool = ProcessPoolExecutor(self._max_workers)
+            future = pool.submit(render_job, job.snapshot)
+        future.add_done_callback(lambda f: self._on_future_done(job, pool, f))
+
+    def _drop_pool(self, pool):
+        # Упавший пул закрывается, иначе остаются его служебный поток и
+        # процессы; пул, уже созданный взамен, не трогается
+        pool.shutdown(wait=False, cancel_futures=True)
+        if self._pool is pool:
+            self._pool = None
+
+    def _on_future_done(self, job, pool, future):
+        # Вызывается в служебном потоке пула, в GUI передается через сигнал
+        error = future.exception()
+        result = None if error else future.result()
+        self._job_done.emit(job, pool, result, error)
+
+    def _on_job_done(self, job, pool, result, error):
+        if error is None:
+            job.status = "готов"
+            job.error = None
+            _, job.file_hash, job.passed, timings = result
+            for stage, seconds in timings.items():
+                observe(stage, seconds)
+            observe("report", time.perf_counter() - job.submitted_at)
+            REPORTS.inc(status="done")
+            self.job_changed.emit(job)
+            self.job_finished.emit(job)
+            return
+
+        job.error = str(error) or type(error).__name__
+        if isinstance(error, BrokenProcessPool):
+            self._drop_pool(pool)
+        if job.attempts < MAX_ATTEMPTS:
+            REPORT_RETRIES.inc()
+            self._run(job)
+        else:
+            job.status = "ошибка"
+            REPORTS.inc(status="failed")
+            self.job_changed.emit(job)
+            self.job_failed.emit(job)
@@ -0,0 +1,58 @@
+import math
+
+from PySide6.QtCore import Qt, QAbstractTableModel, QModelIndex
+from PySide6.QtGui import QColor, QFont
+
+from results import TestResult, CHANNELS, CHECKS
+
+CHECK_TITLES = [
+    "Работа\nпри напряжении\nниже 4,2 В",
+    "Отключение\nпри напряжении\nвыше 4,3 В",
+    "Работа\nпри напряжении\nвыше 2,9 В",
+    "Отключение\nпри напряжении\nниже 2,8 В"
+]
+
+
+class ResultTableModel(QAbstractTableModel):
+    # Таблица 8×4 поверх TestResult: ячейки не хранятся, при смене
+    # результата отправляется один dataChanged на всю таблицу.
+    def __init__(self, parent=None):
+        super().__init__(parent)
+        self.result = TestResult()
+        self._font = QFont()
+        self._font.setPointSize(16)
+        self._red = QColor(Qt.red)
+
+    def set_result(self, result):
+        self.result = result if result is not None else TestResult()
+        self.dataChanged.emit(self.index(0, 0), self.index(CHANNELS - 1, CHECKS - 1))
+
+    def rowCount(self, parent=QModelIndex()):
+        return 0 if parent.isValid() else CHANNELS
+
+    def columnCount(self, parent=QModelIndex()):
+        return 0 if parent.isValid() else CHECKS
+
+    def data(self, index, role=Qt.ItemDataRole.DisplayRole):
+        if not index.isValid():
+            return None
+        value = self.result.check(index.row(), index.column())
+        if role == Qt.ItemDataRole.DisplayRole:
+            return {1: "+", 0: "-"}.get(value, "")
+        if role == Qt.ItemDataRole.FontRole:
+            return self._font
+        if role == Qt.ItemDataRole.ForegroundRole and value == 0:
+            return self._red
+        if role == Qt.ItemDataRole.TextAlignmentRole:
+            return Qt.AlignCenter
+        if role == Qt.ItemDataRole.ToolTipRole:
+            voltage = self.result.measurement(index.row(), index.column())
+            return None if math.isnan(voltage) else f"{voltage:.3f} В"
+        return None
+
+    def headerData(self, section, orientation, role=Qt.ItemDataRole.DisplayRole):
+        if role != Qt.ItemDataRole.DisplayRole:
+            return None
+        if orientation == Qt.Horizontal:
+            return CHECK_TITLES[section]
+        return f"Канал {section + 1}"
@@ -0,0 +1,77 @@
+import math
+import struct
+from array import array
+
+CHANNELS = 8
+CHECKS = 4
+
+SC_TRIPPED = 0
+SC_NOT_TRIPPED = 1
+SC_NOT_REACHED = 2
+
+NO_DATA = -1
+
+# Упакованный результат: номер испытания, время, длительность, код КЗ,
+# затем 32 байта проверок и 32 значения float32 измеренных напряжений
+HEADER = struct.Struct("<I8sfb")
+
+
+class TestResult:
+    # Результаты одного испытания в плоских массивах: проверка j канала i
+    # хранится в ячейке i * CHECKS + j (1 — пройдена, 0 — нет, -1 — нет данных).
+    # Этот объект — единственный источник данных для таблицы, протокола и индекса.
+    __slots__ = ("test_id", "timestamp", "duration", "short_circuit", "checks", "measurements")
+
+    def __init__(self, test_id=0, timestamp="", duration=0.0, short_circuit=None, checks=None, measurements=None):
+        self.test_id = test_id
+        self.timestamp = timestamp
+        self.duration = duration
+        self.short_circuit = short_circuit
+        self.checks = checks if checks is not None else array("b", [NO_DATA]) * (CHANNELS * CHECKS)
+        self.measurements = measurements if measurements is not None else array("f", [math.nan]) * (CHANNELS * CHECKS)
+
+    def __reduce__(self):
+        return TestResult.from_bytes, (self.to_bytes(),)
+
+    @property
+    def empty(self):
+        return self.short_circuit is None and max(self.checks) == NO_DATA
+
+    @property
+    def passed(self):
+        # Единственный вердикт испытания — для протокола, индекса и статистики:
+        # годен, если защита от КЗ сработала и все проверки пройдены (ячейка
+        # без данных проверку не проходит)
+        if self.short_circuit != SC_TRIPPED:
+            return False
+        return min(self.checks) == 1
+
+    def check(self, channel, check):
+        return self.checks[channel * CHECKS + check]
+
+    def measurement(self, channel, check):
+        return self.measurements[channel * CHECKS + check]
+
+    def channel(self, channel):
+        start = channel * CHECKS
+        return self.checks[start:start + CHECKS]
+
+    def failed_channels(self):
+        return [i for i in range(CHANNELS) if 0 in self.channel(i)]
+
+    def to_bytes(self):
+        short_circuit = NO_DATA if self.short_circuit is None else self.short_circuit
+        header = HEADER.pack(self.test_id, self.timestamp.encode("ascii")[:8], self.duration, short_circuit)
+        return header + self.checks.tobytes() + self.measurements.tobytes()
+
+    @classmethod
+    def from_bytes(cls, data):
+        test_id, timestamp, duration, short_circuit = HEADER.unpack_from(data)
+        checks = array("b")
+        checks.frombytes(data[HEADER.size:HEADER.size + CHANNELS * CHECKS])
+        measurements = array("f")
+        measurements.frombytes(data[HEADER.size + CHANNELS * CHECKS:])
+        return cls(
+            test_id, timestamp.rstrip(b"\0").decode("ascii"), round(duration, 3),
+            None if short_circuit == NO_DATA else short_circuit, checks, measurements
+        )
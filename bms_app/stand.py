@@ -0,0 +1,224 @@
+import time
+
+from PySide6.QtCore import Signal, QObject, QTimer
+
+from transport import SerialTransport
+from telemetry import TelemetryBuffer
+from rawstore import RawRecorder, EVENT_TELEMETRY, EVENT_RESET, EVENT_ANALYSIS
+from protocol import ALL_CHANNELS
+from analysis import analyze, to_result, DEFAULT_LIMITS
+from testplan import PlanRun, Task, STEP_KINDS
+from audit import log_event
+from metrics import span, observe, count_test
+
+# Запас времени на ответ стенда сверх выдержки шага, с
+STEP_TIMEOUT = 5.0
+
+
+class StandSession(QObject):
+    # Состояние одного испытательного стенда: свой транспорт со своим
+    # потоком чтения, последние полученные результаты и статус.
+    changed = Signal(object)
+
+    def __init__(self, name, port):
+        super().__init__()
+        self.name = name
+        self.port = port
+        self.device_connected = False
+        self.results_received = False
+        # result — принятый вердикт, device_result — вердикт самого стенда;
+        # они различаются, если вердикт вычислен по телеметрии
+        self.result = None
+        self.device_result = None
+        self.status = "Ожидание подключения устройства..."
+        self.plan = None
+        self.plan_run = None
+
+        self.telemetry = TelemetryBuffer()
+        self.recorder = RawRecorder(name)
+        self.transport = SerialTransport(port)
+        self.transport.telemetry = self.telemetry
+        self.transport.recorder = self.recorder
+        self.transport.ping_response.connect(self.on_device_connected)
+        self.transport.test_received.connect(self.on_test_received)
+        self.transport.step_done.connect(self.on_step_done)
+        # Телеметрия пишется с начала испытания и сколько отсчетов было
+        # потеряно к этому моменту — для проверки полноты записи
+        self.telemetry_from_start = False
+        self.lost_at_start = 0
+        self.watchdog = QTimer(self)
+        self.watchdog.setSingleShot(True)
+        self.watchdog.timeout.connect(self.on_step_timeout)
+
+    def start(self):
+        self.recorder.start_run()
+        self.transport.start()
+
+    def stop(self):
+        self.watchdog.stop()
+        self.transport.stop()
+        self.recorder.finish()
+
+    def title(self):
+        if not self.device_connected:
+            state = "не подключен"
+        elif self.results_received:
+            state = "результаты получены"
+        else:
+            state = "ожидание"
+        return f"{self.name} ({self.port}) — {state}"
+
+    def set_telemetry(self, enabled):
+        # Включенная посреди испытания телеметрия не покрывает его начало
+        self.telemetry_from_start = False
+        self.telemetry.clear()
+        self.recorder.append_event(EVENT_TELEMETRY, (enabled,))
+        self.transport.set_telemetry(enabled)
+
+    def archive_run(self, serial_number, timestamp):
+        # Сохраняет сырые измерения испытания под заводским номером. Сессия
+        # может остаться без сброса — дальнейшие измерения пишутся в новый
+        # сегмент
+        path = self.recorder.finish(serial_number, timestamp)
+        self.recorder.start_run()
+        return path
+
+    def reset(self):
+        self.telemetry.clear()
+        self.recorder.append_event(EVENT_RESET)
+        self.recorder.finish()
+        self.recorder.start_run()
+        self.result = None
+        self.device_result = None
+        self.results_received = False
+        self.telemetry_from_start = self.transport.telemetry_enabled
+        self.lost_at_start = self.transport.lost_samples
+        self.plan_run = None
+        self.watchdog.stop()
+        self.transport.enabled = True
+        self.status = "Ожидание результатов испытаний..." if self.device_connected else "Ожидание подключения устройства..."
+        self.changed.emit(self)
+
+    def on_device_connected(self, success):
+        self.device_connected = success
+        if success:
+            self.status = "Ожидание результатов испытаний..."
+        else:
+            self.status = "Ожидание подключения устройства..."
+        self.changed.emit(self)
+
+    def on_test_received(self, result):
+        if not self.device_connected or self.results_received:
+            return
+        run = self.plan_run
+        if run is not None and run.failed is not None:
+            # Прерванная программа не покрывает свои шаги до сброса или
+            # запуска новой программы
+            log_event(f"{self.name}: результат №{result.test_id} получен после прерывания программы, отброшен", "WARNING")
+            return
+        if run is not None and not run.done:
+            # Результат до окончания программы не покрывает ее шаги: испытание
+            # с невыполненными шагами не должно попасть в протокол
+            log_event(f"{self.name}: результат №{result.test_id} получен до окончания программы, отброшен", "WARNING")
+            return
+        if self.transport.received_at is not None:
+            observe("delivery", time.perf_counter() - self.transport.received_at)
+        self.device_result = result
+        self.recorder.append_result(result)
+        with span("analysis"):
+            measured = self.analyze_telemetry(result)
+        source = "стенда"
+        if measured is not None:
+            self.recorder.append_result(measured, EVENT_ANALYSIS)
+            if measured.passed != result.passed:
+                log_event(
+                    f"{self.name}: вердикт по телеметрии ({'годен' if measured.passed else 'не годен'}) "
+                    f"расходится с вердиктом стенда ({'годен' if result.passed else 'не годен'})", "WARNING"
+                )
+            result = measured
+            source = "по телеметрии"
+        count_test(self.name, result.passed)
+        self.result = result
+        self.results_received = True
+        self.transport.enabled = False
+        self.status = f"Результаты получены ({result.timestamp}, {result.duration} с, вердикт {source})"
+        self.changed.emit(self)
+
+    def telemetry_complete(self):
+        # Запись покрывает все испытание: телеметрия включена с его начала,
+        # кольцевой буфер не переписывался и ни один отсчет не потерян
+        return (
+            self.telemetry_from_start
+            and 0 < self.telemetry.total <= self.telemetry.capacity
+            and self.transport.lost_samples == self.lost_at_start
+        )
+
+    def analyze_telemetry(self, device_result):
+        # Вердикт по измеренным кривым или None, если запись неполная или
+        # в ней нет отключений всех каналов и импульса КЗ — тогда остается
+        # вердикт стенда
+        if not self.telemetry_complete():
+            return None
+        limits = self.plan.limits if self.plan is not None else DEFAULT_LIMITS
+        analysis = analyze(self.telemetry.latest(), rate=self.transport.sample_rate, limits=limits)
+        if not analysis.complete:
+            return None
+        return to_result(analysis, device_result.test_id, device_result.timestamp, device_result.duration)
+
+    def run_plan(self, plan):
+        # Новое испытание по программе: шаги отправляются стенду по мере
+        # освобождения каналов и оборудования (testplan.PlanRun)
+        self.reset()
+        self.plan = plan
+        self.plan_run = PlanRun(plan)
+        self._dispatch()
+
+    @property
+    def plan_progress(self):
+        # Доля выполненных заданий программы, None — программа не запускалась
+        run = self.plan_run
+        if run is None:
+            return None
+        total = sum(1 if step.pack else run.channels for step in run.plan.steps)
+        finished = sum(1 for _, end in run.timings.values() if end is not None)
+        return finished / total if total else 1.0
+
+    def _dispatch(self):
+        run = self.plan_run
+        now = time.monotonic()
+        for task in run.ready():
+            step = run.plan.steps[task.step]
+            run.start(task, now)
+            self.transport.send_step(task.step, STEP_KINDS[step.kind], task.channel, step.setpoint, step.dwell)
+        running = run.running()
+        if running:
+            dwell = max(run.plan.steps[task.step].dwell for task in running)
+            self.watchdog.start(int((dwell + STEP_TIMEOUT) * 1000))
+            self.status = f"Программа испытаний: выполнено {self.plan_progress:.0%}"
+        self.changed.emit(self)
+
+    def on_step_done(self, step, channel, elapsed):
+        run = self.plan_run
+        task = Task(step, None if channel == ALL_CHANNELS else channel)
+        if run is None or run.failed is not None or task not in run.timings or run.timings[task][1] is not None:
+            return
+        run.finish(task, time.monotonic())
+        if not run.done:
+            self._dispatch()
+            return
+        self.watchdog.stop()
+        self.status = f"Программа выполнена за {run.cycle_time:.2f} с, ожидание результатов..."
+        for name, start, end, busy in run.step_times():
+            log_event(f"{self.name}: шаг «{name}» {start:.2f}–{end:.2f} с, занятость {busy:.2f} с")
+        log_event(f"{self.name}: программа «{run.plan.name}» выполнена за {run.cycle_time:.2f} с")
+        self.changed.emit(self)
+
+    def on_step_timeout(self):
+        run = self.plan_run
+        if run is None or run.done or run.failed is not None:
+            return
+        names = ", ".join(sorted({run.plan.steps[task.step].name for task in run.running()}))
+        log_event(f"{self.name}: нет ответа стенда на шаги программы ({names})", "ERROR")
+        run.failed = f"нет ответа стенда ({names})"
+        self.status = f"Программа прервана: {run.failed}"
+        self.changed.emit(self)
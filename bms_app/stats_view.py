@@ -0,0 +1,155 @@
+from datetime import datetime, timedelta
+
+from PySide6.QtCore import Qt
+from PySide6.QtWidgets import (
+    QWidget, QVBoxLayout, QHBoxLayout, QLabel, QComboBox, QPushButton,
+    QTableWidget, QTableWidgetItem, QHeaderView
+)
+
+from results import CHANNELS, SC_TRIPPED, SC_NOT_TRIPPED, SC_NOT_REACHED
+from result_model import CHECK_TITLES
+from metrics import span
+
+PERIODS = [
+    ("Последний час", timedelta(hours=1)),
+    ("Последние сутки", timedelta(days=1)),
+    ("Последние 7 дней", timedelta(days=7)),
+    ("Последние 30 дней", timedelta(days=30)),
+    ("Последний год", timedelta(days=365)),
+    ("Все время", None),
+]
+
+GROUPS = [
+    ("По дням", "day"),
+    ("По системам", "system"),
+    ("По операторам", "operator"),
+]
+
+# Строки сводной таблицы: (разрез, элемент, подпись)
+SUMMARY_ROWS = [
+    ("unit", 0, "Изделия"),
+    *(("channel", i, f"Канал {i + 1}") for i in range(CHANNELS)),
+    *(("check", i, title.replace("\n", " ")) for i, title in enumerate(CHECK_TITLES)),
+    ("short_circuit", SC_TRIPPED, "КЗ: отключение"),
+    ("short_circuit", SC_NOT_TRIPPED, "КЗ: нет отключения"),
+    ("short_circuit", SC_NOT_REACHED, "КЗ: ток не достигнут"),
+]
+
+COLUMNS = ["Проверено", "Годных", "Не годных", "Доля годных, %"]
+
+
+def rate_cells(total, passed):
+    rate = f"{passed / total * 100:.1f}" if total else "—"
+    return [str(total), str(passed), str(total - passed), rate]
+
+
+class StatisticsView(QWidget):
+    # Статистика испытаний из накопленных агрегатов индекса (catalogue.stats):
+    # сводка по изделиям, каналам, проверкам и КЗ и разбивка годных по
+    # дням, системам или операторам за выбранный период
+    def __init__(self, catalogue, parent=None):
+        super().__init__(parent)
+        self.catalogue = catalogue
+        layout = QVBoxLayout(self)
+
+        filters = QHBoxLayout()
+        self.period_selector = QComboBox()
+        for title, period in PERIODS:
+            self.period_selector.addItem(title, period)
+        self.period_selector.setCurrentIndex(2)
+        filters.addWidget(self.period_selector)
+        self.system_selector = QComboBox()
+        filters.addWidget(self.system_selector)
+        self.operator_selector = QComboBox()
+        filters.addWidget(self.operator_selector)
+        self.refresh_button = QPushButton("Обновить")
+        filters.addWidget(self.refresh_button)
+        layout.addLayout(filters)
+
+        self.summary_table = QTableWidget(len(SUMMARY_ROWS), len(COLUMNS))
+        self.summary_table.setHorizontalHeaderLabels(COLUMNS)
+        self.summary_table.setVerticalHeaderLabels([title for _, _, title in SUMMARY_ROWS])
+        self.summary_table.horizontalHeader().setSectionResizeMode(QHeaderView.Stretch)
+        self.summary_table.setEditTriggers(QTableWidget.NoEditTriggers)
+        layout.addWidget(self.summary_table)
+
+        self.group_selector = QComboBox()
+        for title, group in GROUPS:
+            self.group_selector.addItem(title, group)
+        layout.addWidget(self.group_selector)
+
+        self.group_table = QTableWidget(0, len(COLUMNS))
+        self.group_table.setHorizontalHeaderLabels(COLUMNS)
+        self.group_table.horizontalHeader().setSectionResizeMode(QHeaderView.Stretch)
+        self.group_table.setEditTriggers(QTableWidget.NoEditTriggers)
+        layout.addWidget(self.group_table)
+
+        self.total_label = QLabel()
+        layout.addWidget(self.total_label)
+
+        self.update_filter_values()
+        for selector in (self.period_selector, self.system_selector, self.operator_selector, self.group_selector):
+            selector.currentIndexChanged.connect(self.refresh)
+        self.refresh_button.clicked.connect(self.refresh)
+        self.refresh()
+
+    def update_filter_values(self):
+        # Списки систем и операторов берутся из статистики; выбор сохраняется
+        for selector, column in ((self.system_selector, "system_name"), (self.operator_selector, "operator")):
+            current = selector.currentData()
+            selector.blockSignals(True)
+            selector.clear()
+            selector.addItem("Все системы" if column == "system_name" else "Все операторы", None)
+            for value in self.catalogue.stat_values(column):
+                selector.addItem(value or "—", value)
+            index = selector.findData(current)
+            selector.setCurrentIndex(max(index, 0))
+            selector.blockSignals(False)
+
+    def filters(self):
+        period = self.period_selector.currentData()
+        return {
+            "since": datetime.now() - period if period is not None else None,
+            "system_name": self.system_selector.currentData(),
+            "operator": self.operator_selector.currentData(),
+        }
+
+    def refresh(self):
+        with span("stats"):
+            filters = self.filters()
+            stats = self.catalogue.stats(**filters)
+            for row, (metric, item, _) in enumerate(SUMMARY_ROWS):
+                total, passed = stats.get((metric, item), (0, 0))
+                if metric == "short_circuit":
+                    # Исход КЗ — доля от всех проверок КЗ, а не «годных» внутри исхода
+                    checked = sum(t for (m, _), (t, _) in stats.items() if m == "short_circuit")
+                    cells = [str(total), "", "", f"{total / checked * 100:.1f}" if checked else "—"]
+                else:
+                    cells = rate_cells(total, passed)
+                for column, value in enumerate(cells):
+                    self.summary_table.setItem(row, column, self.cell(value, metric == "unit"))
+
+            groups = self.catalogue.stats_by(self.group_selector.currentData(), **filters)
+            self.group_table.setRowCount(len(groups))
+            self.group_table.setVerticalHeaderLabels([key or "—" for key, _, _ in groups])
+            for row, (_, total, passed) in enumerate(groups):
+                for column, value in enumerate(rate_cells(total, passed)):
+                    self.group_table.setItem(row, column, self.cell(value))
+
+            total, passed = stats.get(("unit", 0), (0, 0))
+            self.total_label.setText(f"Изделий за период: {total}, годных: {passed}")
+
+    @staticmethod
+    def cell(value, bold=False):
+        item = QTableWidgetItem(value)
+        item.setTextAlignment(Qt.AlignCenter)
+        if bold:
+            font = item.font()
+            font.setBold(True)
+            item.setFont(font)
+        return item
+
+    def on_test_indexed(self):
+        # Новый протокол внесен в индекс: могли появиться новые система или оператор
+        self.update_filter_values()
+        self.refresh()
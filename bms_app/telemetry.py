@@ -0,0 +1,65 @@
+import threading
+
+import numpy as np
+
+from results import CHANNELS
+
+# Отсчет телеметрии: напряжения 8 аккумуляторов и ток разряда
+FIELDS = CHANNELS + 1
+CURRENT = CHANNELS
+SAMPLE_DTYPE = np.dtype("<f4")
+# Частота отсчетов стенда, Гц
+SAMPLE_RATE = 1000
+
+
+class TelemetryBuffer:
+    # Кольцевой буфер фиксированного размера. Пишет поток чтения порта,
+    # читает интерфейс со своей частотой кадров; данные не проходят через
+    # очередь сигналов Qt, поэтому поток отсчетов не может «забить» GUI.
+    def __init__(self, capacity=20000):
+        self.capacity = capacity
+        self.data = np.zeros((capacity, FIELDS), dtype=SAMPLE_DTYPE)
+        self.total = 0
+        self._lock = threading.Lock()
+
+    def clear(self):
+        with self._lock:
+            self.total = 0
+
+    def append(self, samples):
+        samples = np.asarray(samples, dtype=SAMPLE_DTYPE).reshape(-1, FIELDS)
+        # total считает и отсчеты, не поместившиеся в буфер: по нему видно,
+        # что начало записи переписано
+        count = len(samples)
+        if count > self.capacity:
+            samples = samples[-self.capacity:]
+        with self._lock:
+            start = (self.total + count - len(samples)) % self.capacity
+            first = min(len(samples), self.capacity - start)
+            self.data[start:start + first] = samples[:first]
+            self.data[:len(samples) - first] = samples[first:]
+            self.total += count
+
+    def latest(self, count=None):
+        with self._lock:
+            size = min(self.total, self.capacity)
+            if count is not None:
+                size = min(size, count)
+            end = self.total % self.capacity
+            if end >= size:
+                return self.data[end - size:end].copy()
+            return np.concatenate((self.data[self.capacity - (size - end):], self.data[:end]))
+
+
+def decimate_minmax(values, buckets):
+    # Прореживание для отрисовки: на каждый столбец пикселей — минимум
+    # и максимум отсчетов, поэтому короткие выбросы не теряются.
+    n = len(values)
+    per_bucket = n // buckets if buckets > 0 else 0
+    if per_bucket < 2:
+        return values
+    trimmed = values[n - per_bucket * buckets:].reshape(buckets, per_bucket)
+    out = np.empty((buckets, 2), dtype=values.dtype)
+    out[:, 0] = trimmed.min(axis=1)
+    out[:, 1] = trimmed.max(axis=1)
+    return out.ravel()
@@ -0,0 +1,86 @@
+from PySide6.QtCore import Qt, QTimer, QPointF
+from PySide6.QtGui import QPainter, QPen, QColor, QPolygonF
+from PySide6.QtWidgets import QWidget
+
+import numpy as np
+
+from results import CHANNELS
+from telemetry import CURRENT, decimate_minmax
+from analysis import CHARGE_CUTOFF, CHARGE_WORK, DISCHARGE_WORK, DISCHARGE_CUTOFF, SHORT_CIRCUIT_CURRENT
+
+VOLTAGE_RANGE = (2.5, 4.5)
+CURRENT_RANGE = (0.0, 70.0)
+VOLTAGE_LIMITS = (CHARGE_CUTOFF, CHARGE_WORK, DISCHARGE_WORK, DISCHARGE_CUTOFF)
+CURRENT_LIMIT = SHORT_CIRCUIT_CURRENT
+
+CHANNEL_COLORS = [
+    QColor("#1f77b4"), QColor("#ff7f0e"), QColor("#2ca02c"), QColor("#d62728"),
+    QColor("#9467bd"), QColor("#8c564b"), QColor("#e377c2"), QColor("#17becf"),
+]
+
+
+class TelemetryPlot(QWidget):
+    # Перерисовка по таймеру с ограниченной частотой кадров и только при
+    # наличии новых отсчетов; на каждый пиксель ширины — не более двух точек.
+    def __init__(self, parent=None, fps=25):
+        super().__init__(parent)
+        self.buffer = None
+        self._drawn_total = -1
+        self.setMinimumHeight(180)
+        self.timer = QTimer(self)
+        self.timer.setInterval(1000 // fps)
+        self.timer.timeout.connect(self.on_timer)
+
+    def set_buffer(self, buffer):
+        self.buffer = buffer
+        self._drawn_total = -1
+        self.update()
+
+    def showEvent(self, event):
+        self.timer.start()
+        super().showEvent(event)
+
+    def hideEvent(self, event):
+        self.timer.stop()
+        super().hideEvent(event)
+
+    def on_timer(self):
+        if self.buffer is not None and self.buffer.total != self._drawn_total:
+            self.update()
+
+    def paintEvent(self, event):
+        painter = QPainter(self)
+        painter.fillRect(self.rect(), Qt.white)
+        if self.buffer is None:
+            return
+        self._drawn_total = self.buffer.total
+        data = self.buffer.latest()
+        if len(data) < 2:
+            return
+
+        width = self.width()
+        voltage_height = self.height() * 2 // 3
+        current_top = voltage_height + 4
+        current_height = self.height() - current_top
+
+        painter.setPen(QPen(Qt.gray, 1, Qt.DashLine))
+        for limit in VOLTAGE_LIMITS:
+            y = self._scale(np.array([limit]), VOLTAGE_RANGE, 0, voltage_height)[0]
+            painter.drawLine(0, int(y), width, int(y))
+        y = self._scale(np.array([CURRENT_LIMIT]), CURRENT_RANGE, current_top, current_height)[0]
+        painter.drawLine(0, int(y), width, int(y))
+
+        for channel in range(CHANNELS):
+            painter.setPen(QPen(CHANNEL_COLORS[channel], 1))
+            self._draw_trace(painter, data[:, channel], VOLTAGE_RANGE, 0, voltage_height, width)
+        painter.setPen(QPen(Qt.black, 1))
+        self._draw_trace(painter, data[:, CURRENT], CURRENT_RANGE, current_top, current_height, width)
+
+    def _scale(self, values, value_range, top, height):
+        low, high = value_range
+        return top + height - (values - low) * (height / (high - low))
+
+    def _draw_trace(self, painter, values, value_range, top, height, width):
+        ys = self._scale(decimate_minmax(values, width), value_range, top, height)
+        xs = np.linspace(0, width - 1, len(ys))
+        painter.drawPolyline(QPolygonF([QPointF(x, y) for x, y in zip(xs.tolist(), ys.tolist())]))
@@ -0,0 +1,199 @@
+import sys
+import json
+import heapq
+from collections import namedtuple
+
+from results import CHANNELS
+from analysis import Limits, DEFAULT_LIMITS
+
+# Программа испытаний описывается данными (JSON): последовательность шагов
+# для каждого канала и оборудование стенда, которое шаги делят между собой.
+#   kind — вид шага (STEP_KINDS), setpoint — уставка (В или А), dwell —
+#   выдержка, с; pack — шаг выполняется сразу для всей батареи; resource —
+#   источник/нагрузка, число которых ограничено в "resources"; limits —
+#   нормы проверок шага (поля analysis.Limits).
+STEP_KINDS = {"rest": 0, "charge": 1, "discharge": 2, "short_circuit": 3}
+
+Step = namedtuple("Step", "name kind setpoint dwell pack resource limits")
+TestPlan = namedtuple("TestPlan", "name steps resources limits")
+# Задание планировщика: шаг step для канала channel (None — для всей батареи)
+Task = namedtuple("Task", "step channel")
+ScheduledTask = namedtuple("ScheduledTask", "task start end")
+
+DEFAULT_PLAN = {
+    "name": "Функциональная проверка СКУ ЛИАБ",
+    # Стенд заряжает и разряжает по 4 канала одновременно, нагрузка КЗ одна
+    "resources": {"charger": 4, "load": 4, "short_circuit": 1},
+    "steps": [
+        {"name": "Заряд до отключения", "kind": "charge", "setpoint": 4.4, "dwell": 4.0,
+         "resource": "charger", "limits": {"charge_work": 4.2, "charge_cutoff": 4.3}},
+        {"name": "Пауза после заряда", "kind": "rest", "dwell": 0.5},
+        {"name": "Разряд до отключения", "kind": "discharge", "setpoint": 2.7, "dwell": 4.0,
+         "resource": "load", "limits": {"discharge_work": 2.9, "discharge_cutoff": 2.8}},
+        {"name": "Короткое замыкание", "kind": "short_circuit", "setpoint": 60.0, "dwell": 0.1,
+         "pack": True, "resource": "short_circuit",
+         "limits": {"short_circuit_current": 50.0, "max_trip_time": 0.1}},
+    ],
+}
+
+
+def plan_from_dict(data):
+    steps = []
+    limits = {}
+    for item in data["steps"]:
+        if item["kind"] not in STEP_KINDS:
+            raise ValueError(f"Неизвестный вид шага: {item['kind']}")
+        unknown = set(item.get("limits", {})) - set(Limits._fields)
+        if unknown:
+            raise ValueError(f"Неизвестные нормы шага {item['name']}: {', '.join(sorted(unknown))}")
+        steps.append(Step(
+            item["name"], item["kind"], float(item.get("setpoint", 0.0)), float(item["dwell"]),
+            bool(item.get("pack", False)), item.get("resource"), item.get("limits", {}),
+        ))
+        limits.update(item.get("limits", {}))
+    resources = dict(data.get("resources", {}))
+    for step in steps:
+        if step.resource is not None and step.resource not in resources:
+            raise ValueError(f"Шаг {step.name}: оборудование {step.resource} не описано в resources")
+    return TestPlan(data.get("name", ""), steps, resources, DEFAULT_LIMITS._replace(**limits))
+
+
+def load_plan(path=None):
+    if path is None:
+        return plan_from_dict(DEFAULT_PLAN)
+    with open(path, "r", encoding="utf-8") as f:
+        return plan_from_dict(json.load(f))
+
+
+class PlanRun:
+    # Ход выполнения программы. Каждый канал проходит шаги по порядку, а
+    # каналы друг от друга не зависят: пока одни заряжаются, другие уже
+    # разряжаются — в пределах числа источников и нагрузок стенда. Шаг
+    # «на всю батарею» ждет, пока все каналы закончат предыдущий шаг.
+    def __init__(self, plan, channels=CHANNELS):
+        self.plan = plan
+        self.channels = channels
+        self.next_step = [0] * channels
+        self.busy = [False] * channels
+        self.in_use = dict.fromkeys(plan.resources, 0)
+        self.timings = {}
+        self.started_at = None
+        self.finished_at = None
+        # Причина прерывания программы; прерванная программа не возобновляется
+        self.failed = None
+
+    @property
+    def done(self):
+        return all(step == len(self.plan.steps) for step in self.next_step) and not any(self.busy)
+
+    @property
+    def cycle_time(self):
+        if self.started_at is None or self.finished_at is None:
+            return None
+        return self.finished_at - self.started_at
+
+    def ready(self):
+        # Задания, которые можно запустить сейчас; раньше — каналы, ушедшие
+        # дальше по программе, чтобы конвейер не простаивал
+        tasks = []
+        free = {name: limit - self.in_use[name] for name, limit in self.plan.resources.items()}
+        order = sorted(range(self.channels), key=lambda ch: -self.next_step[ch])
+        for channel in order:
+            index = self.next_step[channel]
+            if self.busy[channel] or index == len(self.plan.steps):
+                continue
+            step = self.plan.steps[index]
+            if step.pack:
+                ready = not any(self.busy) and all(s == index for s in self.next_step)
+                if ready and (step.resource is None or free[step.resource] > 0):
+                    return [Task(index, None)]
+                continue
+            if step.resource is not None:
+                if free[step.resource] == 0:
+                    continue
+                free[step.resource] -= 1
+            tasks.append(Task(index, channel))
+        return tasks
+
+    def start(self, task, now):
+        if self.started_at is None:
+            self.started_at = now
+        step = self.plan.steps[task.step]
+        for channel in self._channels(task):
+            self.busy[channel] = True
+        if step.resource is not None:
+            self.in_use[step.resource] += 1
+        self.timings[task] = [now, None]
+
+    def finish(self, task, now):
+        step = self.plan.steps[task.step]
+        for channel in self._channels(task):
+            self.busy[channel] = False
+            self.next_step[channel] = task.step + 1
+        if step.resource is not None:
+            self.in_use[step.resource] -= 1
+        self.timings[task][1] = now
+        if self.done:
+            self.finished_at = now
+
+    def running(self):
+        return [task for task, (_, end) in self.timings.items() if end is None]
+
+    def step_times(self):
+        # По каждому шагу: (имя, начало первого задания, конец последнего,
+        # суммарное время заданий) относительно начала программы
+        rows = []
+        for index, step in enumerate(self.plan.steps):
+            spans = [span for task, span in self.timings.items() if task.step == index and span[1] is not None]
+            if not spans:
+                continue
+            rows.append((
+                step.name,
+                min(start for start, _ in spans) - self.started_at,
+                max(end for _, end in spans) - self.started_at,
+                sum(end - start for start, end in spans),
+            ))
+        return rows
+
+    def _channels(self, task):
+        return range(self.channels) if task.channel is None else (task.channel,)
+
+
+def schedule(plan, channels=CHANNELS):
+    # Расчет расписания по выдержкам шагов тем же планировщиком, что
+    # работает на стенде: [ScheduledTask], время цикла и время цикла
+    # при строго последовательном выполнении
+    run = PlanRun(plan, channels)
+    now = 0.0
+    finishing = []
+    result = []
+    while not run.done:
+        for task in run.ready():
+            run.start(task, now)
+            end = now + plan.steps[task.step].dwell
+            heapq.heappush(finishing, (end, task.step, -1 if task.channel is None else task.channel, task))
+        if not finishing:
+            raise ValueError("Программа не может быть выполнена: не хватает оборудования")
+        now, _, _, task = heapq.heappop(finishing)
+        run.finish(task, now)
+        start = run.timings[task][0]
+        result.append(ScheduledTask(task, start, now))
+    sequential = sum(step.dwell * (1 if step.pack else channels) for step in plan.steps)
+    return result, now, sequential
+
+
+def describe_schedule(plan, channels=CHANNELS):
+    tasks, cycle, sequential = schedule(plan, channels)
+    lines = [f"Программа: {plan.name}"]
+    for item in sorted(tasks, key=lambda item: (item.start, item.task.step)):
+        step = plan.steps[item.task.step]
+        target = "батарея" if item.task.channel is None else f"канал {item.task.channel + 1}"
+        lines.append(f"{item.start:7.2f}–{item.end:7.2f} с  {step.name}, {target}")
+    lines.append(f"Время цикла: {cycle:.2f} с (последовательно: {sequential:.2f} с)")
+    return lines
+
+
+if __name__ == "__main__":
+    # Расчет расписания программы: python testplan.py [plan.json]
+    for line in describe_schedule(load_plan(sys.argv[1] if len(sys.argv) > 1 else None)):
+        print(line)
@@ -0,0 +1,58 @@
+# Повторный анализ сохраненных измерений:
+#   cd bms_app && python -m unittest discover tests
+import os
+import sys
+import shutil
+import tempfile
+import unittest
+
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from analysis import analyze_segments
+from emulator import BmsModel
+from protocol import FrameParser, FRAME_SAMPLES, SAMPLES, SAMPLE_FIELDS
+from rawstore import RawRecorder, RawSegment
+from telemetry import SAMPLE_DTYPE
+
+
+class SegmentRateTest(unittest.TestCase):
+    def setUp(self):
+        self.work = tempfile.mkdtemp(prefix="bms_test_")
+
+    def tearDown(self):
+        shutil.rmtree(self.work, ignore_errors=True)
+
+    def record(self, rate, seconds):
+        # Сегмент с телеметрией модели на частоте rate; результат модели
+        # не выдается, чтобы не сменилась СКУ
+        model = BmsModel(seed=1, profile="healthy", rate=rate, interval=(1000, 1000))
+        model.streaming = True
+        recorder = RawRecorder("Стенд", raw_dir=self.work)
+        recorder.start_run()
+        # Частота становится известна из PONG, когда сегмент уже открыт
+        recorder.set_rate(rate)
+
+        def on_frame(frame_type, payload):
+            if frame_type == FRAME_SAMPLES:
+                seq, count = SAMPLES.unpack_from(payload)
+                recorder.append_samples(seq, np.frombuffer(payload, SAMPLE_DTYPE, count * SAMPLE_FIELDS, SAMPLES.size))
+
+        FrameParser(on_frame).feed(model.advance(seconds))
+        recorder.has_result = True
+        return recorder.finish("SN1", "2025-01-01 08:00:00")
+
+    def test_non_default_rate(self):
+        path = self.record(rate=250, seconds=12.0)
+        self.assertEqual(RawSegment(path).rate, 250)
+        [(_, analysis)] = analyze_segments([path])
+        # Защита модели срабатывает через 20 мс; при частоте по умолчанию
+        # вышло бы вчетверо меньше
+        self.assertTrue(analysis.complete)
+        self.assertAlmostEqual(analysis.trip_time, 0.02, delta=2 / 250)
+        self.assertTrue(analysis.checks.all())
+
+
+if __name__ == "__main__":
+    unittest.main()
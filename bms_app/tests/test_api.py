@@ -0,0 +1,95 @@
+# Проверки локального API без окна: ApiServer с заглушкой окна
+#   cd bms_app && python -m unittest discover tests
+import os
+import sys
+import json
+import socket
+import threading
+import unittest
+from types import SimpleNamespace
+
+os.environ.setdefault("QT_QPA_PLATFORM", "offscreen")
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from PySide6.QtCore import QCoreApplication, QObject, Signal
+
+from api import ApiServer, MAX_BODY
+
+
+class FakeQueue(QObject):
+    job_changed = Signal(object)
+    job_finished = Signal(object)
+    job_failed = Signal(object)
+
+
+def http(port, raw):
+    with socket.create_connection(("127.0.0.1", port), timeout=5) as sock:
+        sock.sendall(raw)
+        data = b""
+        while chunk := sock.recv(65536):
+            data += chunk
+    head, _, body = data.partition(b"\r\n\r\n")
+    return int(head.split(b" ", 2)[1]), body
+
+
+class ApiTest(unittest.TestCase):
+    def setUp(self):
+        self.app = QCoreApplication.instance() or QCoreApplication([])
+        self.queue = FakeQueue()
+        window = SimpleNamespace(
+            stands=[], report_queue=self.queue,
+            catalogue=SimpleNamespace(report_dir="reports"), archive=None,
+        )
+        self.server = ApiServer(window, host="127.0.0.1", port=0, token=None)
+        self.assertTrue(self.server.start())
+
+    def tearDown(self):
+        self.server.stop()
+
+    def rpc(self, request):
+        # Вызовы API выполняются в потоке GUI: клиент ждет ответа в своем
+        # потоке, а этот обрабатывает события Qt
+        body = json.dumps(request).encode("utf-8")
+        raw = f"POST /rpc HTTP/1.1\r\nContent-Length: {len(body)}\r\n\r\n".encode("latin-1") + body
+        answer = {}
+        client = threading.Thread(target=lambda: answer.update(response=http(self.server.port, raw)))
+        client.start()
+        while client.is_alive():
+            self.app.processEvents()
+            client.join(0.01)
+        status, body = answer["response"]
+        self.assertEqual(status, 200)
+        return json.loads(body)
+
+    def test_malformed_requests(self):
+        cases = [
+            (b"POST /rpc HTTP/1.1\r\nContent-Length: abc\r\n\r\n", 400),
+            (b"POST /rpc HTTP/1.1\r\nContent-Length: -5\r\n\r\n", 400),
+            (f"POST /rpc HTTP/1.1\r\nContent-Length: {MAX_BODY + 1}\r\n\r\n".encode("latin-1"), 413),
+            (b"GARBAGE\r\n\r\n", 400),
+            (b"GET /rpc HTTP/1.1\r\n\r\n", 405),
+        ]
+        for raw, expected in cases:
+            status, _ = http(self.server.port, raw)
+            self.assertEqual(status, expected, raw)
+
+    def test_malformed_rpc(self):
+        body = b"{not json"
+        status, answer = http(self.server.port, b"POST /rpc HTTP/1.1\r\nContent-Length: %d\r\n\r\n%s" % (len(body), body))
+        self.assertEqual(status, 200)
+        self.assertEqual(json.loads(answer)["error"]["code"], -32700)
+        self.assertEqual(self.rpc([])["error"]["code"], -32600)
+        self.assertEqual(self.rpc({"jsonrpc": "2.0", "id": 1, "method": "nope"})["error"]["code"], -32601)
+        self.assertEqual(self.rpc({"jsonrpc": "2.0", "id": 1, "method": "stands", "params": 5})["error"]["code"], -32602)
+
+    def test_submit_rejects_unsafe_names(self):
+        for system_name, serial_number in [("../reports", "SN1"), ("СКУ", "/tmp/x"), ("СКУ", "a\\b"), ("СКУ", " ")]:
+            response = self.rpc({
+                "jsonrpc": "2.0", "id": 1, "method": "submit",
+                "params": {"system_name": system_name, "serial_number": serial_number},
+            })
+            self.assertEqual(response["error"]["code"], -32602, (system_name, serial_number))
+
+
+if __name__ == "__main__":
+    unittest.main()
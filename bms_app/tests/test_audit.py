@@ -0,0 +1,62 @@
+# Цепочка журнала аудита:
+#   cd bms_app && python -m unittest discover tests
+import os
+import sys
+import shutil
+import tempfile
+import unittest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from audit import AuditLog, TAIL_BLOCK, verify_chain
+
+
+class FailingFile:
+    # Файл журнала, запись в который не проходит
+    def __init__(self, file):
+        self.file = file
+
+    def write(self, data):
+        raise OSError("нет места на диске")
+
+    def __getattr__(self, name):
+        return getattr(self.file, name)
+
+
+class ChainTest(unittest.TestCase):
+    def setUp(self):
+        self.work = tempfile.mkdtemp(prefix="bms_test_")
+        self.path = os.path.join(self.work, "log.txt")
+
+    def tearDown(self):
+        shutil.rmtree(self.work, ignore_errors=True)
+
+    def test_long_last_line(self):
+        log = AuditLog(self.path)
+        log.log("Report: " + "x" * (3 * TAIL_BLOCK) + ".pdf")
+        log.close()
+        # Строка без цепочки длиннее блока чтения — звено ищется до нее
+        with open(self.path, "a", encoding="utf-8") as f:
+            f.write("[2025-01-01 08:00:00] INFO " + "y" * (2 * TAIL_BLOCK) + "\n")
+        # Новый запуск продолжает цепочку от длинной последней строки
+        log = AuditLog(self.path)
+        log.log("следующая запись")
+        log.close()
+        self.assertEqual(verify_chain(self.path), (2, []))
+
+    def test_failed_write_does_not_advance_chain(self):
+        log = AuditLog(self.path)
+        log.log("первая запись")
+        log.flush()
+        written = log._file
+        log._file = FailingFile(written)
+        log.log("не записана")
+        log.flush()
+        log._file = written
+        log.log("после ошибки")
+        log.close()
+        self.assertEqual(verify_chain(self.path), (2, []))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,41 @@
+# Вердикт протокола:
+#   cd bms_app && python -m unittest discover tests
+import os
+import sys
+import shutil
+import tempfile
+import unittest
+from datetime import datetime
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from emulator import iter_results
+from report import make_snapshot, write_report
+from results import NO_DATA
+
+
+class VerdictTest(unittest.TestCase):
+    def setUp(self):
+        self.work = tempfile.mkdtemp(prefix="bms_test_")
+        self.result = next(result for _, result in iter_results(50, seed=1, profile="healthy") if result.passed)
+
+    def tearDown(self):
+        shutil.rmtree(self.work, ignore_errors=True)
+
+    def write(self, result):
+        filename = os.path.join(self.work, "report.pdf")
+        snapshot = make_snapshot("СКУ", "SN1", datetime(2025, 1, 1, 8, 0), result, "Оператор", {}, filename=filename)
+        return write_report(snapshot)
+
+    def test_passed_result(self):
+        self.assertTrue(self.write(self.result))
+
+    def test_no_data_cell_is_negative(self):
+        # Протокол и индекс дают один вердикт: проверка без данных не пройдена
+        self.result.checks[5] = NO_DATA
+        self.assertFalse(self.result.passed)
+        self.assertFalse(self.write(self.result))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,82 @@
+# Проверки StandSession без стенда и без экрана:
+#   cd bms_app && python -m unittest discover tests
+import os
+import sys
+import shutil
+import tempfile
+import unittest
+
+os.environ.setdefault("QT_QPA_PLATFORM", "offscreen")
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from PySide6.QtCore import QCoreApplication
+
+import audit
+from emulator import iter_results
+from protocol import ALL_CHANNELS
+from stand import StandSession
+from testplan import load_plan
+
+
+class PlanResultTest(unittest.TestCase):
+    def setUp(self):
+        self.app = QCoreApplication.instance() or QCoreApplication([])
+        # Сегменты измерений и журнал пишутся в текущую папку
+        self.cwd = os.getcwd()
+        self.work = tempfile.mkdtemp(prefix="bms_test_")
+        os.chdir(self.work)
+        self.stand = StandSession("Тест", "emu://healthy")
+        self.stand.device_connected = True
+        self.result = next(iter_results(1, seed=1))[1]
+
+    def tearDown(self):
+        self.stand.stop()
+        # Журнал пишет фоновый поток: дописать его, пока папка временная
+        audit.flush()
+        os.chdir(self.cwd)
+        shutil.rmtree(self.work, ignore_errors=True)
+
+    def finish_steps(self):
+        run = self.stand.plan_run
+        while not run.done:
+            for task in run.running():
+                channel = ALL_CHANNELS if task.channel is None else task.channel
+                self.stand.on_step_done(task.step, channel, 0.0)
+
+    def test_result_during_plan_is_ignored(self):
+        self.stand.run_plan(load_plan())
+        self.stand.on_test_received(self.result)
+        self.assertFalse(self.stand.results_received)
+        self.assertIsNone(self.stand.result)
+
+        self.finish_steps()
+        self.stand.on_test_received(self.result)
+        self.assertTrue(self.stand.results_received)
+        self.assertEqual(self.stand.result.test_id, self.result.test_id)
+
+    def test_result_after_plan_timeout_is_ignored(self):
+        self.stand.run_plan(load_plan())
+        self.stand.on_step_timeout()
+        self.stand.on_test_received(self.result)
+        self.assertFalse(self.stand.results_received)
+        self.assertIsNone(self.stand.result)
+
+        self.stand.reset()
+        self.stand.on_test_received(self.result)
+        self.assertTrue(self.stand.results_received)
+
+    def test_result_without_plan_is_accepted(self):
+        self.stand.on_test_received(self.result)
+        self.assertTrue(self.stand.results_received)
+
+    def test_recording_continues_after_archive(self):
+        self.stand.start()
+        self.stand.on_test_received(self.result)
+        path = self.stand.archive_run("SN1", "2025-01-01 08:00:00")
+        self.assertTrue(os.path.exists(path))
+        self.assertIsNotNone(self.stand.recorder.path)
+        self.assertTrue(os.path.exists(self.stand.recorder.path))
+
+
+if __name__ == "__main__":
+    unittest.main()
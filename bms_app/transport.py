@@ -0,0 +1,137 @@
+import logging
+import threading
+import time
+
+import numpy as np
+import serial
+from PySide6.QtCore import Signal, QObject
+
+from protocol import (
+    FrameParser, encode_frame, decode_result, PONG, SAMPLES, SAMPLE_FIELDS, STEP, STEP_DONE, ALL_CHANNELS,
+    FRAME_PING, FRAME_PONG, FRAME_RESULT, FRAME_TELEMETRY, FRAME_SAMPLES, FRAME_STEP, FRAME_STEP_DONE
+)
+from telemetry import SAMPLE_DTYPE, SAMPLE_RATE
+from emulator import open_port, EMULATOR_SCHEME
+from metrics import span
+
+
+class SerialTransport(QObject):
+    ping_response = Signal(bool)
+    test_received = Signal(object)
+    # Номер шага, канал (ALL_CHANNELS — вся батарея), длительность шага на стенде, с
+    step_done = Signal(int, int, float)
+
+    def __init__(self, port, baudrate=115200):
+        super().__init__()
+        self.port = port
+        self.baudrate = baudrate
+        self.running = False
+        self.enabled = True
+        self.connected = False
+        self.telemetry = None
+        self.recorder = None
+        self.telemetry_enabled = False
+        self.lost_samples = 0
+        # Частота отсчетов, о которой сообщил стенд в ответе на PING
+        self.sample_rate = SAMPLE_RATE
+        # Время разбора последнего результата (perf_counter) — для замера
+        # ожидания в очереди сигналов до обработчика в потоке GUI
+        self.received_at = None
+        self._next_sample = None
+        self._last_error = None
+        self._serial = None
+        self._write_lock = threading.Lock()
+        self._parser = FrameParser(self.on_frame)
+
+    def start(self):
+        self.running = True
+        threading.Thread(target=self.read_loop, daemon=True).start()
+
+    def stop(self):
+        self.running = False
+
+    def send(self, frame_type, payload=b""):
+        frame = encode_frame(frame_type, payload)
+        with self._write_lock:
+            if self._serial is not None:
+                self._serial.write(frame)
+
+    def send_step(self, step, kind, channel, setpoint, dwell):
+        # channel=None — шаг для всей батареи
+        self.send(FRAME_STEP, STEP.pack(step, kind, ALL_CHANNELS if channel is None else channel, setpoint, dwell))
+
+    def set_telemetry(self, enabled):
+        self.telemetry_enabled = enabled
+        self._next_sample = None
+        self.send(FRAME_TELEMETRY, bytes([enabled]))
+
+    def open(self):
+        # Любая ошибка открытия — неудачное подключение, а не падение потока чтения
+        try:
+            if self.port.startswith(EMULATOR_SCHEME):
+                return open_port(self.port)
+            return serial.Serial(self.port, self.baudrate, timeout=0.1)
+        except serial.SerialException:
+            raise
+        except Exception as e:
+            raise serial.SerialException(f"{type(e).__name__}: {e}") from e
+
+    def read_loop(self):
+        while self.running:
+            try:
+                self._serial = self.open()
+                self._parser.buffer.clear()
+                self.send(FRAME_PING)
+                if self.telemetry_enabled:
+                    self.send(FRAME_TELEMETRY, b"\x01")
+                while self.running:
+                    data = self._serial.read(max(1, self._serial.in_waiting))
+                    if data:
+                        self._parser.feed(data)
+            except Exception as e:
+                # Ошибка пишется в журнал один раз, пока не сменится
+                message = str(e)
+                if message != self._last_error:
+                    self._last_error = message
+                    if isinstance(e, serial.SerialException):
+                        logging.warning(f"Порт {self.port}: {message}")
+                    else:
+                        logging.exception(f"Порт {self.port}: ошибка потока чтения")
+                if self.connected:
+                    self.connected = False
+                    self.ping_response.emit(False)
+                time.sleep(2)
+            finally:
+                with self._write_lock:
+                    if self._serial is not None:
+                        self._serial.close()
+                        self._serial = None
+
+    def on_frame(self, frame_type, payload):
+        if frame_type == FRAME_PONG:
+            self._last_error = None
+            if len(payload) >= PONG.size:
+                (self.sample_rate,) = PONG.unpack_from(payload)
+                if self.recorder is not None:
+                    self.recorder.set_rate(self.sample_rate)
+            if not self.connected:
+                self.connected = True
+                self.ping_response.emit(True)
+        elif frame_type == FRAME_SAMPLES:
+            seq, count = SAMPLES.unpack_from(payload)
+            if self._next_sample is not None and seq != self._next_sample:
+                self.lost_samples += (seq - self._next_sample) & 0xFFFFFFFF
+            self._next_sample = (seq + count) & 0xFFFFFFFF
+            samples = np.frombuffer(payload, SAMPLE_DTYPE, count * SAMPLE_FIELDS, SAMPLES.size)
+            if self.telemetry is not None:
+                self.telemetry.append(samples)
+            if self.recorder is not None:
+                self.recorder.append_samples(seq, samples)
+        elif frame_type == FRAME_STEP_DONE:
+            self.step_done.emit(*STEP_DONE.unpack_from(payload))
+        elif frame_type == FRAME_RESULT:
+            if self.enabled:
+                with span("decode"):
+                    result = decode_result(payload)
+                self.received_at = time.perf_counter()
+                self.test_received.emit(result)
@@ -0,0 +1,153 @@
+import os
+import json
+import sqlite3
+import threading
+
+# Общий справочник пользователей и настроек участка для нескольких рабочих
+# мест: файл SQLite в общей папке (путь задается BMS_USERS_DB). Журнал
+# транзакций — классический rollback, а не WAL: WAL не работает на сетевых
+# дисках.
+USERS_DB = os.environ.get("BMS_USERS_DB", "users.db")
+LEGACY_USERS = "users.json"
+DEFAULT_TEST_AREA_NAME = "Участок 1"
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS users (
+    user_id TEXT PRIMARY KEY,
+    lastname TEXT NOT NULL DEFAULT '',
+    firstname TEXT NOT NULL DEFAULT '',
+    middlename TEXT NOT NULL DEFAULT '',
+    password TEXT NOT NULL,
+    role TEXT NOT NULL DEFAULT 'operator'
+);
+CREATE TABLE IF NOT EXISTS settings (
+    key TEXT PRIMARY KEY,
+    value TEXT
+);
+"""
+
+FIELDS = ("lastname", "firstname", "middlename", "password", "role")
+
+
+class UserStore:
+    # Пользователи держатся в памяти словарем: поиск при входе — O(1) без
+    # обращения к файлу. Кэш сбрасывается, только когда другое рабочее место
+    # изменило базу (PRAGMA data_version), поэтому проверка стоит одного
+    # легкого запроса. Каждое изменение — отдельная транзакция: правки с
+    # двух мест не перетирают друг друга и не оставляют файл недописанным.
+    def __init__(self, path=USERS_DB, legacy_path=LEGACY_USERS):
+        self.path = path
+        self._lock = threading.RLock()
+        self._db = sqlite3.connect(path, timeout=10, isolation_level=None, check_same_thread=False)
+        self._db.executescript(SCHEMA)
+        self._version = None
+        # Номер состояния кэша: растет при любом изменении, своем или чужом
+        self.version = 0
+        self._users = {}
+        self._settings = {}
+        self._import_legacy(legacy_path)
+        self.refresh()
+
+    def refresh(self):
+        with self._lock:
+            version = self._db.execute("PRAGMA data_version").fetchone()[0]
+            if version == self._version:
+                return False
+            users = {}
+            for row in self._db.execute(f"SELECT user_id, {', '.join(FIELDS)} FROM users"):
+                users[row[0]] = dict(zip(FIELDS, row[1:]))
+            self._users = users
+            self._settings = dict(self._db.execute("SELECT key, value FROM settings"))
+            self._version = version
+            self.version += 1
+            return True
+
+    @property
+    def users(self):
+        self.refresh()
+        return self._users
+
+    def get(self, user_id):
+        return self.users.get(user_id)
+
+    def add(self, user_id, info):
+        # False, если пользователь с таким идентификатором уже есть
+        values = [info.get(field, "") for field in FIELDS]
+        values[FIELDS.index("role")] = info.get("role") or "operator"
+        with self._lock, self._transaction() as db:
+            try:
+                db.execute(
+                    f"INSERT INTO users (user_id, {', '.join(FIELDS)}) VALUES (?, ?, ?, ?, ?, ?)",
+                    [user_id, *values]
+                )
+            except sqlite3.IntegrityError:
+                return False
+            self._users = {**self._users, user_id: dict(zip(FIELDS, values))}
+            self.version += 1
+        return True
+
+    def delete(self, user_id):
+        with self._lock, self._transaction() as db:
+            deleted = db.execute("DELETE FROM users WHERE user_id = ?", (user_id,)).rowcount
+            if deleted:
+                users = dict(self._users)
+                users.pop(user_id, None)
+                self._users = users
+                self.version += 1
+        return bool(deleted)
+
+    def setting(self, key, default=None):
+        self.refresh()
+        value = self._settings.get(key)
+        return default if value is None else value
+
+    def set_setting(self, key, value):
+        with self._lock, self._transaction() as db:
+            db.execute("INSERT OR REPLACE INTO settings VALUES (?, ?)", (key, value))
+            self._settings = {**self._settings, key: value}
+            self.version += 1
+
+    @property
+    def test_area_name(self):
+        return self.setting("test_area_name", DEFAULT_TEST_AREA_NAME)
+
+    def _transaction(self):
+        return _Transaction(self._db)
+
+    def _import_legacy(self, legacy_path):
+        # Однократный перенос из users.json, пока общая база пуста
+        if not legacy_path or not os.path.exists(legacy_path):
+            return
+        with self._lock, self._transaction() as db:
+            if db.execute("SELECT 1 FROM users LIMIT 1").fetchone():
+                return
+            with open(legacy_path, "r", encoding="utf-8") as f:
+                data = json.load(f)
+            for user_id, info in data.get("users", {}).items():
+                db.execute(
+                    f"INSERT OR IGNORE INTO users (user_id, {', '.join(FIELDS)}) VALUES (?, ?, ?, ?, ?, ?)",
+                    [user_id, *(info.get(field) or ("operator" if field == "role" else "") for field in FIELDS)]
+                )
+            if data.get("test_area_name"):
+                db.execute(
+                    "INSERT OR IGNORE INTO settings VALUES ('test_area_name', ?)", (data["test_area_name"],)
+                )
+
+    def close(self):
+        with self._lock:
+            self._db.close()
+
+
+class _Transaction:
+    # BEGIN IMMEDIATE сразу берет блокировку записи, поэтому два рабочих
+    # места не могут одновременно прочитать и перезаписать одни данные
+    def __init__(self, db):
+        self.db = db
+
+    def __enter__(self):
+        self.db.execute("BEGIN IMMEDIATE")
+        return self.db
+
+    def __exit__(self, exc_type, exc, tb):
+        self.db.execute("COMMIT" if exc_type is None else "ROLLBACK")
+        return False